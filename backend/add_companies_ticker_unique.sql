@@ -0,0 +1,39 @@
+-- Migration script to make companies.ticker unique, as the bulk price upsert (ON CONFLICT (ticker)) requires
+-- Run this in your Supabase SQL editor
+
+-- Step 1: For each ticker with several rows, keep the one with the newest price
+CREATE TEMP TABLE company_duplicates AS
+SELECT id AS duplicate_id, keep_id
+FROM (
+    SELECT id, FIRST_VALUE(id) OVER (
+        PARTITION BY ticker ORDER BY latest_price_as_of DESC NULLS LAST, id
+    ) AS keep_id
+    FROM companies
+    WHERE ticker IS NOT NULL
+) ranked
+WHERE id <> keep_id;
+
+-- Step 2: Point positions and orders at the surviving row
+UPDATE positions SET company_id = d.keep_id
+FROM company_duplicates d
+WHERE positions.company_id = d.duplicate_id;
+
+UPDATE orders SET company_id = d.keep_id
+FROM company_duplicates d
+WHERE orders.company_id = d.duplicate_id;
+
+-- Step 3: Remove the duplicates
+DELETE FROM companies
+USING company_duplicates d
+WHERE companies.id = d.duplicate_id;
+
+DROP TABLE company_duplicates;
+
+-- Step 4: Enforce one row per ticker (also indexes ticker lookups)
+ALTER TABLE companies ADD CONSTRAINT companies_ticker_key UNIQUE (ticker);
+
+-- Verify the changes
+SELECT ticker, COUNT(*)
+FROM companies
+GROUP BY ticker
+HAVING COUNT(*) > 1;
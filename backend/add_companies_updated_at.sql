@@ -0,0 +1,32 @@
+-- Migration script to add companies.updated_at, which the symbol master's incremental refresh reads
+-- Run this in your Supabase SQL editor
+
+-- Step 1: Add the column (existing rows count as updated now)
+ALTER TABLE companies ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- Step 2: Keep it current when a column the symbol master holds changes
+-- (price refreshes rewrite every row and would otherwise make each pull a full load)
+CREATE OR REPLACE FUNCTION set_companies_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (NEW.ticker, NEW.name, NEW.logo_url, NEW.domain, NEW.sector, NEW.sector_id)
+        IS DISTINCT FROM (OLD.ticker, OLD.name, OLD.logo_url, OLD.domain, OLD.sector, OLD.sector_id) THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS companies_set_updated_at ON companies;
+CREATE TRIGGER companies_set_updated_at
+    BEFORE UPDATE ON companies
+    FOR EACH ROW
+    EXECUTE FUNCTION set_companies_updated_at();
+
+-- Step 3: Index the incremental pull (updated_at >= last sync)
+CREATE INDEX IF NOT EXISTS idx_companies_updated_at ON companies (updated_at);
+
+-- Verify the changes
+SELECT column_name, data_type, column_default
+FROM information_schema.columns
+WHERE table_name = 'companies' AND column_name = 'updated_at';
@@ -13,7 +13,7 @@ try:
     # When running under uvicorn with backend on PYTHONPATH
     from supabase_services import (
         get_accounts, get_transactions, get_categories, get_sync,
-        get_institutions, get_portfolios, get_orders, get_positions, get_client
+        get_institutions, get_portfolios, get_orders, get_positions, get_client, get_symbols
     )
     try:
         # Import Plaid items accessor for delete endpoints (not used in tests)
@@ -25,13 +25,17 @@ except Exception:
     # Fallback for tests importing backend.* fully-qualified
     from backend.supabase_services import (
         get_accounts, get_transactions, get_categories, get_sync,
-        get_institutions, get_portfolios, get_orders, get_positions, get_client
+        get_institutions, get_portfolios, get_orders, get_positions, get_client, get_symbols
     )
     try:
         from backend.plaid_services import get_items  # type: ignore
     except Exception:
         def get_items():  # type: ignore
             raise ImportError('plaid_services not available')
+try:
+    from utils.quote_cache import get_quote_cache
+except Exception:
+    from backend.utils.quote_cache import get_quote_cache
 import os
 from datetime import datetime
 import json
@@ -751,15 +755,7 @@ async def get_portfolio_orders(portfolio_id: str):
         rows = result.get('data') or []
         # Enrich with company ticker/name if possible
         try:
-            from supabase_services import get_client  # type: ignore
-            client = get_client().client
-            company_ids = list({r.get('company_id') for r in rows if r.get('company_id')})
-            company_map = {}
-            if company_ids:
-                q = client.table('companies').select('id, name, ticker, logo_url').in_('id', company_ids)
-                cr = q.execute()
-                for c in (cr.data or []):
-                    company_map[c.get('id')] = { 'name': c.get('name'), 'ticker': c.get('ticker'), 'logo_url': c.get('logo_url') }
+            company_map = get_symbols().companies_by_id(r.get('company_id') for r in rows if r.get('company_id'))
             for r in rows:
                 cmp = company_map.get(r.get('company_id') or '')
                 if cmp:
@@ -869,19 +865,11 @@ async def get_companies(ids: Optional[str] = None, tickers: Optional[str] = None
                 if (row.get('id') or '') not in existing:
                     results.append(row)
 
-        # Join sectors
-        sids = { r.get('sector_id') for r in results if r.get('sector_id') }
-        s_map = {}
-        if sids:
-            try:
-                s = client.table('sectors').select('id, name, color').in_('id', list(sids)).execute()
-                for row in (s.data or []):
-                    s_map[row.get('id')] = row
-            except Exception:
-                pass
+        # Join sectors from the in-memory symbol master
+        symbols = get_symbols()
         for r in results:
             sid = r.get('sector_id')
-            sr = s_map.get(sid)
+            sr = symbols.sector(sid) if sid else None
             if sr:
                 r['sector'] = sr.get('name')
                 r['sector_color'] = sr.get('color')
@@ -948,6 +936,7 @@ def _execute_order_internal(portfolio_id: str, ticker: str, side: str, order_typ
         print(f"[ORDER] Portfolio {portfolio_id} current cash: {cash}")
 
         qty = int(quantity)
+        market_priced = False  # exec_price came from a live quote rather than the caller's limit
         if order_type == 'limit':
             if limit_price is None or float(limit_price) <= 0:
                 return { 'success': False, 'error': 'Valid limit_price required for limit orders', 'status_code': 400 }
@@ -967,6 +956,7 @@ def _execute_order_internal(portfolio_id: str, ticker: str, side: str, order_typ
                 # Use the most recent close price
                 current_price = float(hist['Close'].iloc[-1])
                 exec_price = current_price
+                market_priced = True
                 print(f"[ORDER] Fetched current market price for {ticker}: ${exec_price:.2f}")
             except Exception as e:
                 print(f"[ORDER] Error fetching current price for {ticker}: {e}")
@@ -982,6 +972,9 @@ def _execute_order_internal(portfolio_id: str, ticker: str, side: str, order_typ
         company_id = _ensure_company_for_ticker((ticker or '').upper())
         
         # Update the company's latest_price with the execution price
+        # Only a live fill is a market quote; a limit price must not be served to quote readers
+        if market_priced and exec_price > 0:
+            get_quote_cache().put((ticker or '').upper(), exec_price, 'USD', source='order_execution')
         if company_id and exec_price > 0:
             try:
                 from datetime import datetime, timezone
@@ -1123,14 +1116,11 @@ def _ensure_company_for_ticker(ticker: str) -> Optional[str]:
         if not ticker:
             return None
         svc = get_client()
-        client = getattr(svc, 'client', None)
-        # Try by ticker first using wrapper select (compatible with fake client)
-        try:
-            sel = svc.select('companies', filters={'ticker': ticker}, limit=1)
-            if sel.get('success') and sel.get('data'):
-                return (sel['data'][0] or {}).get('id')
-        except Exception:
-            pass
+        symbols = get_symbols()
+        # Known tickers resolve from the in-memory symbol master without a round trip
+        company = symbols.company_for_ticker(ticker)
+        if company and company.get('id'):
+            return company.get('id')
 
         # Best-effort enrichment using Finnhub and Clearbit domain logo
         name = ticker
@@ -1185,22 +1175,12 @@ def _ensure_company_for_ticker(ticker: str) -> Optional[str]:
                     except Exception:
                         return '#6b8afd'
                 # exact match first
-                try:
-                    sel = svc.select('sectors', filters={'name': sname}, limit=1)
-                    if sel.get('success') and sel.get('data'):
-                        return (sel['data'][0] or {}).get('id')
-                except Exception:
-                    pass
+                known = symbols.sector_by_name(sname)
+                if known and known.get('id'):
+                    return known.get('id')
                 # insert new sector row with unique color
                 try:
-                    # gather existing colors
-                    existing = []
-                    try:
-                        existing = (svc.select('sectors').get('data') or [])
-                    except Exception:
-                        existing = []
-                    used = {str((r or {}).get('color') or '').strip().lower() for r in existing if r and r.get('color')}
-                    color = _pick_distinct_color(used, sname)
+                    color = _pick_distinct_color(symbols.sector_colors(), sname)
                     ins = svc.insert('sectors', { 'name': sname, 'color': color })
                     if not ins.get('success'):
                         raise Exception(ins.get('error') or 'insert failed')
@@ -1209,6 +1189,7 @@ def _ensure_company_for_ticker(ticker: str) -> Optional[str]:
                 try:
                     sel2 = svc.select('sectors', filters={'name': sname}, limit=1)
                     if sel2.get('success') and sel2.get('data'):
+                        symbols.note_sector(sel2['data'][0] or {})
                         return (sel2['data'][0] or {}).get('id')
                 except Exception:
                     pass
@@ -1237,6 +1218,7 @@ def _ensure_company_for_ticker(ticker: str) -> Optional[str]:
         try:
             r2 = svc.select('companies', filters={'ticker': ticker}, limit=1)
             if r2.get('success') and r2.get('data'):
+                symbols.note_company(r2['data'][0] or {})
                 return (r2['data'][0] or {}).get('id')
         except Exception:
             pass
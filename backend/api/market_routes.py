@@ -1,14 +1,35 @@
-from fastapi import APIRouter, HTTPException
-import yfinance as yf
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+import asyncio
+import json
 import os
 import requests
 from typing import Optional
 from datetime import datetime, timezone, timedelta
 
 try:
-    from supabase_services import get_client
+    from supabase_services import get_client, get_universe
 except Exception:
-    from backend.supabase_services import get_client
+    from backend.supabase_services import get_client, get_universe
+
+try:
+    from services.price_cache import is_valid_ticker
+    from services.price_history import DEFAULT_POINTS, MAX_POINTS, etag_for, get_history_cache, resolve_range
+    from services.price_refresher import get_price_refresher
+    from services.quote_stream import QUOTE_STREAM_MAX_SYMBOLS, QuoteSubscriber, get_quote_hub
+    from services.quotes import price_rows, refresh_quotes, upsert_prices
+    from services.snapshot_pipeline import get_snapshot_job, start_snapshot_job
+    from utils.market_calendar import is_price_fresh
+    from utils.quote_cache import get_quote_cache
+except Exception:
+    from backend.services.price_cache import is_valid_ticker
+    from backend.services.price_history import DEFAULT_POINTS, MAX_POINTS, etag_for, get_history_cache, resolve_range
+    from backend.services.price_refresher import get_price_refresher
+    from backend.services.quote_stream import QUOTE_STREAM_MAX_SYMBOLS, QuoteSubscriber, get_quote_hub
+    from backend.services.quotes import price_rows, refresh_quotes, upsert_prices
+    from backend.services.snapshot_pipeline import get_snapshot_job, start_snapshot_job
+    from backend.utils.market_calendar import is_price_fresh
+    from backend.utils.quote_cache import get_quote_cache
 
 router = APIRouter(prefix="/market", tags=["Market Data"]) 
 
@@ -26,26 +47,56 @@ def _domain_from_url(url: str) -> Optional[str]:
         return None
 
 
+def _company_profile(symbol: str) -> dict:
+    """Best-effort { name, web_url, domain } for a new companies row from Finnhub; { name: symbol } without it."""
+    profile = {'name': symbol}
+    try:
+        api_key = os.getenv('FINNHUB_API_KEY')
+        if api_key:
+            prof = requests.get('https://finnhub.io/api/v1/stock/profile2', params={'symbol': symbol, 'token': api_key}, timeout=6)
+            if prof.ok:
+                js = prof.json() or {}
+                profile['name'] = js.get('name') or symbol
+                web = js.get('weburl') or js.get('url') or None
+                if web:
+                    profile['web_url'] = web
+                domain = _domain_from_url(web)
+                if domain:
+                    profile['domain'] = domain
+    except Exception:
+        pass
+    return profile
+
+
 @router.get("/quote/{ticker}")
 async def get_quote(ticker: str):
     """
-    Return the latest price for a ticker, sourced from the database when fresh.
+    Return the latest price for a ticker, sourced from the process cache or database when fresh.
     If missing or stale, fetch from yfinance, upsert into companies, then return.
     """
     try:
         symbol = (ticker or '').strip().upper()
         if not symbol:
             raise HTTPException(status_code=400, detail="Ticker required")
+        get_price_refresher().touch([symbol])
+
+        # 0) Process-local cache: a quote served to anyone within the staleness window
+        cache = get_quote_cache()
+        cached = cache.get(symbol)
+        if cached:
+            return {"success": True, "ticker": symbol, "price": cached['price'], "currency": cached['currency']}
 
         client = get_client().client
 
         # 1) Try DB-first: if we have a fresh latest_price within the staleness window, return it
         STALE_AFTER = int(os.getenv('PRICE_STALE_SECONDS', '300'))  # default 5 minutes
         try:
-            db_res = client.table('companies').select('id, ticker, latest_price, latest_price_as_of, latest_price_currency').eq('ticker', symbol).limit(1).execute()
+            db_res = client.table('companies').select('id, ticker, name, latest_price, latest_price_as_of, latest_price_currency, latest_price_source').eq('ticker', symbol).limit(1).execute()
             row = (db_res.data or [None])[0]
+            looked_up = True
         except Exception:
             row = None
+            looked_up = False
 
         if row:
             price = row.get('latest_price')
@@ -62,73 +113,26 @@ async def get_quote(ticker: str):
             except Exception:
                 as_of_dt = None
             if price is not None and as_of_dt is not None:
-                age = (datetime.now(timezone.utc) - as_of_dt.replace(tzinfo=timezone.utc)).total_seconds()
-                if age <= STALE_AFTER:
+                # Off-hours prices stay fresh until the next session opens
+                if is_price_fresh(as_of_dt, STALE_AFTER):
+                    cache.put(symbol, price, currency, as_of_dt, row.get('latest_price_source') or 'yfinance')
                     return {"success": True, "ticker": symbol, "price": float(price), "currency": currency}
 
-        # 2) Fetch from yfinance if DB is empty/stale
-        info = yf.Ticker(symbol).fast_info
-        price = info.get('last_price') or info.get('regularMarketPrice') or None
-        currency = info.get('currency') or 'USD'
-        if price is None:
-            hist = yf.Ticker(symbol).history(period='1d')
-            if not hist.empty:
-                price = float(hist['Close'].iloc[-1])
+        # 2) Fetch from yfinance if DB is empty/stale, sharing any refresh of this symbol already in flight
+        # 3) The request that fetched it upserts companies (best-effort)
+        def write(quotes):
+            if not looked_up:
+                return  # whether the company exists is unknown; an upsert could rename it to its ticker
+            names = {symbol: (row or {}).get('name')}
+            rows = price_rows(quotes, names)
+            if rows and not row:
+                rows[0].update(_company_profile(symbol))
+            upsert_prices(client, rows)
+
+        price, currency = (await refresh_quotes([symbol], write))[symbol]
         if price is None:
             raise HTTPException(status_code=404, detail="Price not available")
 
-        # 3) Best-effort upsert into companies
-        try:
-            now = datetime.now(timezone.utc).isoformat()
-            if row and row.get('id'):
-                # Update existing row by id
-                client.table('companies').update({
-                    'latest_price': float(price),
-                    'latest_price_as_of': now,
-                    'latest_price_currency': currency,
-                    'latest_price_source': 'yfinance',
-                }).eq('id', row['id']).execute()
-            else:
-                # Try to insert minimal row with ticker, then update price fields
-                # Attempt enrichment (best-effort)
-                name = symbol
-                web = None
-                domain = None
-                try:
-                    api_key = os.getenv('FINNHUB_API_KEY')
-                    if api_key:
-                        prof = requests.get('https://finnhub.io/api/v1/stock/profile2', params={'symbol': symbol, 'token': api_key}, timeout=6)
-                        if prof.ok:
-                            js = prof.json() or {}
-                            name = js.get('name') or symbol
-                            web = js.get('weburl') or js.get('url') or None
-                            domain = _domain_from_url(web)
-                except Exception:
-                    pass
-
-                payload = {'ticker': symbol, 'name': name}
-                if web:
-                    payload['web_url'] = web
-                if domain:
-                    payload['domain'] = domain
-                try:
-                    ins = client.table('companies').insert(payload).execute()
-                    new_id = (ins.data or [{}])[0].get('id')
-                except Exception:
-                    # If insert failed (e.g., row exists), try to locate by ticker
-                    sel = client.table('companies').select('id').eq('ticker', symbol).limit(1).execute()
-                    new_id = (sel.data or [{}])[0].get('id')
-                if new_id:
-                    client.table('companies').update({
-                        'latest_price': float(price),
-                        'latest_price_as_of': now,
-                        'latest_price_currency': currency,
-                        'latest_price_source': 'yfinance',
-                    }).eq('id', new_id).execute()
-        except Exception:
-            # price caching is best-effort; do not fail the request
-            pass
-
         return {"success": True, "ticker": symbol, "price": float(price), "currency": currency}
     except HTTPException:
         raise
@@ -136,45 +140,99 @@ async def get_quote(ticker: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/refresher")
+async def get_refresher_status():
+    """State of the background hot-ticker price refresher."""
+    return {"success": True, "refresher": get_price_refresher().info(), "stream": get_quote_hub().info()}
+
+
 @router.get("/universe")
 async def get_universe_candidates(cap: str = 'micro', limit: int = 50, min_median_dollar_volume: int = 300000):
-    try:
-        limit = max(1, min(200, limit))
-        client = get_client().client
-        q = client.table('companies').select('ticker, latest_price, market_cap, avg_volume_30d, median_dollar_volume_30d, exchange, is_otc, is_etf, is_warrant')
-        # Base filters
-        q = q.in_('exchange', ['NASDAQ', 'NYSE', 'AMEX']).eq('is_otc', False).eq('is_etf', False).eq('is_warrant', False)
-        # Liquidity and price
-        q = q.gte('latest_price', 1).gte('median_dollar_volume_30d', min_median_dollar_volume)
-        # Market cap bucket
-        if cap == 'micro':
-            q = q.lt('market_cap', 300_000_000)
-        # Execute and post-filter/sort
-        res = q.execute()
-        rows = res.data or []
-        rows.sort(key=lambda r: int(r.get('avg_volume_30d') or 0), reverse=True)
-        universe = [
-            {
-                'ticker': r.get('ticker'),
-                'price': float(r.get('latest_price') or 0),
-                'market_cap': float(r.get('market_cap') or 0),
-                'avg_volume': int(r.get('avg_volume_30d') or 0),
-                'exchange': r.get('exchange'),
+    """
+    Most liquid tradable companies in a market-cap bucket (micro, small, mid, large; anything else for all),
+    served from the precomputed universe_ranked view with filtering, ordering and limit done in the database.
+    """
+    limit = max(1, min(200, limit))
+    res = await asyncio.to_thread(get_universe().get_top, None, cap, limit, min_median_dollar_volume)
+    if not res.get('success'):
+        raise HTTPException(status_code=500, detail=res.get('error'))
+    return {"success": True, "universe": res.get('data') or []}
+
+
+async def _latest_prices(symbols):
+    """[{ ticker, price, currency }] for de-duplicated upper-case symbols, in order.
+
+    Served from the process cache or DB when fresh; missing or stale symbols are refreshed
+    from yfinance (joining refreshes already in flight) and upserted into companies.
+    """
+    get_price_refresher().touch(symbols)
+
+    client = get_client().client
+    STALE_AFTER = int(os.getenv('PRICE_STALE_SECONDS', '300'))
+    cache = get_quote_cache()
+
+    # Cache pass: symbols served to anyone within the staleness window never leave the process
+    out = []
+    for sym in symbols:
+        cached = cache.get(sym)
+        out.append({'ticker': sym, 'price': cached['price'], 'currency': cached['currency']} if cached else None)
+    uncached = [sym for idx, sym in enumerate(symbols) if out[idx] is None]
+
+    # Fetch existing rows for the rest in one call
+    db_rows = {}
+    looked_up = True
+    if uncached:
+        try:
+            sel = client.table('companies').select('id, ticker, name, latest_price, latest_price_as_of, latest_price_currency, latest_price_source').in_('ticker', uncached).execute()
+            for r in (sel.data or []):
+                db_rows[(r.get('ticker') or '').upper()] = r
+        except Exception:
+            looked_up = False
+
+    now = datetime.now(timezone.utc)
+
+    def is_fresh(row) -> bool:
+        if row.get('latest_price') is None:
+            return False
+        return is_price_fresh(row.get('latest_price_as_of'), STALE_AFTER, now)
+
+    # First pass: collect fresh from DB
+    for idx, sym in enumerate(symbols):
+        row = db_rows.get(sym)
+        if out[idx] is None and row and is_fresh(row):
+            currency = row.get('latest_price_currency') or 'USD'
+            out[idx] = {
+                'ticker': sym,
+                'price': float(row.get('latest_price')),
+                'currency': currency,
             }
-            for r in rows
-        ][:limit]
-        return {"success": True, "universe": universe}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            cache.put(sym, row.get('latest_price'), currency, row.get('latest_price_as_of'), row.get('latest_price_source') or 'yfinance')
+
+    # Second pass: fetch every stale/missing symbol concurrently (joining refreshes already in flight),
+    # then write the ones this request fetched back in one upsert
+    stale = [sym for idx, sym in enumerate(symbols) if out[idx] is None]
+    if stale:
+        names = {sym: (db_rows.get(sym) or {}).get('name') for sym in stale}
+
+        def write(fetched):
+            # Without the lookup every name would fall back to the ticker and overwrite the real one
+            if looked_up:
+                upsert_prices(client, price_rows(fetched, names, now))
+
+        quotes = await refresh_quotes(stale, write)
+        for idx, sym in enumerate(symbols):
+            if out[idx] is None:
+                price, currency = quotes[sym]
+                out[idx] = {'ticker': sym, 'price': price, 'currency': currency if price is not None else 'USD'}
+
+    return out
 
 
 @router.get("/prices")
 async def get_prices(tickers: str):
     """
-    Batch price fetch. Returns latest prices from DB when fresh; if any are missing or stale,
-    refresh from yfinance, upsert into companies, and return the updated values.
+    Batch price fetch. Returns latest prices from the process cache or DB when fresh; if any
+    are missing or stale, refresh from yfinance, upsert into companies, and return the updated values.
     Query param: tickers=CSV like AAPL,MSFT,NVDA
     """
     try:
@@ -184,296 +242,141 @@ async def get_prices(tickers: str):
         symbols = list(dict.fromkeys(symbols))  # de-dupe, preserve order
         if not symbols:
             return {"success": True, "prices": []}
+        return {"success": True, "prices": await _latest_prices(symbols)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        client = get_client().client
-        STALE_AFTER = int(os.getenv('PRICE_STALE_SECONDS', '300'))
-
-        # Fetch existing rows in one call
-        db_rows = {}
-        try:
-            sel = client.table('companies').select('id, ticker, latest_price, latest_price_as_of, latest_price_currency').in_('ticker', symbols).execute()
-            for r in (sel.data or []):
-                db_rows[(r.get('ticker') or '').upper()] = r
-        except Exception:
-            pass
-
-        out = []
-        now = datetime.now(timezone.utc)
 
-        def is_fresh(row) -> bool:
+@router.websocket("/stream")
+async def stream_quotes(websocket: WebSocket):
+    """
+    Live quotes pushed as the shared refresher observes price changes, instead of polling /market/prices.
+    Client sends {"action": "subscribe" | "unsubscribe", "tickers": ["AAPL", ...]}; a subscribe is
+    answered with the current prices, then changes arrive as {"type": "quotes", "payload": [quote, ...]},
+    at most one frame per QUOTE_STREAM_MIN_INTERVAL_SEC per connection.
+    """
+    await websocket.accept()
+    hub = get_quote_hub()
+    subscriber = QuoteSubscriber(websocket)
+    try:
+        while True:
             try:
-                as_of = row.get('latest_price_as_of')
-                if isinstance(as_of, str):
-                    as_dt = datetime.fromisoformat(as_of.replace('Z', '+00:00'))
-                elif isinstance(as_of, datetime):
-                    as_dt = as_of
-                else:
-                    return False
-                if row.get('latest_price') is None:
-                    return False
-                age = (now - as_dt.replace(tzinfo=timezone.utc)).total_seconds()
-                return age <= STALE_AFTER
-            except Exception:
-                return False
-
-        # First pass: collect fresh from DB
-        for sym in symbols:
-            row = db_rows.get(sym)
-            if row and is_fresh(row):
-                out.append({
-                    'ticker': sym,
-                    'price': float(row.get('latest_price')),
-                    'currency': row.get('latest_price_currency') or 'USD',
-                })
-            else:
-                out.append(None)  # placeholder to fill later
-
-        # Second pass: fetch stale/missing from yfinance and update DB
-        for idx, sym in enumerate(symbols):
-            if out[idx] is not None:
+                message = json.loads(await websocket.receive_text())
+                action = message.get('action')
+                tickers = message.get('tickers') or []
+                if isinstance(tickers, str):
+                    tickers = tickers.split(',')
+                symbols = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+            except (ValueError, AttributeError):
+                await websocket.send_text(json.dumps({"type": "error", "payload": "Expected a JSON object with action and tickers."}))
                 continue
-            price = None
-            currency = 'USD'
-            try:
-                info = yf.Ticker(sym).fast_info
-                price = info.get('last_price') or info.get('regularMarketPrice') or None
-                currency = info.get('currency') or 'USD'
-                if price is None:
-                    hist = yf.Ticker(sym).history(period='1d')
-                    if not hist.empty:
-                        price = float(hist['Close'].iloc[-1])
-            except Exception:
-                price = None
-
-            if price is not None:
-                out[idx] = { 'ticker': sym, 'price': float(price), 'currency': currency }
-                # Upsert into DB best-effort
+            if action == 'subscribe':
+                if len(subscriber.symbols | set(symbols)) > QUOTE_STREAM_MAX_SYMBOLS:
+                    await websocket.send_text(json.dumps({"type": "error", "payload": f"At most {QUOTE_STREAM_MAX_SYMBOLS} tickers per connection."}))
+                    continue
+                hub.subscribe(subscriber, symbols)
                 try:
-                    row = db_rows.get(sym)
-                    iso_now = now.isoformat()
-                    if row and row.get('id'):
-                        client.table('companies').update({
-                            'latest_price': float(price),
-                            'latest_price_as_of': iso_now,
-                            'latest_price_currency': currency,
-                            'latest_price_source': 'yfinance',
-                        }).eq('id', row['id']).execute()
-                    else:
-                        # Insert minimal row with ticker
-                        ins = client.table('companies').insert({'ticker': sym, 'name': sym}).execute()
-                        new_id = (ins.data or [{}])[0].get('id')
-                        if not new_id:
-                            sel_one = client.table('companies').select('id').eq('ticker', sym).limit(1).execute()
-                            new_id = (sel_one.data or [{}])[0].get('id')
-                        if new_id:
-                            client.table('companies').update({
-                                'latest_price': float(price),
-                                'latest_price_as_of': iso_now,
-                                'latest_price_currency': currency,
-                                'latest_price_source': 'yfinance',
-                            }).eq('id', new_id).execute()
-                except Exception:
-                    pass
+                    for quote in await _latest_prices(symbols):
+                        if quote['price'] is not None:
+                            subscriber.offer(quote)
+                except Exception as e:
+                    print(f"[WARN] Initial stream prices failed: {e}")
+            elif action == 'unsubscribe':
+                hub.unsubscribe(subscriber, symbols)
             else:
-                out[idx] = { 'ticker': sym, 'price': None, 'currency': 'USD' }
+                await websocket.send_text(json.dumps({"type": "error", "payload": f"Unknown action: {action}"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(subscriber)
+        subscriber.cancel()
 
-        return {"success": True, "prices": out}
-    except HTTPException:
-        raise
+
+HISTORY_BATCH_MAX_TICKERS = 50
+
+
+def _history_response(request: Request, etag: str, payload: dict):
+    """The payload with its ETag, or an empty 304 when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    if etag in [t.strip() for t in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+def _history_points(range_key: str, points: int) -> int:
+    """Validate the range and clamp the point count; 400 on an unknown range."""
+    try:
+        resolve_range(range_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return max(2, min(points, MAX_POINTS))
+
+
+def _history_symbols(raw: list) -> list:
+    """Normalize tickers and 400 on any that is not a plain symbol (they name price store directories)."""
+    symbols = list(dict.fromkeys(t.strip().upper() for t in raw if t.strip()))
+    invalid = [s for s in symbols if not is_valid_ticker(s)]
+    if invalid or not symbols:
+        raise HTTPException(status_code=400, detail=f"Invalid ticker: {', '.join(invalid) or 'none given'}")
+    return symbols
+
+
+@router.get("/history/{ticker}")
+async def get_history(ticker: str, request: Request, range_key: str = Query('1y', alias='range'), points: int = DEFAULT_POINTS):
+    """
+    Daily adjusted closes from the local price store, downsampled (LTTB) to at most `points`.
+    range: 1m, 3m, 6m, ytd, 1y, 2y, 5y, 10y, 20y, max or YYYY-MM-DD:YYYY-MM-DD. Honors If-None-Match.
+    """
+    symbol = _history_symbols([ticker])[0]
+    points = _history_points(range_key, points)
+    try:
+        etag, payload = await asyncio.to_thread(get_history_cache().get_or_build, symbol, range_key, points)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return _history_response(request, etag, {"success": True, **payload})
+
+
+@router.get("/history")
+async def get_history_batch(tickers: str, request: Request, range_key: str = Query('1y', alias='range'), points: int = DEFAULT_POINTS):
+    """
+    Batch variant of /market/history/{ticker}. Query param: tickers=CSV like AAPL,MSFT,NVDA
+    Returns { history: { ticker: payload } } under one ETag.
+    """
+    symbols = _history_symbols(tickers.split(','))
+    if len(symbols) > HISTORY_BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {HISTORY_BATCH_MAX_TICKERS} tickers per request")
+    points = _history_points(range_key, points)
+    cache = get_history_cache()
+    try:
+        results = await asyncio.gather(*(asyncio.to_thread(cache.get_or_build, s, range_key, points) for s in symbols))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    history = {s: payload for s, (_, payload) in zip(symbols, results)}
+    etag = etag_for([etag for etag, _ in results])
+    return _history_response(request, etag, {"success": True, "history": history})
 
 
 @router.post("/update-portfolio-snapshots")
 async def update_portfolio_snapshots():
-    """Update prices for all companies and create portfolio snapshots using yfinance."""
+    """
+    Start the nightly pipeline in the background: refresh stale company prices in one bulk
+    download and upsert, then value every portfolio and insert today's snapshots in bulk.
+    Returns a job handle at once; poll GET /market/update-portfolio-snapshots/{job_id}.
+    A trigger while a run is in progress returns that run.
+    """
     try:
-        client = get_client().client
-        
-        # Get all companies that have tickers
-        companies_result = client.table('companies').select('id, ticker').not_.is_('ticker', None).execute()
-        companies = companies_result.data or []
-        
-        if not companies:
-            return {"success": True, "message": "No companies with tickers found", "updated_count": 0}
-        
-        updated_count = 0
-        errors = []
-        
-        print(f"Updating prices for {len(companies)} companies...")
-        
-        # Process companies in batches to avoid overwhelming the API
-        batch_size = 10
-        for i in range(0, len(companies), batch_size):
-            batch = companies[i:i + batch_size]
-            
-            # Process batch sequentially to avoid async issues
-            for company in batch:
-                ticker = company.get('ticker')
-                if not ticker:
-                    continue
-                    
-                try:
-                    print(f"Updating price for {ticker}...")
-                    
-                    # Get current price using yfinance
-                    ticker_obj = yf.Ticker(ticker)
-                    info = ticker_obj.fast_info
-                    price = info.get('last_price') or info.get('regularMarketPrice')
-                    
-                    if price is None:
-                        # Try getting from history if fast_info doesn't work
-                        hist = ticker_obj.history(period='1d')
-                        if not hist.empty:
-                            price = float(hist['Close'].iloc[-1])
-                    
-                    if price is not None:
-                        # Update the company record
-                        update_result = client.table('companies').update({
-                            'latest_price': float(price),
-                            'latest_price_as_of': 'now()',
-                            'latest_price_currency': 'USD',
-                            'latest_price_source': 'yfinance'
-                        }).eq('id', company.get('id')).execute()
-                        
-                        if update_result.data:
-                            print(f"Updated {ticker} price to ${price}")
-                            updated_count += 1
-                        else:
-                            print(f"Failed to update {ticker} in database")
-                            errors.append(f"{ticker}: Database update failed")
-                    else:
-                        print(f"Could not get price for {ticker}")
-                        errors.append(f"{ticker}: Price not available")
-                        
-                except Exception as e:
-                    print(f"Error updating {ticker}: {e}")
-                    errors.append(f"{ticker}: {str(e)}")
-            
-            # Small delay between batches to be respectful to the API
-            if i + batch_size < len(companies):
-                import time
-                time.sleep(1)
-        
-        print(f"📈 Price update completed. Updated {updated_count}/{len(companies)} companies.")
-        if errors:
-            print(f"❌ Price update errors encountered: {len(errors)}")
-            for error in errors[:5]:  # Show first 5 errors
-                print(f"   - {error}")
-        else:
-            print(f"✅ All {len(companies)} companies updated successfully")
-        
-        # Now create portfolio snapshots for all portfolios
-        print("📊 Starting portfolio snapshots creation...")
-        snapshot_count = 0
-        skipped_count = 0
-        snapshot_errors = []
-        
-        try:
-            # Get all portfolios
-            portfolios_result = client.table('portfolios').select('id, cash_balance').execute()
-            portfolios = portfolios_result.data or []
-            
-            print(f"📋 Found {len(portfolios)} portfolios to process")
-            
-            # Get today's date for checking existing snapshots
-            from datetime import datetime, timezone
-            today = datetime.now(timezone.utc).date()
-            
-            for i, portfolio in enumerate(portfolios, 1):
-                try:
-                    portfolio_id = portfolio.get('id')
-                    cash_balance = float(portfolio.get('cash_balance', 0))
-                    
-                    print(f"🔄 Processing portfolio {i}/{len(portfolios)}: {portfolio_id}")
-                    
-                    # Check if snapshot already exists for today
-                    existing_snapshot = client.table('portfolio_snapshots').select('id').eq('portfolio_id', portfolio_id).gte('recorded_at', f"{today}T00:00:00Z").lt('recorded_at', f"{today}T23:59:59Z").execute()
-                    
-                    if existing_snapshot.data:
-                        print(f"⏭️  Skipping portfolio {portfolio_id} - snapshot already exists for today")
-                        skipped_count += 1
-                        continue
-                    
-                    # Get positions for this portfolio with company info
-                    positions_result = client.table('positions').select('quantity, avg_entry_price, company_id').eq('portfolio_id', portfolio_id).execute()
-                    positions = positions_result.data or []
-                    
-                    print(f"📈 Portfolio {portfolio_id} has {len(positions)} positions")
-                    
-                    # Calculate total portfolio value
-                    total_value = cash_balance
-                    positions_with_prices = 0
-                    positions_without_prices = 0
-                    
-                    for position in positions:
-                        quantity = abs(float(position.get('quantity', 0)))
-                        company_id = position.get('company_id')
-                        
-                        # Get current price from companies table using company_id
-                        if company_id:
-                            company_result = client.table('companies').select('latest_price, ticker').eq('id', company_id).execute()
-                            if company_result.data:
-                                company_data = company_result.data[0]
-                                current_price = float(company_data.get('latest_price', 0))
-                                if current_price > 0:
-                                    total_value += quantity * current_price
-                                    positions_with_prices += 1
-                                else:
-                                    # Fallback to avg entry price if no current price
-                                    avg_price = float(position.get('avg_entry_price', 0))
-                                    total_value += quantity * avg_price
-                                    positions_without_prices += 1
-                    
-                    print(f"💰 Portfolio {portfolio_id} calculated value: ${total_value:.2f} (${cash_balance:.2f} cash + ${total_value - cash_balance:.2f} positions)")
-                    print(f"📊 Positions: {positions_with_prices} with current prices, {positions_without_prices} using avg prices")
-                    
-                    # Create portfolio snapshot
-                    snapshot_result = client.table('portfolio_snapshots').insert({
-                        'portfolio_id': portfolio_id,
-                        'recorded_at': 'now()',
-                        'total_value': total_value
-                    }).execute()
-                    
-                    if snapshot_result.data:
-                        print(f"✅ Created snapshot for portfolio {portfolio_id}: ${total_value:.2f}")
-                        snapshot_count += 1
-                    else:
-                        print(f"❌ Failed to create snapshot for portfolio {portfolio_id}")
-                        snapshot_errors.append(f"Portfolio {portfolio_id}: Database insert failed")
-                        
-                except Exception as e:
-                    print(f"❌ Error creating snapshot for portfolio {portfolio.get('id')}: {e}")
-                    snapshot_errors.append(f"Portfolio {portfolio.get('id')}: {str(e)}")
-                    
-        except Exception as e:
-            print(f"❌ Error in portfolio snapshot creation: {e}")
-            snapshot_errors.append(f"Snapshot creation error: {str(e)}")
-        
-        print(f"📊 Portfolio snapshots summary:")
-        print(f"   ✅ Created: {snapshot_count}")
-        print(f"   ⏭️  Skipped: {skipped_count}")
-        print(f"   ❌ Errors: {len(snapshot_errors)}")
-        
-        if snapshot_errors:
-            print(f"❌ Snapshot errors encountered:")
-            for error in snapshot_errors[:5]:  # Show first 5 errors
-                print(f"   - {error}")
-        
-        return {
-            "success": True,
-            "message": f"Portfolio snapshots update completed. Updated {updated_count} companies, created {snapshot_count} snapshots, skipped {skipped_count} portfolios.",
-            "updated_prices_count": updated_count,
-            "created_snapshots_count": snapshot_count,
-            "skipped_snapshots_count": skipped_count,
-            "total_companies": len(companies),
-            "total_portfolios": len(portfolios),
-            "price_errors": errors[:10] if errors else [],
-            "snapshot_errors": snapshot_errors[:10] if snapshot_errors else []
-        }
-        
+        job = start_snapshot_job(lambda: get_client().client)
+        return {"success": True, "status_url": f"/market/update-portfolio-snapshots/{job.job_id}", **job.info()}
     except Exception as e:
-        print(f"Error in update_portfolio_snapshots: {e}")
-        import traceback
-        traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/update-portfolio-snapshots/{job_id}")
+async def get_portfolio_snapshots_job(job_id: str):
+    """Status of a snapshot pipeline run; `result` holds the counts once status is done."""
+    job = get_snapshot_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Snapshot job not found")
+    return {"success": job.status != "error", **job.info()}
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from models.schema import SimulationRequest
 from services.websocket_simulation import WebSocketSimulationService
 import json
 from services.validation import validate_simulation_params
+from services.metrics import get_registry
+from services.profiler import is_admin_token, load_profile
+from services.simulation_jobs import create_job, get_job, stream_job
 from api.plaid_routes import router as plaid_router
 from api.database_routes import router as database_router
 from api.sync_routes import router as sync_router
@@ -23,12 +28,28 @@ def health_check():
 def ping():
     return {"status": "OK"}
 
+@router.get("/metrics/simulation")
+def simulation_metrics():
+    # Process-wide phase timings aggregated across simulation runs
+    return get_registry().snapshot()
+
 @router.websocket("/simulate/ws")
 async def simulate_websocket(websocket: WebSocket):
     await websocket.accept()
     data = await websocket.receive_text()
     payload = json.loads(data)
 
+    # Reattach to a simulation that is still running (or recently finished) after a dropped connection
+    resume_job_id = payload.get("resume_job_id")
+    if resume_job_id:
+        job = get_job(resume_job_id)
+        if job is None:
+            await websocket.send_text(json.dumps({"type": "error", "payload": "Simulation job not found or expired."}))
+            await websocket.close()
+            return
+        await stream_job(job, websocket, resume=True)
+        return
+
     params = SimulationRequest(**payload)
 
     # Validate BEFORE loading price data
@@ -38,13 +59,31 @@ async def simulate_websocket(websocket: WebSocket):
         await websocket.close()
         return
 
-    try:
-        service = WebSocketSimulationService(websocket, params)
-        await service.run()
-    except ValueError as e:
-        await websocket.send_text(json.dumps({"type": "error", "payload": str(e)}))
-        await websocket.close()
-        return
+    # The run continues if this socket drops; the client can resume with the job id
+    job = create_job(params)
+    await websocket.send_text(json.dumps({"type": "job", "payload": {"job_id": job.job_id}}))
+    job.start(lambda channel: WebSocketSimulationService(channel, params, job=job).run())
+    await stream_job(job, websocket)
+
+@router.get("/simulate/jobs/{job_id}")
+def get_simulation_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Simulation job not found")
+    return job.info()
+
+@router.get("/simulate/profiles/{profile_id}")
+def get_simulation_profile(profile_id: str, format: str = "json", x_admin_token: Optional[str] = Header(None)):
+    """Fetch a stored simulation profile. `format=folded` returns flamegraph-ready collapsed stacks."""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    stored = load_profile(profile_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    meta, stacks = stored
+    if format == "folded":
+        return PlainTextResponse(stacks)
+    return {**meta, "stacks": stacks}
 
 # Include Plaid routes
 router.include_router(plaid_router)
@@ -0,0 +1,50 @@
+-- Precomputed universe for /market/universe and UniverseService.get_top
+-- Run this in your Supabase SQL editor
+
+-- Step 1: Tradable companies with their market-cap bucket
+CREATE MATERIALIZED VIEW IF NOT EXISTS universe_ranked AS
+SELECT
+    ticker,
+    latest_price,
+    market_cap,
+    avg_volume_30d,
+    median_dollar_volume_30d,
+    exchange,
+    CASE
+        WHEN market_cap < 300000000 THEN 'micro'
+        WHEN market_cap < 2000000000 THEN 'small'
+        WHEN market_cap < 10000000000 THEN 'mid'
+        ELSE 'large'
+    END AS cap_bucket
+FROM companies
+WHERE exchange IN ('NASDAQ', 'NYSE', 'AMEX')
+  AND is_otc = false
+  AND is_etf = false
+  AND is_warrant = false
+  AND latest_price >= 1
+  AND market_cap IS NOT NULL;
+
+-- Step 2: Indexes matching the queries (bucket filter, ordered by liquidity)
+-- The unique index is required for REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_universe_ranked_ticker ON universe_ranked(ticker);
+CREATE INDEX IF NOT EXISTS idx_universe_ranked_bucket_volume ON universe_ranked(cap_bucket, avg_volume_30d DESC);
+CREATE INDEX IF NOT EXISTS idx_universe_ranked_volume ON universe_ranked(avg_volume_30d DESC);
+
+-- Step 3: Refresh without blocking readers; called by scripts/enrich_companies.py
+CREATE OR REPLACE FUNCTION refresh_universe_ranked()
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.universe_ranked;
+$$;
+
+-- Only the backend (service role) may trigger a refresh; EXECUTE is granted to PUBLIC by default
+REVOKE EXECUTE ON FUNCTION refresh_universe_ranked() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_universe_ranked() TO service_role;
+
+GRANT SELECT ON universe_ranked TO anon, authenticated, service_role;
+
+-- Verify
+SELECT cap_bucket, COUNT(*) FROM universe_ranked GROUP BY cap_bucket ORDER BY cap_bucket;
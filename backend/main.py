@@ -14,6 +14,7 @@ load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.routes import router
+from services.price_refresher import PRICE_REFRESHER_ENABLED, get_price_refresher
 import requests
 
 def download_sp500_csv_if_missing():
@@ -54,3 +55,15 @@ app.add_middleware(
 )
 
 app.include_router(router)
+
+
+@app.on_event("startup")
+async def start_price_refresher():
+    # Keep held and recently quoted tickers warm so quote requests never fetch inline
+    if PRICE_REFRESHER_ENABLED:
+        get_price_refresher().start()
+
+
+@app.on_event("shutdown")
+async def stop_price_refresher():
+    await get_price_refresher().stop()
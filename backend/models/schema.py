@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class SimulationRequest(BaseModel):
     start_date: str = "2025-01-01"
@@ -10,6 +10,22 @@ class SimulationRequest(BaseModel):
     top_n: Optional[int] = 10
     starting_value: float = 10000.0
     benchmark: str = "SPY"
+    extra_benchmarks: Optional[List[str]] = None
     strategy: str = "momentum"
     tp_threshold: Optional[int] = 10
-    sl_threshold: Optional[int] = 5
\ No newline at end of file
+    sl_threshold: Optional[int] = 5
+    include_timings: bool = False
+    profile: bool = False
+    admin_token: Optional[str] = None
+    memory_budget_mb: Optional[int] = None
+    compact_prices: bool = False
+    screen_pairs: bool = False
+    bar_interval: Optional[str] = None
+    nav_sample_minutes: int = 30
+    summary_only: bool = False
+    robustness_paths: Optional[int] = None
+    bootstrap_block_days: int = 21
+    robustness_seed: Optional[int] = None
+    walk_forward_folds: Optional[int] = None
+    walk_forward_train_months: int = 12
+    walk_forward_grid: Optional[Dict[str, List[int]]] = None
\ No newline at end of file
@@ -57,9 +57,9 @@ class Trade:
         
         self.pnl_pct = (self.pnl / self.entry_order.amount) * 100
         
-        # Calculate duration
-        entry_date = datetime.strptime(self.entry_order.date, "%Y-%m-%d")
-        exit_date = datetime.strptime(exit_order.date, "%Y-%m-%d")
+        # Calculate duration (intraday orders are dated "YYYY-MM-DD HH:MM")
+        entry_date = datetime.strptime(self.entry_order.date[:10], "%Y-%m-%d")
+        exit_date = datetime.strptime(exit_order.date[:10], "%Y-%m-%d")
         self.duration_days = (exit_date - entry_date).days
 
     def get_current_pnl(self, current_price: float) -> float:
@@ -130,8 +130,9 @@ def main():
 		}
 		enriched_universe.append(cand)
 
-	# No separate snapshot table; universe served from companies
-	print("Universe candidates available via /market/universe from companies filters")
+	# /market/universe reads the universe_ranked view; recompute it from the enriched companies
+	resp = get_universe().refresh()
+	print(f"Refreshed universe_ranked: {resp}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Download intraday bars from Yahoo into the local bar store that intraday backtests read.
+
+    python scripts/ingest_bars.py TQQQ SQQQ SPY --interval 5m
+    python scripts/ingest_bars.py TQQQ --interval 1h --start 2024-01-01 --end 2024-12-31
+
+Run it on a schedule: Yahoo only serves recent intraday history (60 days of 5m bars,
+30 days of 1m), so the store grows by re-running before bars age out. Overlapping runs
+replace bars already stored.
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from utils.bar_store import BAR_INTERVALS, BarStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest intraday bars into the local bar store.")
+    parser.add_argument("tickers", nargs="+", help="symbols to download, e.g. TQQQ SPY")
+    parser.add_argument("--interval", default="5m", choices=list(BAR_INTERVALS))
+    parser.add_argument("--start", help="YYYY-MM-DD (default: as far back as Yahoo serves)")
+    parser.add_argument("--end", default=date.today().isoformat(), help="YYYY-MM-DD, inclusive (default: today)")
+    parser.add_argument("--root", help="store directory (default: INTRADAY_BAR_STORE_DIR)")
+    args = parser.parse_args()
+
+    store = BarStore(args.interval, root=args.root)
+    start = args.start or (date.today() - timedelta(days=BAR_INTERVALS[args.interval][1] - 1)).isoformat()
+    tickers = [t.strip().upper() for t in args.tickers]
+    print(f"Ingesting {args.interval} bars for {len(tickers)} tickers, {start} to {args.end}...")
+    for ticker, count in store.ingest(tickers, start, args.end).items():
+        print(f"  {ticker}: {count} bars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+DAYS_PER_YEAR = 365.25
+
+
+def _round(value, digits=4):
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _nav_points(dates, values):
+    """(DatetimeIndex, float NAV array) without weekend points and missing values.
+
+    The daily loop values every calendar day, so weekends repeat Friday's NAV; keeping
+    them would add zero returns and understate volatility.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values) & (index.dayofweek < 5)
+    return index[keep], values[keep]
+
+
+def _periods_per_year(index):
+    """Observations per year implied by the sampling (about 252 for daily NAV)."""
+    years = (index[-1] - index[0]).total_seconds() / (DAYS_PER_YEAR * 86400)
+    if years <= 0:
+        return TRADING_DAYS_PER_YEAR
+    return (len(index) - 1) / years
+
+
+def _label(ts):
+    return str(ts.date()) if ts == ts.normalize() else ts.strftime("%Y-%m-%d %H:%M")
+
+
+def max_drawdown(index, nav):
+    """Deepest peak-to-trough fall, with its peak, trough and recovery dates (None if not recovered)."""
+    peaks = np.maximum.accumulate(nav)
+    drawdowns = nav / peaks - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(nav[:trough + 1]))
+    recovered = np.flatnonzero(nav[trough:] >= nav[peak])
+    return {
+        "max_drawdown_pct": _round(drawdowns[trough] * 100, 2),
+        "peak_date": _label(index[peak]),
+        "trough_date": _label(index[trough]),
+        "recovery_date": _label(index[trough + recovered[0]]) if len(recovered) else None,
+    }
+
+
+def rolling_returns(index, nav, days=365):
+    """Trailing `days`-calendar-day returns at every point with a full window, as an array."""
+    lookback = index - pd.Timedelta(days=days)
+    rows = np.searchsorted(index.values, lookback.values, side="right") - 1
+    valid = rows >= 0
+    return nav[valid] / nav[rows[valid]] - 1
+
+
+def performance_metrics(dates, values, risk_free_rate=0.0):
+    """Return and risk statistics of a NAV series given as parallel date and value sequences."""
+    index, nav = _nav_points(dates, values)
+    if len(nav) < 2:
+        return {}
+    ppy = _periods_per_year(index)
+    returns = np.diff(nav) / nav[:-1]
+    years = (index[-1] - index[0]).total_seconds() / (DAYS_PER_YEAR * 86400)
+    excess = returns - risk_free_rate / ppy
+    std = returns.std(ddof=1) if len(returns) > 1 else np.nan
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2))
+
+    metrics = {
+        "total_return_pct": _round((nav[-1] / nav[0] - 1) * 100, 2),
+        "cagr_pct": _round(((nav[-1] / nav[0]) ** (1 / years) - 1) * 100, 2) if years > 0 else None,
+        "volatility_pct": _round(std * np.sqrt(ppy) * 100, 2),
+        "sharpe": _round(excess.mean() / std * np.sqrt(ppy), 3) if std > 0 else None,
+        "sortino": _round(excess.mean() / downside * np.sqrt(ppy), 3) if downside > 0 else None,
+        "best_period_pct": _round(returns.max() * 100, 2),
+        "worst_period_pct": _round(returns.min() * 100, 2),
+    }
+    metrics.update(max_drawdown(index, nav))
+
+    rolling = rolling_returns(index, nav)
+    metrics["rolling_1y"] = {
+        "count": int(len(rolling)),
+        "min_pct": _round(rolling.min() * 100, 2),
+        "median_pct": _round(np.median(rolling) * 100, 2),
+        "max_pct": _round(rolling.max() * 100, 2),
+        "latest_pct": _round(rolling[-1] * 100, 2),
+    } if len(rolling) else None
+    return metrics
+
+
+def trade_metrics(trades, dates, values):
+    """Ledger statistics from Trade.to_dict() rows, relative to the NAV series."""
+    index, nav = _nav_points(dates, values)
+    closed = [t for t in trades if t.get("status") == "closed"]
+    pnl = np.array([t.get("pnl") or 0.0 for t in closed], dtype=float)
+    durations = np.array([t.get("duration_days") or 0 for t in closed], dtype=float)
+
+    notional = sum(t["entry_order"]["amount"] + (t["exit_order"]["amount"] if t.get("exit_order") else 0) for t in trades)
+    mean_nav = float(nav.mean()) if len(nav) else np.nan
+    span_days = max((index[-1] - index[0]).days, 1) if len(index) else np.nan
+
+    # Capital-days held per ticker, as a fraction of average NAV over the period
+    exposure = {}
+    for t in trades:
+        entry = t["entry_order"]
+        exit_date = t["exit_order"]["date"] if t.get("exit_order") else (str(index[-1].date()) if len(index) else entry["date"])
+        held = max((pd.Timestamp(exit_date[:10]) - pd.Timestamp(entry["date"][:10])).days, 1)
+        key = t["ticker"]
+        exposure[key] = exposure.get(key, 0.0) + entry["amount"] * held
+
+    return {
+        "trades": len(trades),
+        "closed_trades": len(closed),
+        "hit_rate_pct": _round((pnl > 0).mean() * 100, 2) if len(pnl) else None,
+        "avg_win": _round(pnl[pnl > 0].mean(), 2) if (pnl > 0).any() else None,
+        "avg_loss": _round(pnl[pnl < 0].mean(), 2) if (pnl < 0).any() else None,
+        "avg_holding_days": _round(durations.mean(), 2) if len(durations) else None,
+        "traded_notional": _round(notional, 2),
+        "turnover_annual": _round(notional / 2 / mean_nav / (span_days / DAYS_PER_YEAR), 3) if len(nav) else None,
+        "exposure_by_ticker": {
+            ticker: _round(capital_days / (mean_nav * span_days), 4)
+            for ticker, capital_days in sorted(exposure.items(), key=lambda item: -item[1])
+        } if len(nav) else {},
+    }
+
+
+def simulation_metrics(nav_dates, nav_values, benchmark_values, trades, risk_free_rate=0.0):
+    """The `metrics` block of a simulation result: portfolio, benchmark and ledger statistics."""
+    portfolio = performance_metrics(nav_dates, nav_values, risk_free_rate)
+    benchmark = performance_metrics(
+        nav_dates, [np.nan if v is None else v for v in benchmark_values], risk_free_rate
+    )
+    return {
+        "portfolio": portfolio,
+        "benchmark": benchmark,
+        "trading": trade_metrics(trades, nav_dates, nav_values),
+    }
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+EQUAL_WEIGHT = "equal_weight"
+
+
+def _asof_values(df, calendar):
+    """adj_close as of each calendar day (Series.asof semantics), NaN before the first bar."""
+    series = df["adj_close"].dropna()
+    series = series[~series.index.duplicated(keep="last")].sort_index()
+    rows = np.searchsorted(series.index.values, calendar.values, side="right") - 1
+    values = series.to_numpy(dtype=np.float64)
+    return np.where(rows >= 0, values[np.maximum(rows, 0)], np.nan)
+
+
+class BenchmarkSet:
+    """Benchmark NAV curves computed once on the engine's calendar (every day from start to end).
+
+    Each curve is `starting_value` invested on start_date: shares x the forward-filled
+    price for a ticker, or a daily-rebalanced equal-weight portfolio of the strategy's
+    initial universe for EQUAL_WEIGHT. The engine and strategies read values by day
+    offset (`index(date)`), which replaces a pandas asof lookup and an await per day.
+    """
+
+    def __init__(self, start_date, end_date, starting_value):
+        self.calendar = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq="D")
+        self.start = self.calendar[0] if len(self.calendar) else pd.Timestamp(start_date)
+        self.starting_value = starting_value
+        self.curves = {}  # { name: float64 array aligned to calendar, NaN where unknown }
+
+    def __contains__(self, name):
+        return name in self.curves
+
+    @property
+    def names(self):
+        return list(self.curves)
+
+    def add_ticker(self, name, df):
+        if df is None or df.empty:
+            return
+        prices = _asof_values(df, self.calendar)
+        valid = np.flatnonzero(np.isfinite(prices))
+        if not len(valid):
+            return
+        shares = self.starting_value / prices[valid[0]]
+        self.curves[name] = np.round(shares * prices, 2)
+
+    def add_equal_weight(self, price_data, exclude=()):
+        """Equal-weight, daily-rebalanced NAV of every ticker in `price_data` except `exclude`."""
+        frames = [df for t, df in price_data.items() if t not in exclude and df is not None and not df.empty]
+        if not frames or not len(self.calendar):
+            return
+        prices = np.column_stack([_asof_values(df, self.calendar) for df in frames])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = prices[1:] / prices[:-1] - 1
+        returns = np.where(np.isfinite(returns), returns, np.nan)
+        counts = np.isfinite(returns).sum(axis=1)
+        mean = np.where(counts > 0, np.nansum(returns, axis=1) / np.maximum(counts, 1), 0.0)
+        nav = self.starting_value * np.concatenate([[1.0], np.cumprod(1 + mean)])
+        self.curves[EQUAL_WEIGHT] = np.round(nav, 2)
+
+    def index(self, date):
+        """Day offset of `date` in the calendar."""
+        return (pd.Timestamp(date).normalize() - self.start).days
+
+    def value(self, name, i):
+        curve = self.curves.get(name)
+        if curve is None or i < 0 or i >= len(curve) or not np.isfinite(curve[i]):
+            return None
+        return float(curve[i])
+
+    def values(self, i, names=None):
+        """{ name: value } on day `i` for `names` (default every curve)."""
+        return {name: self.value(name, i) for name in (names or self.curves)}
+
+    def final(self, name):
+        curve = self.curves.get(name)
+        if curve is None:
+            return None
+        finite = np.flatnonzero(np.isfinite(curve))
+        return float(curve[finite[-1]]) if len(finite) else None
@@ -0,0 +1,158 @@
+import os
+import zlib
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows dev machines
+    resource = None
+
+MEMORY_BUDGET_MB = int(os.getenv("SIMULATION_MEMORY_BUDGET_MB", "768"))
+
+# Rough per-cell costs, measured on yfinance batch downloads. A "cell" is one ticker on one trading day.
+LOAD_BYTES_PER_CELL = 64      # wide OHLCV frame from yf.download plus the extracted adj_close frame
+DAILY_POINT_BYTES = 600       # one daily_values dict + one daily_benchmark_values dict
+TRADE_BYTES = 1500            # Trade + two Orders + legacy order dict
+TRADING_DAYS_PER_YEAR = 252
+MIN_SAMPLED_UNIVERSE = 60
+SAMPLE_EVERY_DAYS = 30
+
+
+class MemoryBudgetExceeded(ValueError):
+    """Raised when a simulation cannot fit in its memory budget even after degrading."""
+
+
+def sample_universe(tickers, fraction, always_keep=()):
+    """Deterministically keep about `fraction` of `tickers`.
+
+    Membership depends only on the ticker symbol, so the same names survive every
+    S&P membership update and sampling does not create artificial turnover.
+    """
+    if fraction is None or fraction >= 1:
+        return set(tickers)
+    cutoff = int(fraction * 10_000)
+    keep = set(always_keep)
+    return {t for t in tickers if t in keep or zlib.crc32(t.encode()) % 10_000 < cutoff}
+
+
+def _mb(n_bytes):
+    return round(n_bytes / (1024 * 1024), 2)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the whole process (not just this simulation)."""
+    if resource is None:
+        return None
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryPlan:
+    def __init__(self, budget_bytes, estimated_bytes, universe_fraction=None, retain_daily_values=True, degraded=None):
+        self.budget_bytes = budget_bytes
+        self.estimated_bytes = estimated_bytes
+        self.universe_fraction = universe_fraction
+        self.retain_daily_values = retain_daily_values
+        self.degraded = degraded or []
+
+
+class MemoryTracker:
+    """Tracks the memory footprint of one simulation: price data, ledger and retained frames.
+
+    `plan()` runs before any data is loaded and decides whether the request fits the budget
+    as-is, fits after degrading (dropping retained daily_values, then down-sampling the
+    universe), or must be refused. `observe()` samples the live footprint during the run.
+    """
+
+    def __init__(self, budget_mb=None):
+        budget_mb = MEMORY_BUDGET_MB if budget_mb is None else min(budget_mb, MEMORY_BUDGET_MB)
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.plan_result = None
+        self.price_data_bytes = 0
+        self.ledger_bytes = 0
+        self.buffered_frames = 0
+        self.peak_tracked_bytes = 0
+        self._days_seen = 0
+
+    @staticmethod
+    def estimate_cells(n_tickers, start_date, end_date, history_months):
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        years = (end - start).days / 365.25 + history_months / 12
+        return n_tickers * int(years * TRADING_DAYS_PER_YEAR + 1)
+
+    def plan(self, n_tickers, start_date, end_date, history_months, can_sample_universe=False):
+        calendar_days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+        cells = self.estimate_cells(n_tickers, start_date, end_date, history_months)
+        load_bytes = cells * LOAD_BYTES_PER_CELL
+        daily_bytes = calendar_days * DAILY_POINT_BYTES
+        budget = self.budget_bytes
+
+        if load_bytes + daily_bytes <= budget:
+            self.plan_result = MemoryPlan(budget, load_bytes + daily_bytes)
+            return self.plan_result
+
+        degraded = ["daily_values_not_retained"]
+        if load_bytes <= budget:
+            self.plan_result = MemoryPlan(budget, load_bytes, retain_daily_values=False, degraded=degraded)
+            return self.plan_result
+
+        fraction = budget / load_bytes
+        if not can_sample_universe or n_tickers * fraction < MIN_SAMPLED_UNIVERSE:
+            raise MemoryBudgetExceeded(
+                f"Simulation needs about {_mb(load_bytes)} MB of price data, over the "
+                f"{_mb(budget)} MB budget. Shorten the date range or lookback."
+            )
+        degraded.append(f"universe_sampled_to_{int(n_tickers * fraction)}_tickers")
+        self.plan_result = MemoryPlan(
+            budget, int(load_bytes * fraction), universe_fraction=fraction,
+            retain_daily_values=False, degraded=degraded
+        )
+        return self.plan_result
+
+    def observe(self, price_data=None, portfolio=None, buffered_frames=None, force=False):
+        """Sample the live footprint. Cheap enough to call daily; only measures every SAMPLE_EVERY_DAYS."""
+        self._days_seen += 1
+        if buffered_frames is not None:
+            self.buffered_frames = buffered_frames
+        if not force and self._days_seen % SAMPLE_EVERY_DAYS != 1:
+            return self.tracked_bytes()
+        if price_data is not None:
+            total = 0
+            seen_indexes = set()
+            for df in price_data.values():
+                try:
+                    total += int(df.memory_usage(index=False, deep=False).sum())
+                    # Compact price data shares one index across tickers; count it once
+                    if id(df.index) not in seen_indexes:
+                        seen_indexes.add(id(df.index))
+                        total += int(df.index.nbytes)
+                except Exception:
+                    continue
+            self.price_data_bytes = total
+        if portfolio is not None:
+            n_trades = len(getattr(portfolio, "trades", {}))
+            self.ledger_bytes = n_trades * TRADE_BYTES
+        return self.tracked_bytes()
+
+    def tracked_bytes(self):
+        tracked = self.price_data_bytes + self.ledger_bytes + self.buffered_frames * DAILY_POINT_BYTES
+        self.peak_tracked_bytes = max(self.peak_tracked_bytes, tracked)
+        return tracked
+
+    def over_budget(self):
+        return self.tracked_bytes() > self.budget_bytes
+
+    def report(self):
+        plan = self.plan_result
+        rss = peak_rss_bytes()
+        return {
+            "budget_mb": _mb(self.budget_bytes),
+            "estimated_mb": _mb(plan.estimated_bytes) if plan else None,
+            "price_data_mb": _mb(self.price_data_bytes),
+            "ledger_kb": round(self.ledger_bytes / 1024, 1),
+            "buffered_frames": self.buffered_frames,
+            "peak_tracked_mb": _mb(self.peak_tracked_bytes),
+            "process_peak_rss_mb": _mb(rss) if rss is not None else None,
+            "degraded": list(plan.degraded) if plan else [],
+        }
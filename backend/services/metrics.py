@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+
+def _summarize(samples, total=None, count=None):
+    """Build a totals/count/percentile block (milliseconds) from a list of durations in seconds."""
+    arr = np.asarray(samples, dtype=float)
+    count = len(arr) if count is None else count
+    total = float(arr.sum()) if total is None else total
+    if arr.size == 0:
+        return {"total_sec": round(total, 4), "count": count}
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99]) * 1000
+    return {
+        "total_sec": round(total, 4),
+        "count": count,
+        "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(arr.max()) * 1000, 3),
+    }
+
+
+class PhaseTimer:
+    """Collects per-phase durations and counters for a single simulation run."""
+
+    def __init__(self):
+        self.samples = {}  # { phase: [seconds, ...] }
+        self.counters = {}  # { name: int }
+        self.started_at = time.perf_counter()
+
+    def record(self, phase, seconds):
+        self.samples.setdefault(phase, []).append(seconds)
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        phases = {phase: _summarize(values) for phase, values in self.samples.items()}
+        return {
+            "wall_sec": round(time.perf_counter() - self.started_at, 4),
+            "phases": phases,
+            "counters": dict(self.counters),
+        }
+
+
+class MetricsRegistry:
+    """Process-wide aggregate of phase timings across all simulation runs.
+
+    Totals and counts are exact; percentiles come from a bounded reservoir of the
+    most recent samples per phase so memory stays flat on long-lived dynos.
+    """
+
+    def __init__(self, reservoir_size=2048):
+        self._lock = threading.Lock()
+        self._reservoir_size = reservoir_size
+        self._phases = {}  # { phase: {"count": int, "total": float, "recent": deque} }
+        self._counters = {}
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            entry = self._phases.get(phase)
+            if entry is None:
+                entry = {"count": 0, "total": 0.0, "recent": deque(maxlen=self._reservoir_size)}
+                self._phases[phase] = entry
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["recent"].append(seconds)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            phases = {
+                phase: _summarize(list(entry["recent"]), total=entry["total"], count=entry["count"])
+                for phase, entry in self._phases.items()
+            }
+            return {"phases": phases, "counters": dict(self._counters)}
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+            self._counters.clear()
+
+
+_registry = MetricsRegistry()
+_active_timer = ContextVar("active_phase_timer", default=None)
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the global metrics registry instance"""
+    return _registry
+
+
+def activate(timer):
+    """Make `timer` the run-level collector for the current task. Returns a token for `deactivate`."""
+    return _active_timer.set(timer)
+
+
+def deactivate(token):
+    _active_timer.reset(token)
+
+
+def current_timer():
+    return _active_timer.get()
+
+
+@contextmanager
+def timed(phase):
+    """Time a block, recording it on the active run (if any) and on the process registry."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timer = _active_timer.get()
+        if timer is not None:
+            timer.record(phase, elapsed)
+        _registry.observe(phase, elapsed)
+
+
+def incr(name, n=1):
+    """Bump a counter on the active run (if any) and on the process registry."""
+    timer = _active_timer.get()
+    if timer is not None:
+        timer.incr(name, n)
+    _registry.incr(name, n)
@@ -32,7 +32,8 @@ class Portfolio:
         price = df["adj_close"].asof(pd.to_datetime(date_str))
         if pd.isna(price):
             raise ValueError(f"No price available for {ticker} on {date_str}")
-        return price
+        # float() so compact (float32) price data stays JSON-serializable in the ledger
+        return float(price)
 
     def _generate_trade_id(self):
         """Generate a unique trade ID"""
@@ -323,3 +324,21 @@ class Portfolio:
             "short_proceeds": self.short_proceeds.copy(),
             "total_value": self.value_on(date_str)
         }
+
+
+class IntradayPortfolio(Portfolio):
+    """Portfolio priced from the latest bar per ticker instead of daily frames.
+
+    The intraday engine streams bars and updates `last_prices` before each strategy call,
+    so trades and valuations use the most recent close without any price history in memory.
+    """
+
+    def __init__(self, starting_value):
+        super().__init__(starting_value, {})
+        self.last_prices = {}  # { ticker: latest close }
+
+    def _get_price(self, ticker, date_str):
+        price = self.last_prices.get(ticker)
+        if price is None:
+            raise ValueError(f"No bar seen yet for {ticker} as of {date_str}")
+        return float(price)
@@ -1,19 +1,36 @@
 import os
+import re
+import time
 import pandas as pd
 from datetime import datetime
 from dateutil.rrule import rrule, MONTHLY
 
-CACHE_DIR = "backend/data/price_cache"
+CACHE_DIR = os.getenv("PRICE_CACHE_DIR", "data/price_cache")
+# The running month's chunk is still growing; re-download it once it is older than this
+CURRENT_MONTH_TTL_SEC = int(os.getenv("PRICE_CACHE_CURRENT_MONTH_TTL_SEC", "3600"))
+# Tickers name directories under the cache root, so only plain symbols are accepted (never "." or "..")
+TICKER_RE = re.compile(r"^(?!\.+$)[A-Z0-9.\-^=]{1,15}$")
+
+
+def is_valid_ticker(ticker):
+    return isinstance(ticker, str) and TICKER_RE.match(ticker) is not None
+
 
 class PriceCache:
-    def __init__(self):
-        os.makedirs(CACHE_DIR, exist_ok=True)
+    def __init__(self, root=None):
+        self.root = root or CACHE_DIR
+        os.makedirs(self.root, exist_ok=True)
+
+    def _ticker_dir(self, ticker):
+        if not is_valid_ticker(ticker):
+            raise ValueError(f"Invalid ticker: {ticker!r}")
+        return os.path.join(self.root, ticker)
 
     def _get_chunk_path(self, ticker, year, month):
-        return os.path.join(CACHE_DIR, ticker, f"{year:04d}-{month:02d}.parquet")
+        return os.path.join(self._ticker_dir(ticker), f"{year:04d}-{month:02d}.parquet")
 
     def _ensure_ticker_dir(self, ticker):
-        path = os.path.join(CACHE_DIR, ticker)
+        path = self._ticker_dir(ticker)
         os.makedirs(path, exist_ok=True)
 
     def _fetch_and_cache_chunk(self, ticker, year, month):
@@ -34,27 +51,67 @@ class PriceCache:
         df.to_parquet(self._get_chunk_path(ticker, year, month), index=False)
         return df
 
+    def _read_chunk(self, ticker, year, month):
+        path = self._get_chunk_path(ticker, year, month)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _write_chunk(self, ticker, year, month, chunk):
+        self._ensure_ticker_dir(ticker)
+        chunk.to_parquet(self._get_chunk_path(ticker, year, month), index=False)
+
+    def _chunk_age(self, ticker, year, month):
+        """Seconds since the chunk was written, or None if there is none."""
+        path = self._get_chunk_path(ticker, year, month)
+        return time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+
     def save_bulk_data(self, ticker, df):
         if isinstance(df.columns, pd.MultiIndex):
             df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
 
         df = df[["Adj Close"]].reset_index().rename(columns={"Date": "date", "Adj Close": "adj_close"})
-        df["ticker"] = ticker
         df["date"] = pd.to_datetime(df["date"])
 
-        self._ensure_ticker_dir(ticker)
-
         for dt in df["date"].dt.to_period("M").unique():
             month_start = dt.to_timestamp()
-            month_end = (month_start + pd.offsets.MonthEnd(0))
-
-            chunk = df[(df["date"] >= month_start) & (df["date"] <= month_end)]
-            if chunk.empty:
-                continue
-
-            chunk_path = self._get_chunk_path(ticker, month_start.year, month_start.month)
-            chunk.to_parquet(chunk_path, index=False)
-            print(f"[CACHE] Saved {ticker} {month_start.strftime('%Y-%m')} ({len(chunk)} rows)")
+            self.save_month(ticker, month_start.year, month_start.month, df)
+
+    def save_month(self, ticker, year, month, df):
+        """Write the rows of a [date, adj_close] frame that fall in one month.
+
+        A month without rows is written empty, so callers decide which gaps are real
+        (e.g. before a listing) and should not be downloaded again.
+        """
+        month_start = pd.Timestamp(year=year, month=month, day=1)
+        month_end = month_start + pd.offsets.MonthEnd(0)
+        chunk = df[(df["date"] >= month_start) & (df["date"] <= month_end)][["date", "adj_close"]].copy()
+        chunk["ticker"] = ticker
+        self._write_chunk(ticker, year, month, chunk)
+        print(f"[CACHE] Saved {ticker} {month_start.strftime('%Y-%m')} ({len(chunk)} rows)")
+
+    def missing_months(self, ticker, start_date, end_date, now=None):
+        """(year, month) pairs in the range with no chunk on disk, or whose running-month chunk is stale."""
+        now = now or datetime.now()
+        missing = []
+        for dt in rrule(MONTHLY, dtstart=pd.to_datetime(start_date).replace(day=1), until=pd.to_datetime(end_date)):
+            age = self._chunk_age(ticker, dt.year, dt.month)
+            if age is None or ((dt.year, dt.month) >= (now.year, now.month) and age > CURRENT_MONTH_TTL_SEC):
+                missing.append((dt.year, dt.month))
+        return missing
+
+    def read_range(self, ticker, start_date, end_date):
+        """Cached [date, adj_close] rows in [start_date, end_date], sorted by date; empty if none."""
+        start = pd.to_datetime(start_date)
+        end = pd.to_datetime(end_date)
+        chunks = []
+        for dt in rrule(MONTHLY, dtstart=start.replace(day=1), until=end):
+            chunk = self._read_chunk(ticker, dt.year, dt.month)
+            if chunk is not None and not chunk.empty:
+                chunks.append(chunk[["date", "adj_close"]])
+        if not chunks:
+            return pd.DataFrame(columns=["date", "adj_close"])
+        combined = pd.concat(chunks, ignore_index=True)
+        combined["date"] = pd.to_datetime(combined["date"])
+        return combined[(combined["date"] >= start) & (combined["date"] <= end)].sort_values("date")
 
     def get_or_fetch(self, ticker, start_date, end_date):
         start = pd.to_datetime(start_date)
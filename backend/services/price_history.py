@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from services.price_cache import PriceCache
+from utils.data_fetcher import DataFetcher
+from utils.downsample import lttb_indices
+
+HISTORY_CACHE_TTL_SEC = int(os.getenv("HISTORY_CACHE_TTL_SEC", "3600"))
+HISTORY_CACHE_MAX_ENTRIES = int(os.getenv("HISTORY_CACHE_MAX_ENTRIES", "1000"))
+DEFAULT_POINTS = 300
+MAX_POINTS = 2000
+RANGES = {
+    "1m": timedelta(days=31),
+    "3m": timedelta(days=92),
+    "6m": timedelta(days=183),
+    "1y": timedelta(days=366),
+    "2y": timedelta(days=731),
+    "5y": timedelta(days=1827),
+    "10y": timedelta(days=3653),
+    "20y": timedelta(days=7305),
+    "max": timedelta(days=365 * 40),
+}
+# Per-ticker locks so concurrent requests for an uncached ticker download it once
+_fill_locks = {}
+_fill_locks_guard = threading.Lock()
+
+
+def resolve_range(range_key, today=None):
+    """(start, end) dates for a range key: one of RANGES, 'ytd', or 'YYYY-MM-DD:YYYY-MM-DD'."""
+    today = today or datetime.now().date()
+    if range_key == "ytd":
+        return today.replace(month=1, day=1), today
+    if range_key in RANGES:
+        return today - RANGES[range_key], today
+    try:
+        start, end = (datetime.strptime(part, "%Y-%m-%d").date() for part in range_key.split(":"))
+    except ValueError:
+        raise ValueError(f"Unknown range '{range_key}'; use one of {', '.join(['ytd', *RANGES])} or YYYY-MM-DD:YYYY-MM-DD")
+    if start > end:
+        raise ValueError("Range start is after its end")
+    return start, end
+
+
+def _fill_lock(ticker):
+    with _fill_locks_guard:
+        return _fill_locks.setdefault(ticker, threading.Lock())
+
+
+def load_closes(ticker, start, end, store=None):
+    """Daily adjusted closes for [start, end] from the local price store.
+
+    Months the store does not have yet are downloaded from Yahoo in one request spanning
+    the missing months and saved, so each ticker-month is fetched once. Empty months are
+    only saved up to the last date Yahoo returned (e.g. before a listing); an empty or
+    failed download saves nothing, so a throttled request is retried next time.
+    """
+    store = store or PriceCache()
+    with _fill_lock(ticker):
+        missing = store.missing_months(ticker, start, end)
+        if missing:
+            first = pd.Timestamp(year=missing[0][0], month=missing[0][1], day=1)
+            last = pd.Timestamp(year=missing[-1][0], month=missing[-1][1], day=1) + pd.offsets.MonthEnd(0)
+            df = DataFetcher()._fetch_ticker(ticker, first.strftime("%Y-%m-%d"), (last + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+            if not isinstance(df, str) and not df.empty:
+                last_date = df["date"].max()
+                for year, month in missing:
+                    if pd.Timestamp(year=year, month=month, day=1) <= last_date:
+                        store.save_month(ticker, year, month, df)
+    return store.read_range(ticker, start, end)
+
+
+def downsample(df, points):
+    """`df` reduced to at most `points` rows with LTTB over (day number, close)."""
+    if len(df) <= points:
+        return df
+    x = df["date"].to_numpy(dtype="datetime64[D]").astype("int64")
+    return df.iloc[lttb_indices(x, df["adj_close"].to_numpy(), points)]
+
+
+def history_payload(ticker, range_key, points, store=None):
+    """The JSON body of a history response for one ticker."""
+    start, end = resolve_range(range_key)
+    df = load_closes(ticker, start, end, store).dropna(subset=["adj_close"])
+    sampled = downsample(df, points)
+    return {
+        "ticker": ticker,
+        "range": range_key,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source_points": len(df),
+        "points": len(sampled),
+        "series": [
+            {"date": d.strftime("%Y-%m-%d"), "adj_close": round(float(c), 4)}
+            for d, c in zip(sampled["date"], sampled["adj_close"])
+        ],
+    }
+
+
+def etag_for(payload):
+    return '"' + hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest() + '"'
+
+
+class HistoryCache:
+    """Downsampled history responses keyed by (ticker, range, points), with their ETags.
+
+    Entries live HISTORY_CACHE_TTL_SEC (the running month's store chunk is refreshed on
+    the same clock) and the least recently used beyond `max_entries` are evicted.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, store=None):
+        self.store = store
+        self.ttl = HISTORY_CACHE_TTL_SEC if ttl is None else ttl
+        self.max_entries = HISTORY_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # { key: (expires_at, etag, payload) }
+
+    def get_or_build(self, ticker, range_key, points):
+        """(etag, payload) for the key, building and caching the payload on a miss."""
+        key = (ticker, range_key, points)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+        payload = history_payload(ticker, range_key, points, self.store)
+        etag = etag_for(payload)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, etag, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+
+
+def get_history_cache() -> HistoryCache:
+    """Get the global history cache instance"""
+    global _cache
+    if _cache is None:
+        _cache = HistoryCache()
+    return _cache
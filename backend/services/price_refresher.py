@@ -0,0 +1,177 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from services.quote_stream import get_quote_hub
+from services.quotes import price_rows, refresh_quotes, upsert_prices
+from supabase_services.client import select_all
+from utils.market_calendar import POST, PRE, REGULAR, TRACK_EXTENDED_HOURS, market_session, next_session_start
+from utils.quote_cache import get_quote_cache
+
+PRICE_REFRESHER_ENABLED = os.getenv("PRICE_REFRESHER_ENABLED", "true").lower() == "true"
+REFRESH_INTERVAL_SEC = int(os.getenv("PRICE_REFRESH_INTERVAL_SEC", "60"))
+REFRESH_CLOSED_INTERVAL_SEC = int(os.getenv("PRICE_REFRESH_CLOSED_INTERVAL_SEC", "1800"))
+REFRESH_BATCH_SIZE = int(os.getenv("PRICE_REFRESH_BATCH_SIZE", "50"))
+RECENT_QUOTE_TTL_SEC = int(os.getenv("PRICE_REFRESH_RECENT_TTL_SEC", "3600"))
+MAX_RECENT_SYMBOLS = 2000
+
+
+def market_is_open(now=None):
+    """True while quotes can move: the regular session, plus pre/post-market when those are tracked."""
+    session = market_session(now)
+    return session == REGULAR or (TRACK_EXTENDED_HOURS and session in (PRE, POST))
+
+
+def _default_client():
+    from supabase_services import get_client
+    return get_client().client
+
+
+class HotTickerRefresher:
+    """Background task that keeps the hot set's prices fresh in companies and the quote cache.
+
+    The hot set is every ticker held in `positions`, every symbol a /market/stream client
+    follows, plus every symbol requested through the quote routes within
+    RECENT_QUOTE_TTL_SEC (dashboards and watchlists poll those).
+    A pass runs every REFRESH_INTERVAL_SEC while the market is open, and otherwise every
+    REFRESH_CLOSED_INTERVAL_SEC or at the next session start, whichever is sooner. Each
+    pass refreshes only the symbols whose cached quote would go stale before the next
+    pass (off-hours quotes stay valid until the open, so nights and weekends cost one
+    fetch per symbol), in batches of REFRESH_BATCH_SIZE through refresh_quotes, so it
+    never duplicates a refresh a request already has in flight. Request handlers find
+    hot symbols in the cache. A symbol outside the hot set (or requested before its
+    first pass) is still fetched inline by the handler, through the same refresh_quotes
+    single-flight, so it waits on a refresh of that symbol already running here rather
+    than calling Yahoo again, and the request adds it to the hot set from then on.
+    """
+
+    def __init__(self, get_client=None, batch_size=None):
+        self._get_client = get_client or _default_client
+        self.batch_size = batch_size or REFRESH_BATCH_SIZE
+        self._recent = OrderedDict()  # { symbol: monotonic time last requested }
+        self._recent_lock = threading.Lock()  # touched on the loop, read by hot_set on a worker thread
+        self.task = None
+        self.last_run = None
+        self.last_refreshed = 0
+        self.errors = 0
+
+    def touch(self, symbols):
+        """Record symbols a request just asked for."""
+        now = time.monotonic()
+        with self._recent_lock:
+            for symbol in symbols:
+                self._recent[symbol] = now
+                self._recent.move_to_end(symbol)
+            while len(self._recent) > MAX_RECENT_SYMBOLS:
+                self._recent.popitem(last=False)
+
+    def recent_symbols(self):
+        cutoff = time.monotonic() - RECENT_QUOTE_TTL_SEC
+        with self._recent_lock:
+            while self._recent and next(iter(self._recent.values())) < cutoff:
+                self._recent.popitem(last=False)
+            return list(self._recent)
+
+    def held_tickers(self, client):
+        """Tickers of every open position, whether stored by ticker or by company_id."""
+        rows = select_all(lambda: client.table('positions').select('id, ticker, company_id').order('id'))
+        tickers = {(r.get('ticker') or '').upper() for r in rows if r.get('ticker')}
+        company_ids = list({r.get('company_id') for r in rows if r.get('company_id') and not r.get('ticker')})
+        if company_ids:
+            companies = client.table('companies').select('id, ticker').in_('id', company_ids).execute().data or []
+            tickers.update((c.get('ticker') or '').upper() for c in companies if c.get('ticker'))
+        return tickers
+
+    def hot_set(self, client):
+        try:
+            held = self.held_tickers(client)
+        except Exception as e:
+            print(f"[WARN] Could not load held tickers for price refresh: {e}")
+            held = set()
+        return sorted(held | set(self.recent_symbols()) | set(get_quote_hub().symbols()))
+
+    async def refresh_once(self):
+        """Refresh the hot symbols that would go stale before the next pass; returns how many got a price."""
+        client = await asyncio.to_thread(self._get_client)
+        cache = get_quote_cache()
+        next_pass = time.time() + self.interval()
+        symbols = [
+            s for s in await asyncio.to_thread(self.hot_set, client)
+            if (cache.expires_at(s) or 0) <= next_pass
+        ]
+        refreshed = 0
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            quotes = await refresh_quotes(batch, lambda fetched: self._write(client, fetched))
+            refreshed += sum(1 for price, _ in quotes.values() if price is not None)
+        self.last_run = datetime.now(timezone.utc)
+        self.last_refreshed = refreshed
+        return refreshed
+
+    @staticmethod
+    def _write(client, quotes):
+        symbols = [s for s, (price, _) in quotes.items() if price is not None]
+        if not symbols:
+            return
+        existing = client.table('companies').select('ticker, name').in_('ticker', symbols).execute().data or []
+        names = {(r.get('ticker') or '').upper(): r.get('name') for r in existing}
+        upsert_prices(client, price_rows(quotes, names))
+
+    @staticmethod
+    def interval(now=None):
+        """Seconds until the next pass."""
+        if market_is_open(now):
+            return REFRESH_INTERVAL_SEC
+        now = now or datetime.now(timezone.utc)
+        until_open = (next_session_start(now) - now).total_seconds()
+        return max(1, min(REFRESH_CLOSED_INTERVAL_SEC, until_open))
+
+    async def _loop(self):
+        while True:
+            try:
+                refreshed = await self.refresh_once()
+                print(f"[PRICES] Refreshed {refreshed} hot tickers")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Hot ticker refresh failed: {e}")
+            await asyncio.sleep(self.interval())
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._loop())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def info(self):
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "market_open": market_is_open(),
+            "recent_symbols": len(self._recent),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_refreshed": self.last_refreshed,
+            "errors": self.errors,
+        }
+
+
+_refresher = None
+
+
+def get_price_refresher() -> HotTickerRefresher:
+    """Get the global hot ticker refresher instance"""
+    global _refresher
+    if _refresher is None:
+        _refresher = HotTickerRefresher()
+    return _refresher
@@ -0,0 +1,172 @@
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+PROFILE_DIR = os.getenv("SIMULATION_PROFILE_DIR", "data/profiles")
+SAMPLE_INTERVAL_SEC = float(os.getenv("SIMULATION_PROFILE_INTERVAL_SEC", "0.005"))
+TOP_ALLOCATIONS = 25
+
+
+def is_admin_token(token):
+    """True when `token` matches SIMULATION_ADMIN_TOKEN. Profiling is disabled if the env var is unset."""
+    expected = os.getenv("SIMULATION_ADMIN_TOKEN")
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(str(token), expected)
+
+
+class SamplingProfiler:
+    """Samples the call stacks of every thread at a fixed interval into collapsed-stack counts.
+
+    Output lines look like `thread:name;module:func;module:func <count>`, which
+    flamegraph.pl, speedscope and inferno all read directly. Every thread is sampled
+    because the heavy parts of a simulation (downloads, strategy.prepare, robustness
+    chunks) run in asyncio.to_thread workers; the root frame names the thread so the event
+    loop and the workers separate in the graph. Stacks from other requests served
+    concurrently may show up too. Pass `thread_id` to sample one thread only.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL_SEC):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+    def _sample(self):
+        frames = sys._current_frames()
+        if self.thread_id is not None:
+            frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+        frames.pop(threading.get_ident(), None)  # the profiler's own thread
+        if not frames:
+            return
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in frames.items():
+            labels = []
+            while frame is not None:
+                labels.append(self._frame_label(frame))
+                frame = frame.f_back
+            labels.append(f"thread:{names.get(ident, ident)}")
+            self.stacks[";".join(reversed(labels))] += 1
+        self.sample_count += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="simulation-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileCapture:
+    """Runs a block under the sampling profiler and tracemalloc, then persists the results.
+
+    Usage:
+        capture = ProfileCapture(label="momentum 2015-01-01..2020-01-01")
+        with capture:
+            await service_body()
+        capture.profile_id  # retrieval id, see load_profile()
+    """
+
+    def __init__(self, label=None, directory=None, top_n=TOP_ALLOCATIONS):
+        self.label = label
+        self.directory = directory or PROFILE_DIR
+        self.top_n = top_n
+        self.profile_id = None
+        self._profiler = None
+        self._owns_tracemalloc = False
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        # tracemalloc is process-global; only own it if nobody else is tracing already
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._profiler = SamplingProfiler()
+        self._profiler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.stop()
+        elapsed = time.perf_counter() - self._started
+        allocations = []
+        peak_bytes = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            for stat in snapshot.statistics("lineno")[: self.top_n]:
+                frame = stat.traceback[0]
+                allocations.append({
+                    "site": f"{frame.filename}:{frame.lineno}",
+                    "size_bytes": stat.size,
+                    "count": stat.count,
+                })
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        try:
+            self.profile_id = self._save(elapsed, allocations, peak_bytes, failed=exc_type is not None)
+        except Exception as e:
+            print(f"[ERROR] Failed to store simulation profile: {e}")
+        return False
+
+    def _save(self, elapsed, allocations, peak_bytes, failed=False):
+        profile_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, profile_id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "stacks.folded"), "w", encoding="utf-8") as f:
+            f.write(self._profiler.collapsed())
+        meta = {
+            "profile_id": profile_id,
+            "label": self.label,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "duration_sec": round(elapsed, 3),
+            "sample_interval_sec": self._profiler.interval,
+            "sample_count": self._profiler.sample_count,
+            "traced_peak_bytes": peak_bytes,
+            "failed": failed,
+            "top_allocations": allocations,
+        }
+        with open(os.path.join(path, "profile.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        print(f"🔬 Stored simulation profile {profile_id} ({self._profiler.sample_count} samples)")
+        return profile_id
+
+
+def load_profile(profile_id, directory=None):
+    """Return (meta, collapsed_stacks) for a stored profile, or None if it does not exist."""
+    # Ids are uuid4 hex; reject anything else so the id cannot escape the profile directory
+    if not profile_id or len(profile_id) != 32 or any(c not in "0123456789abcdef" for c in profile_id):
+        return None
+    path = os.path.join(directory or PROFILE_DIR, profile_id)
+    meta_path = os.path.join(path, "profile.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "stacks.folded"), "r", encoding="utf-8") as f:
+        stacks = f.read()
+    return meta, stacks
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import threading
+
+from utils.quote_cache import get_quote_cache
+
+QUOTE_STREAM_MIN_INTERVAL_SEC = float(os.getenv("QUOTE_STREAM_MIN_INTERVAL_SEC", "1"))
+QUOTE_STREAM_MAX_SYMBOLS = int(os.getenv("QUOTE_STREAM_MAX_SYMBOLS", "200"))
+
+
+class QuoteSubscriber:
+    """One streaming connection: the symbols it follows and its latest unsent quote per symbol.
+
+    A sender task writes everything pending as one `quotes` frame, then waits at least
+    `min_interval` seconds before the next, so a burst of updates costs the client one
+    frame per interval. A symbol that changes again before the flush replaces its queued
+    quote, and a quote whose price matches the last one queued for that symbol is dropped.
+    """
+
+    def __init__(self, websocket, min_interval=None):
+        self.websocket = websocket
+        self.min_interval = QUOTE_STREAM_MIN_INTERVAL_SEC if min_interval is None else min_interval
+        self.loop = asyncio.get_running_loop()
+        self.symbols = set()
+        self.pending = {}  # { symbol: quote }
+        self.last_price = {}  # { symbol: price last queued }
+        self.frames_sent = 0
+        self.alive = True
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._drain())
+
+    def offer(self, quote):
+        symbol = quote['ticker']
+        if not self.alive or symbol not in self.symbols or self.last_price.get(symbol) == quote['price']:
+            return
+        self.last_price[symbol] = quote['price']
+        self.pending[symbol] = quote
+        self._wakeup.set()
+
+    def offer_threadsafe(self, quote):
+        """offer() from any thread; quote cache writes happen in worker threads too."""
+        try:
+            self.loop.call_soon_threadsafe(self.offer, quote)
+        except RuntimeError:
+            self.alive = False  # the connection's loop is gone
+
+    async def _drain(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if not self.pending:
+                    continue
+                batch = list(self.pending.values())
+                self.pending.clear()
+                await self.websocket.send_text(json.dumps({"type": "quotes", "payload": batch}))
+                self.frames_sent += 1
+                await asyncio.sleep(self.min_interval)
+        except Exception:
+            self.alive = False
+            self.pending.clear()
+
+    def cancel(self):
+        self.alive = False
+        self.task.cancel()
+
+
+class QuoteHub:
+    """Fans quote cache updates out to every connection subscribed to the symbol.
+
+    The hub listens on the quote cache, where every refresh lands (the hot ticker refresher,
+    the quote routes, order executions, the snapshot pipeline), and the refresher treats
+    every streamed symbol as hot. A symbol therefore costs one upstream fetch per refresh no
+    matter how many clients follow it, and each client is throttled by its own subscriber.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # { symbol: set of QuoteSubscriber }
+
+    def subscribe(self, subscriber, symbols):
+        with self._lock:
+            for symbol in symbols:
+                subscriber.symbols.add(symbol)
+                self._subscribers.setdefault(symbol, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber, symbols=None):
+        """Drop `symbols` (default all of them) from the subscriber."""
+        with self._lock:
+            for symbol in list(subscriber.symbols if symbols is None else symbols):
+                subscriber.symbols.discard(symbol)
+                subscriber.pending.pop(symbol, None)
+                subscriber.last_price.pop(symbol, None)
+                followers = self._subscribers.get(symbol)
+                if followers is not None:
+                    followers.discard(subscriber)
+                    if not followers:
+                        del self._subscribers[symbol]
+
+    def symbols(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def on_quote(self, quote):
+        """Quote cache listener; may run on any thread."""
+        with self._lock:
+            followers = list(self._subscribers.get(quote['ticker'], ()))
+        for subscriber in followers:
+            if subscriber.alive:
+                subscriber.offer_threadsafe(quote)
+            else:
+                self.unsubscribe(subscriber)
+
+    def info(self):
+        with self._lock:
+            connections = set().union(*self._subscribers.values()) if self._subscribers else set()
+            return {"symbols": len(self._subscribers), "connections": len(connections)}
+
+
+_hub = None
+
+
+def get_quote_hub() -> QuoteHub:
+    """Get the global quote hub instance"""
+    global _hub
+    if _hub is None:
+        _hub = QuoteHub()
+        get_quote_cache().add_listener(_hub.on_quote)
+    return _hub
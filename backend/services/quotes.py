@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timezone
+
+import yfinance as yf
+
+from utils.quote_cache import get_quote_cache
+
+QUOTE_FETCH_CONCURRENCY = int(os.getenv("QUOTE_FETCH_CONCURRENCY", "16"))
+PRICE_SOURCE = "yfinance"
+# yf.download keeps module-level state, so at most one bulk download runs at a time
+_download_lock = threading.Lock()
+
+
+def fetch_quote(symbol):
+    """(price, currency) for one symbol from fast_info, falling back to the last 1d close; price is None if Yahoo has nothing."""
+    ticker = yf.Ticker(symbol)
+    info = ticker.fast_info
+    price = info.get('last_price') or info.get('regularMarketPrice') or None
+    currency = info.get('currency') or 'USD'
+    if price is None:
+        hist = ticker.history(period='1d')
+        if not hist.empty:
+            price = float(hist['Close'].iloc[-1])
+    return (float(price) if price is not None else None), currency
+
+
+async def fetch_quotes(symbols):
+    """{ symbol: (price, currency) } for every symbol, fetched concurrently in worker threads.
+
+    Each symbol is its own Ticker lookup (yf.download shares module-level state between
+    calls, see DataFetcher._fetch_ticker), so the batch costs about one round trip
+    rather than one per symbol. Failures map to (None, 'USD').
+    """
+    semaphore = asyncio.Semaphore(QUOTE_FETCH_CONCURRENCY)
+
+    async def fetch(symbol):
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(fetch_quote, symbol)
+            except Exception as e:
+                print(f"[WARN] Quote fetch failed for {symbol}: {e}")
+                return None, 'USD'
+
+    results = await asyncio.gather(*(fetch(s) for s in symbols))
+    return dict(zip(symbols, results))
+
+
+def download_closes(symbols):
+    """{ symbol: (last close, 'USD') } for every symbol in one yf.download call; price None if Yahoo has nothing.
+
+    For large batch jobs (thousands of symbols) where per-symbol lookups would take
+    minutes; interactive refreshes use fetch_quotes.
+    """
+    if not symbols:
+        return {}
+    with _download_lock:
+        data = yf.download(list(symbols), period='5d', interval='1d', auto_adjust=False, progress=False, threads=True, group_by='column')
+    quotes = {symbol: (None, 'USD') for symbol in symbols}
+    if data is None or data.empty or 'Close' not in data:
+        return quotes
+    closes = data['Close']
+    if not hasattr(closes, 'columns'):  # a single symbol comes back as a Series
+        closes = closes.to_frame(symbols[0])
+    last = closes.ffill().iloc[-1]
+    for symbol in symbols:
+        price = last.get(symbol)
+        if price is not None and price == price:
+            quotes[symbol] = (float(price), 'USD')
+    return quotes
+
+
+def price_rows(quotes, names=None, as_of=None):
+    """companies rows for a bulk upsert on ticker, one per symbol that has a price.
+
+    `names` maps symbols to existing company names; new rows are named after the ticker.
+    """
+    names = names or {}
+    iso_now = (as_of or datetime.now(timezone.utc)).isoformat()
+    return [
+        {
+            'ticker': symbol,
+            'name': names.get(symbol) or symbol,
+            'latest_price': price,
+            'latest_price_as_of': iso_now,
+            'latest_price_currency': currency,
+            'latest_price_source': PRICE_SOURCE,
+        }
+        for symbol, (price, currency) in quotes.items()
+        if price is not None
+    ]
+
+
+def upsert_prices(client, rows):
+    """Write price rows in one request, inserting companies that do not exist yet.
+
+    The upsert on ticker needs the UNIQUE(ticker) constraint from
+    add_companies_ticker_unique.sql. If the database rejects it, the rows are written by
+    id instead (one select, one upsert on id, one insert for new tickers) and a warning
+    names the missing migration, so prices keep being saved either way.
+    """
+    if not rows:
+        return
+    try:
+        client.table('companies').upsert(rows, on_conflict='ticker').execute()
+    except Exception as e:
+        print(f"[WARN] companies upsert on ticker rejected ({e}); run add_companies_ticker_unique.sql. Writing by id instead.")
+        _write_prices_by_id(client, rows)
+
+
+def _write_prices_by_id(client, rows):
+    by_ticker = {row['ticker']: row for row in rows}
+    existing = client.table('companies').select('id, ticker').in_('ticker', list(by_ticker)).execute().data or []
+    # Every row of a duplicated ticker gets the new price
+    updates = [dict(by_ticker[r['ticker']], id=r['id']) for r in existing if r.get('ticker') in by_ticker]
+    if updates:
+        client.table('companies').upsert(updates, on_conflict='id').execute()
+    known = {r.get('ticker') for r in existing}
+    new_rows = [row for ticker, row in by_ticker.items() if ticker not in known]
+    if new_rows:
+        client.table('companies').insert(new_rows).execute()
+
+
+class SingleFlight:
+    """Coalesces concurrent work on the same keys into one in-flight call.
+
+    `do_many(keys, fn)` runs fn(owned) once for the keys nobody else is working on and
+    waits on the leaders' futures for the rest, so every caller gets the same result
+    for a key. Keys leave the in-flight map as soon as their leader finishes.
+    """
+
+    def __init__(self):
+        self._inflight = {}  # { key: asyncio.Future }
+
+    async def do_many(self, keys, fn):
+        loop = asyncio.get_running_loop()
+        waiting = {k: self._inflight[k] for k in keys if k in self._inflight}
+        owned = {k: loop.create_future() for k in keys if k not in waiting}
+        self._inflight.update(owned)
+        results = {}
+        try:
+            if owned:
+                results = dict(await fn(list(owned)))
+            for k, future in owned.items():
+                future.set_result(results.get(k))
+        except BaseException as e:
+            for future in owned.values():
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    future.exception()  # retrieved; waiters re-raise it themselves
+            raise
+        finally:
+            for k, future in owned.items():
+                if self._inflight.get(k) is future:
+                    del self._inflight[k]
+        for k, future in waiting.items():
+            # shield: one waiter being cancelled must not cancel the shared future
+            results[k] = await asyncio.shield(future)
+        return results
+
+
+_quote_flight = SingleFlight()
+
+
+async def refresh_quotes(symbols, write):
+    """{ symbol: (price, currency) } fetched from Yahoo, coalesced with refreshes already in flight.
+
+    Only the request that fetches a symbol persists it, via write(quotes) in a worker
+    thread, and fills the quote cache; requests that joined an in-flight refresh get its
+    result without calling Yahoo or writing to companies themselves.
+    """
+    async def fetch_and_write(owned):
+        quotes = await fetch_quotes(owned)
+        as_of = datetime.now(timezone.utc)
+        cache = get_quote_cache()
+        for symbol, (price, currency) in quotes.items():
+            cache.put(symbol, price, currency, as_of)
+        try:
+            await asyncio.to_thread(write, quotes)
+        except Exception as e:
+            # price caching is best-effort; do not fail the request
+            print(f"[WARN] Price write failed for {len(owned)} tickers: {e}")
+        return quotes
+
+    results = await _quote_flight.do_many(list(dict.fromkeys(symbols)), fetch_and_write)
+    return {symbol: results.get(symbol) or (None, 'USD') for symbol in symbols}
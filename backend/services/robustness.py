@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.price_panel import PricePanel
+
+ROBUSTNESS_CHUNK_MB = int(os.getenv("ROBUSTNESS_CHUNK_MB", "128"))
+MAX_ROBUSTNESS_PATHS = int(os.getenv("ROBUSTNESS_MAX_PATHS", "2000"))
+ROWS_PER_MONTH = 21
+PERCENTILES = (5, 25, 50, 75, 95)
+# float32 path prices, their per-segment ratios and one temporary of the same shape
+BYTES_PER_CELL = 12
+
+
+def block_bootstrap_indices(rng, n_paths, length, n_rows, block):
+    """(n_paths, length) source rows made of random contiguous runs of `block` rows.
+
+    Whole rows are resampled, so the cross-section of returns on a day stays together
+    and blocks keep short-range autocorrelation such as momentum and volatility clusters.
+    """
+    block = max(1, min(block, n_rows))
+    n_blocks = -(-length // block)
+    starts = rng.integers(0, n_rows - block + 1, size=(n_paths, n_blocks))
+    return (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :length]
+
+
+def rule_nav(strategy, prices, rebalance_rows, lookback, skip, top_n, starting_value):
+    """NAV of holding the top_n names by `strategy.path_scores`, equal-weighted, on every path.
+
+    `prices` is (paths, days, tickers). The portfolio rebalances on each of
+    `rebalance_rows`, scoring the `lookback` rows ending `skip` rows earlier, and drifts
+    with prices in between. Returns (paths, days from rebalance_rows[0] to the end).
+    """
+    n_paths, n_days, n_tickers = prices.shape
+    top_n = min(top_n, n_tickers)
+    first = rebalance_rows[0]
+    nav = np.empty((n_paths, n_days - first))
+    value = np.full(n_paths, float(starting_value))
+    stops = list(rebalance_rows[1:]) + [n_days]
+
+    for row, stop in zip(rebalance_rows, stops):
+        end = max(row - skip, 1)
+        window = prices[:, max(0, end - lookback):end + 1]
+        scores = strategy.path_scores(window)
+        scores = np.where(np.isfinite(scores), scores, -np.inf)
+        top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        chosen = np.isfinite(np.take_along_axis(scores, top, axis=1))
+        weights = np.zeros(scores.shape, dtype=np.float64)
+        counts = chosen.sum(axis=1, keepdims=True)
+        np.put_along_axis(weights, top, np.where(chosen, 1.0 / np.maximum(counts, 1), 0.0), axis=1)
+
+        relatives = prices[:, row:stop] / prices[:, row][:, None, :]
+        invested = np.einsum("pdn,pn->pd", relatives, weights)
+        cash = 1.0 - weights.sum(axis=1, keepdims=True)
+        segment = value[:, None] * (invested + cash)
+        nav[:, row - first:stop - first] = segment
+        value = segment[:, -1]
+    return nav
+
+
+def candidate_prices(price_data, benchmark, end_date):
+    """Forward-filled adj_close of every non-benchmark ticker up to end_date, as one frame."""
+    panel = PricePanel.from_frames({t: df for t, df in price_data.items() if t != benchmark})
+    prices = pd.DataFrame(panel.prices, index=panel.index, columns=panel.tickers).ffill()
+    return prices.loc[:pd.Timestamp(end_date)]
+
+
+def benchmark_curve(price_data, benchmark, dates, starting_value):
+    """starting_value invested in the benchmark on dates[0], valued on every date; None without data."""
+    df = price_data.get(benchmark)
+    if df is None or not len(dates):
+        return None
+    series = df["adj_close"].reindex(dates).ffill()
+    return (starting_value * series / series.iloc[0]).round(2)
+
+
+def _bands(matrix):
+    """{ "p5": [...], ... } percentiles across paths (axis 0) for every column."""
+    values = np.percentile(matrix, PERCENTILES, axis=0)
+    return {f"p{p}": np.round(row, 2).tolist() for p, row in zip(PERCENTILES, values)}
+
+
+def _distribution(values):
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+class RobustnessRun:
+    """Block-bootstrap robustness test of a strategy's weight rule across many price paths.
+
+    The loaded price panel's daily returns are resampled into `n_paths` synthetic
+    histories (a 3-D paths x days x tickers array per chunk), and the strategy's
+    vectorized `path_scores` ranks every path at once on each monthly rebalance. The
+    portfolio holds the top_n names equal-weighted between rebalances, so each path's
+    NAV is a weighted sum of price relatives; no per-path engine loop or ledger exists.
+    Paths are generated in chunks sized to ROBUSTNESS_CHUNK_MB, and only the NAV of each
+    path (paths x simulated days) is kept.
+    """
+
+    def __init__(self, strategy, params, n_paths, block_days=ROWS_PER_MONTH, seed=None):
+        self.strategy = strategy
+        self.params = params
+        self.n_paths = max(1, min(n_paths, MAX_ROBUSTNESS_PATHS))
+        self.block_days = block_days
+        self.rng = np.random.default_rng(seed)
+
+        prices = candidate_prices(strategy.price_data, params.benchmark, params.end_date)
+        self.tickers = list(prices.columns)
+        self.dates = prices.index
+        self.start_row = int(np.searchsorted(self.dates.values, np.datetime64(pd.Timestamp(params.start_date))))
+        # Returns of names not listed yet are 0, so their prices are flat and their score is excluded
+        returns = prices.pct_change().to_numpy(dtype=np.float32)[1:]
+        self.returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+        self.rebalance_rows = list(range(self.start_row, len(self.dates), ROWS_PER_MONTH))
+        self.benchmark = benchmark_curve(strategy.price_data, params.benchmark, self.sim_dates, params.starting_value)
+
+    @property
+    def sim_dates(self):
+        return self.dates[self.start_row:]
+
+    def chunk_sizes(self):
+        cells = max(1, len(self.dates) * len(self.tickers))
+        per_chunk = max(1, ROBUSTNESS_CHUNK_MB * 1024 * 1024 // (cells * BYTES_PER_CELL))
+        sizes = [per_chunk] * (self.n_paths // per_chunk)
+        if self.n_paths % per_chunk:
+            sizes.append(self.n_paths % per_chunk)
+        return sizes
+
+    def _path_prices(self, source_rows):
+        """(paths, days, tickers) float32 prices starting at 1.0, from resampled return rows."""
+        resampled = self.returns[source_rows]
+        prices = np.empty((source_rows.shape[0], source_rows.shape[1] + 1, len(self.tickers)), dtype=np.float32)
+        prices[:, 0] = 1.0
+        np.cumprod(1 + resampled, axis=1, out=prices[:, 1:])
+        return prices
+
+    def _nav(self, prices):
+        """(paths, simulated days) NAV of the equal-weight top_n rule on each path."""
+        return rule_nav(
+            self.strategy, prices, self.rebalance_rows,
+            self.params.lookback_months * ROWS_PER_MONTH, self.params.skip_recent_months * ROWS_PER_MONTH,
+            self.params.top_n or 10, self.params.starting_value
+        )
+
+    def observed(self):
+        """NAV of the same rule on the actual price history, for comparison with the bands."""
+        rows = np.arange(len(self.returns))[None, :]
+        return self._nav(self._path_prices(rows))[0]
+
+    def run_chunk(self, n_paths):
+        rows = block_bootstrap_indices(self.rng, n_paths, len(self.returns), len(self.returns), self.block_days)
+        return self._nav(self._path_prices(rows))
+
+    @staticmethod
+    def path_outcomes(navs):
+        """(final value, max drawdown) of each path, the per-path figures the distribution is built from."""
+        drawdowns = navs / np.maximum.accumulate(navs, axis=1) - 1
+        return navs[:, -1], drawdowns.min(axis=1)
+
+    def outcome_distribution(self, final_values, max_drawdowns):
+        """Percentiles of final value, total return and max drawdown across the paths so far."""
+        start = float(self.params.starting_value)
+        return {
+            "final_value": _distribution(final_values),
+            "total_return_pct": _distribution((final_values / start - 1) * 100),
+            "max_drawdown_pct": _distribution(max_drawdowns * 100),
+            "prob_loss_pct": round(float((final_values < start).mean() * 100), 2),
+        }
+
+    def summary(self, navs):
+        """Per-date NAV and drawdown bands plus the outcome distribution over all paths."""
+        drawdowns = navs / np.maximum.accumulate(navs, axis=1) - 1
+        observed = self.observed()
+        return {
+            "paths": int(navs.shape[0]),
+            "block_days": self.block_days,
+            "dates": [str(d.date()) for d in self.sim_dates],
+            "nav_bands": _bands(navs),
+            "drawdown_pct_bands": _bands(drawdowns * 100),
+            "observed_nav": np.round(observed, 2).tolist(),
+            "distribution": self.outcome_distribution(*self.path_outcomes(navs)),
+        }
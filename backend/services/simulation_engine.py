@@ -0,0 +1,246 @@
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from services.benchmarks import EQUAL_WEIGHT, BenchmarkSet
+from services.metrics import incr, timed
+from services.portfolio import IntradayPortfolio, Portfolio
+from utils.bar_store import BarStore
+from utils.data_fetcher import DataFetcher
+from utils.indicator_cache import IndicatorCache
+from utils.price_utils import PriceUtils
+from utils.trading_calendar import TradingCalendar
+
+
+class SimulationEngine:
+    """Runs any BaseStrategy: preloading, the daily loop, valuation, streaming and close-out.
+
+    Strategies only declare their universe, history and indicators and implement
+    on_rebalance/on_bar, so every strategy shares one loop with the same fast paths:
+    compact price data, the indicator cache and the trading calendar.
+    """
+
+    def __init__(self, strategy, params):
+        self.strategy = strategy
+        self.params = params
+        self.data_fetcher = DataFetcher()
+        self.loaded_dates = set()
+        self.benchmarks = None
+        self.extra_benchmarks = [b for b in dict.fromkeys(params.extra_benchmarks or []) if b != params.benchmark]
+
+    async def initialize(self, progress=None):
+        strategy = self.strategy
+        strategy.current_tickers = set(await asyncio.to_thread(strategy.universe, self.params.start_date))
+        price_data = await self.data_fetcher.preload_price_data_async(
+            self.params.start_date, self.params.end_date,
+            strategy.history_months(), 0,
+            self.params.benchmark, list(strategy.current_tickers),
+            compact=self.params.compact_prices,
+            progress=progress
+        )
+        strategy.price_data = price_data
+        strategy.portfolio = Portfolio(self.params.starting_value, price_data)
+        strategy.indicators = IndicatorCache(price_data, strategy.indicators_spec())
+        strategy.calendar = TradingCalendar.from_frame(price_data.get(self.params.benchmark))
+        self.benchmarks = strategy.benchmarks = await self.load_benchmarks(price_data)
+        # Setup such as pair screening is CPU-heavy and may query Supabase; keep it off the event loop
+        await asyncio.to_thread(strategy.prepare, self.params.start_date)
+
+    async def load_benchmarks(self, price_data):
+        """Precompute the primary and extra benchmark curves on the simulation calendar.
+
+        Extra tickers are downloaded separately so they never enter the strategy's universe.
+        """
+        params = self.params
+        benchmarks = BenchmarkSet(params.start_date, params.end_date, params.starting_value)
+        benchmarks.add_ticker(params.benchmark, price_data.get(params.benchmark))
+        tickers = [b for b in self.extra_benchmarks if b != EQUAL_WEIGHT]
+        extra_frames = {}
+        missing = [t for t in tickers if t not in price_data]
+        if missing:
+            # A week of lead-in so a start date on a weekend or holiday still has an as-of price
+            lead_in = (datetime.strptime(params.start_date, "%Y-%m-%d") - timedelta(days=7)).strftime("%Y-%m-%d")
+            extra_frames = await self.data_fetcher.load_frames_async(missing, lead_in, params.end_date)
+        for ticker in tickers:
+            benchmarks.add_ticker(ticker, price_data.get(ticker, extra_frames.get(ticker)))
+        if EQUAL_WEIGHT in self.extra_benchmarks:
+            benchmarks.add_equal_weight(price_data, exclude={params.benchmark})
+        return benchmarks
+
+    async def refresh_universe(self, date_str):
+        """Re-resolve a dynamic universe and load history for names that joined it, off the event loop."""
+        strategy = self.strategy
+        strategy.current_tickers, self.loaded_dates, strategy.price_data = await PriceUtils.update_universe(
+            strategy.current_tickers,
+            self.loaded_dates,
+            strategy.price_data,
+            strategy.portfolio,
+            date_str,
+            self.params.end_date,
+            strategy.history_months(),
+            0,
+            compact=self.params.compact_prices,
+            new_tickers=set(await asyncio.to_thread(strategy.universe, date_str))
+        )
+        strategy.indicators.update_price_data(strategy.price_data)
+
+    def close_out(self, date_str):
+        """Close every open position at the end of the run."""
+        portfolio = self.strategy.portfolio
+        final_orders = []
+        for ticker in list(portfolio.holdings.keys()):
+            shares = portfolio.holdings[ticker]
+            if shares > 0:
+                trade = portfolio.close_long_position(ticker, date_str)
+            elif shares < 0:
+                trade = portfolio.close_short_position(ticker, date_str)
+            else:
+                continue
+            if trade:
+                final_orders.append(trade.to_dict())
+        return final_orders
+
+    async def run(self, send, send_daily):
+        """Walk every calendar day; send_daily(date, value, benchmark, extra_benchmarks) streams each point."""
+        strategy = self.strategy
+        benchmarks = self.benchmarks
+        day = 0
+        await send("status", strategy.start_message)
+        current = datetime.strptime(self.params.start_date, "%Y-%m-%d")
+        end = datetime.strptime(self.params.end_date, "%Y-%m-%d")
+        last_rebalance = None
+        daily_values, daily_benchmarks = [], []
+        # Plain NAV vectors for services.analytics, kept even when daily_values are not retained
+        nav = {"dates": [], "values": [], "benchmark": []}
+
+        while current <= end:
+            date_str = current.strftime("%Y-%m-%d")
+            try:
+                if strategy.rebalance_due(current, last_rebalance):
+                    await send("status", f"Rebalancing on {date_str}")
+                    with timed("rebalance"):
+                        if strategy.dynamic_universe and last_rebalance is not None:
+                            await self.refresh_universe(date_str)
+                        strategy.on_rebalance(current, date_str)
+                    last_rebalance = current
+
+                with timed("bar"):
+                    strategy.on_bar(current, date_str)
+
+                with timed("valuation"):
+                    value = strategy.portfolio.value_on(date_str)
+                with timed("benchmark"):
+                    benchmark = benchmarks.value(self.params.benchmark, day)
+                    extra = benchmarks.values(day, self.extra_benchmarks) if self.extra_benchmarks else None
+                await send_daily(current, value, benchmark, extra)
+                nav["dates"].append(date_str)
+                nav["values"].append(value)
+                nav["benchmark"].append(benchmark)
+
+                if strategy.retain_daily_values:
+                    daily_values.append({"date": date_str, "portfolio_value": value})
+                    point = {"date": date_str, "benchmark_value": benchmark}
+                    if extra:
+                        point["benchmarks"] = extra
+                    daily_benchmarks.append(point)
+                current += timedelta(days=1)
+                day += 1
+
+            except Exception as e:
+                traceback.print_exc()
+                await send("error", f"Error on {date_str}: {str(e)}")
+                break
+
+        end_str = end.strftime("%Y-%m-%d")
+        result = {
+            "final_orders": self.close_out(end_str),
+            "final_value": strategy.portfolio.cash,
+            "daily_values": daily_values,
+            "daily_benchmark_values": daily_benchmarks,
+            "final_benchmark_value": benchmarks.final(self.params.benchmark),
+            "final_benchmarks": {name: benchmarks.final(name) for name in self.extra_benchmarks},
+            "nav": nav,
+            "all_trades": strategy.portfolio.get_all_trades()
+        }
+        result.update(strategy.summary(end_str))
+        return result
+
+    async def run_intraday(self, send, send_nav, store=None):
+        """Stream intraday bars through `strategy.on_intraday_bar`, sampling NAV every nav_sample_minutes.
+
+        Bars arrive one month-chunk at a time from the BarStore; only the latest close per
+        ticker, the strategy's rolling state and the sampled NAV points are kept, so memory
+        does not grow with the number of bars. All bars sharing a timestamp are priced
+        before the strategy sees any of them.
+        """
+        strategy = self.strategy
+        params = self.params
+        store = store or BarStore(params.bar_interval)
+        portfolio = IntradayPortfolio(params.starting_value)
+        strategy.portfolio = portfolio
+        tickers = sorted(set(strategy.universe(params.start_date)) | {params.benchmark})
+        sample_every = pd.Timedelta(minutes=params.nav_sample_minutes).value
+
+        await send("status", strategy.start_message)
+        next_sample = None
+        benchmark_shares = None
+        daily_values, daily_benchmarks = [], []
+        nav = {"dates": [], "values": [], "benchmark": []}
+        bars = 0
+        ts_str = None
+
+        def sample(ts_str):
+            value = portfolio.value_on(ts_str)
+            benchmark_price = portfolio.last_prices.get(params.benchmark)
+            benchmark = round(benchmark_shares * benchmark_price, 2) if benchmark_shares else None
+            nav["dates"].append(ts_str)
+            nav["values"].append(value)
+            nav["benchmark"].append(benchmark)
+            if strategy.retain_daily_values:
+                daily_values.append({"date": ts_str, "portfolio_value": value})
+                daily_benchmarks.append({"date": ts_str, "benchmark_value": benchmark})
+            return value, benchmark
+
+        try:
+            for chunk in store.stream(tickers, params.start_date, params.end_date):
+                with timed("bar"):
+                    samples = []
+                    for start, stop in chunk.groups():
+                        timestamp = pd.Timestamp(chunk.timestamps[start])
+                        ts_str = timestamp.strftime("%Y-%m-%d %H:%M")
+                        for k in range(start, stop):
+                            portfolio.last_prices[chunk.tickers[chunk.codes[k]]] = chunk.closes[k]
+                        if benchmark_shares is None and params.benchmark in portfolio.last_prices:
+                            benchmark_shares = params.starting_value / portfolio.last_prices[params.benchmark]
+                        for k in range(start, stop):
+                            strategy.on_intraday_bar(timestamp, ts_str, chunk.tickers[chunk.codes[k]], chunk.closes[k])
+                        if next_sample is None or timestamp.value >= next_sample:
+                            samples.append((ts_str, *sample(ts_str)))
+                            next_sample = timestamp.value - timestamp.value % sample_every + sample_every
+                    bars += len(chunk)
+                for ts, value, benchmark in samples:
+                    await send_nav(ts, value, benchmark)
+                # Let other jobs and websocket sends run between chunks
+                await asyncio.sleep(0)
+        except Exception as e:
+            traceback.print_exc()
+            await send("error", f"Error on {ts_str}: {str(e)}")
+
+        incr("bars_processed", bars)
+        if ts_str is not None and nav["dates"][-1] != ts_str:
+            sample(ts_str)
+        end_str = ts_str or params.end_date
+        result = {
+            "final_orders": self.close_out(end_str),
+            "final_value": portfolio.cash,
+            "final_benchmark_value": round(benchmark_shares * portfolio.last_prices[params.benchmark], 2) if benchmark_shares else None,
+            "bars_processed": bars,
+            "daily_values": daily_values,
+            "daily_benchmark_values": daily_benchmarks,
+            "nav": nav,
+            "all_trades": portfolio.get_all_trades()
+        }
+        result.update(strategy.summary(end_str))
+        return result
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from threading import Lock
+
+from services.metrics import incr
+
+JOB_IDLE_TIMEOUT_SEC = int(os.getenv("SIMULATION_JOB_IDLE_TIMEOUT_SEC", "600"))
+JOB_RESULT_TTL_SEC = int(os.getenv("SIMULATION_JOB_RESULT_TTL_SEC", "1800"))
+CHECKPOINT_EVERY_DAYS = 21  # about one trading month of daily frames
+SEND_QUEUE_SIZE = int(os.getenv("SIMULATION_SEND_QUEUE_SIZE", "256"))  # queued daily frames per client
+
+
+class JobChannel:
+    """Stands in for the websocket a simulation writes to, so the run outlives any one connection."""
+
+    def __init__(self, job):
+        self.job = job
+
+    async def send_text(self, text):
+        await self.job.publish(text)
+
+    async def send_frame(self, frame):
+        """Publish a frame dict, serializing it once for every subscriber."""
+        await self.job.publish(json.dumps(frame), frame)
+
+    async def close(self):
+        # Subscribers are closed by the route once the job finishes
+        pass
+
+
+class Subscriber:
+    """One attached client: a bounded queue of outgoing frames drained by its own sender task.
+
+    The simulation only ever appends here, so a slow client never stalls the compute loop.
+    When more than `max_pending` daily points are waiting, every other queued daily point is
+    dropped (the newest is always kept), so a lagging client gets a down-sampled curve over
+    the full range instead of falling further behind. Status, rebalance, done and error
+    frames are never dropped.
+    """
+
+    def __init__(self, websocket, max_pending=None):
+        self.websocket = websocket
+        self.max_pending = max_pending or SEND_QUEUE_SIZE
+        self.pending = deque()  # (event_type, text)
+        self.daily_pending = 0
+        self.coalesced = 0
+        self.alive = True
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._drain())
+
+    def offer(self, text, event_type):
+        if not self.alive:
+            return
+        if event_type == "daily":
+            if self.daily_pending >= self.max_pending:
+                self._coalesce()
+            self.daily_pending += 1
+        self.pending.append((event_type, text))
+        self._wakeup.set()
+
+    def _coalesce(self):
+        daily_positions = [i for i, (event_type, _) in enumerate(self.pending) if event_type == "daily"]
+        drop = set(daily_positions[-2::-2])
+        self.pending = deque(frame for i, frame in enumerate(self.pending) if i not in drop)
+        self.daily_pending -= len(drop)
+        self.coalesced += len(drop)
+        incr("frames_coalesced", len(drop))
+
+    async def _drain(self):
+        try:
+            while True:
+                while self.pending:
+                    event_type, text = self.pending.popleft()
+                    if event_type == "daily":
+                        self.daily_pending -= 1
+                    await self.websocket.send_text(text)
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+        except Exception:
+            self.alive = False
+            self.pending.clear()
+
+    async def flush(self):
+        """Send everything still queued, then stop the sender."""
+        self._closing = True
+        self._wakeup.set()
+        await self.task
+
+    def cancel(self):
+        self.alive = False
+        self.task.cancel()
+
+
+class SimulationJob:
+    """A simulation running detached from the websocket that started it.
+
+    Every frame is published to whichever clients are currently attached. Daily points
+    are also appended to the job's own series while `retain_daily_values` is set (the
+    service clears it when the memory plan stops buffering the series), and every
+    CHECKPOINT_EVERY_DAYS days the service records a summary of the portfolio (cash,
+    holdings, trade counts) and loop position. The run itself keeps going in its task while no
+    client is attached, so a client that drops and reconnects with the job id gets a
+    `resume` frame with the series and checkpoint so far, then the live tail, without
+    rerunning the data load or the loop.
+
+    A job with no attached client for JOB_IDLE_TIMEOUT_SEC is cancelled.
+    """
+
+    def __init__(self, params):
+        self.job_id = uuid.uuid4().hex
+        self.params = params
+        self.status = "running"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.daily_values = []
+        self.daily_benchmark_values = []
+        self.retain_daily_values = True
+        self.last_status = None
+        self.checkpoint = None
+        self.final_frame = None  # serialized done/error frame
+        self.subscribers = set()
+        self.detached_since = None
+        self.task = None
+        self.finished = asyncio.Event()
+
+    def start(self, run):
+        """Run `run(channel)` as a background task; `run` gets a JobChannel to write frames to."""
+        self.task = asyncio.create_task(self._run(run))
+        return self.task
+
+    async def _run(self, run):
+        try:
+            await run(JobChannel(self))
+            if self.status == "running":
+                self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            self.final_frame = json.dumps({"type": "error", "payload": "Simulation was cancelled after its client disconnected."})
+        except Exception as e:
+            self.status = "error"
+            await self.publish(json.dumps({"type": "error", "payload": str(e)}))
+        finally:
+            self.finished_at = time.time()
+            self.finished.set()
+
+    async def publish(self, text, frame=None):
+        """Record and fan out one serialized frame; pass `frame` to skip parsing `text` back."""
+        if frame is None:
+            frame = json.loads(text)
+        event_type = frame.get("type")
+        if event_type == "daily" and self.retain_daily_values:
+            payload = frame["payload"]
+            self.daily_values.append({"date": payload["date"], "portfolio_value": payload["portfolio_value"]})
+            self.daily_benchmark_values.append({"date": payload["date"], "benchmark_value": payload["benchmark_value"]})
+        elif event_type == "status":
+            self.last_status = frame.get("payload")
+        elif event_type in ("done", "error"):
+            self.final_frame = text
+            if event_type == "error":
+                self.status = "error"
+
+        for subscriber in list(self.subscribers):
+            if subscriber.alive:
+                subscriber.offer(text, event_type)
+            else:
+                self.detach(subscriber)
+        # Queuing never suspends; yield so sender tasks get to write between computed days
+        await asyncio.sleep(0)
+
+        if not self.subscribers and self.detached_since is not None:
+            if time.time() - self.detached_since > JOB_IDLE_TIMEOUT_SEC and self.task is not None:
+                self.task.cancel()
+
+    def stop_retaining_daily_values(self):
+        """Drop the buffered series; the memory plan has clients keep it from the daily frames."""
+        self.retain_daily_values = False
+        self.daily_values = []
+        self.daily_benchmark_values = []
+
+    def save_checkpoint(self, date_str, days_completed, portfolio):
+        self.checkpoint = {
+            "date": date_str,
+            "days_completed": days_completed,
+            "cash": round(portfolio.cash, 2),
+            "holdings": dict(portfolio.holdings),
+            "open_trades": dict(portfolio.open_trades),
+            "trade_count": len(portfolio.trades),
+            # Counts only: copying the growing ledger every checkpoint would be quadratic over a run
+            "trade_days": len(portfolio.trade_history_by_date),
+        }
+
+    def attach(self, subscriber):
+        self.subscribers.add(subscriber)
+        self.detached_since = None
+
+    def detach(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.detached_since = time.time()
+
+    def resume_frame(self):
+        return json.dumps({
+            "type": "resume",
+            "payload": {
+                "job_id": self.job_id,
+                "status": self.status,
+                "last_status": self.last_status,
+                "daily_values": self.daily_values,
+                "daily_benchmark_values": self.daily_benchmark_values,
+                "daily_values_retained": self.retain_daily_values,
+                "checkpoint": self.checkpoint,
+            }
+        })
+
+    def info(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "strategy": self.params.strategy,
+            "days_completed": len(self.daily_values),
+            "subscribers": len(self.subscribers),
+            "checkpoint_date": self.checkpoint["date"] if self.checkpoint else None,
+        }
+
+
+# In-memory job store; jobs do not survive a process restart
+_jobs = {}
+_jobs_lock = Lock()
+
+
+def _evict_expired(now):
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at is not None and now - job.finished_at > JOB_RESULT_TTL_SEC
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def create_job(params):
+    job = SimulationJob(params)
+    with _jobs_lock:
+        _evict_expired(time.time())
+        _jobs[job.job_id] = job
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        _evict_expired(time.time())
+        return _jobs.get(job_id)
+
+
+def reset_jobs():
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        _jobs.clear()
+
+
+async def _wait_for_disconnect(websocket):
+    # Clients send nothing after the request, so just drain until the socket goes away
+    try:
+        while True:
+            await websocket.receive_text()
+    except Exception:
+        return
+
+
+async def stream_job(job, websocket, resume=False):
+    """Attach `websocket` to `job` until the job finishes or the client disconnects."""
+    if resume and job.finished.is_set():
+        await websocket.send_text(job.resume_frame())
+        if job.final_frame:
+            await websocket.send_text(job.final_frame)
+        await websocket.close()
+        return
+    subscriber = Subscriber(websocket)
+    if resume:
+        # Queue the snapshot and attach with no await in between so no frame is missed or repeated
+        subscriber.offer(job.resume_frame(), "resume")
+    job.attach(subscriber)
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    finished = asyncio.create_task(job.finished.wait())
+    try:
+        await asyncio.wait({disconnected, finished}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected.cancel()
+        finished.cancel()
+        job.detach(subscriber)
+    if not job.finished.is_set() or disconnected.done():
+        subscriber.cancel()
+        return
+    if job.status == "cancelled" and job.final_frame:
+        subscriber.offer(job.final_frame, "error")
+    await subscriber.flush()
+    if subscriber.alive:
+        await websocket.close()
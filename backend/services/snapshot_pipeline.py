@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+import pandas as pd
+
+from services.quotes import download_closes, price_rows, upsert_prices
+from supabase_services.client import select_all
+from utils.market_calendar import is_price_fresh
+from utils.quote_cache import get_quote_cache
+
+SNAPSHOT_JOB_RESULT_TTL_SEC = int(os.getenv("SNAPSHOT_JOB_RESULT_TTL_SEC", "86400"))
+UPSERT_CHUNK_ROWS = 1000
+
+
+def _chunks(rows, size=UPSERT_CHUNK_ROWS):
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def refresh_company_prices(client, now):
+    """Stage 1: a paged companies read, one bulk download for the stale tickers, chunked bulk upserts.
+
+    Returns (companies with refreshed prices filled in, stats).
+    """
+    companies = [
+        c for c in select_all(lambda: client.table('companies').select('id, ticker, name, latest_price, latest_price_as_of').order('id'))
+        if c.get('ticker')
+    ]
+    stale_after = int(os.getenv('PRICE_STALE_SECONDS', '300'))
+    stale = [
+        c for c in companies
+        if c.get('latest_price') is None or not is_price_fresh(c.get('latest_price_as_of'), stale_after, now)
+    ]
+    symbols = list(dict.fromkeys(c['ticker'].upper() for c in stale))
+    quotes = download_closes(symbols)
+    rows = price_rows(quotes, {c['ticker'].upper(): c.get('name') for c in stale}, now)
+    for chunk in _chunks(rows):
+        upsert_prices(client, chunk)
+
+    cache = get_quote_cache()
+    for symbol, (price, currency) in quotes.items():
+        cache.put(symbol, price, currency, now)
+    for c in companies:
+        price = quotes.get(c['ticker'].upper(), (None, None))[0]
+        if price is not None:
+            c['latest_price'] = price
+    errors = [f"{symbol}: Price not available" for symbol, (price, _) in quotes.items() if price is None]
+    return companies, {"total_companies": len(companies), "fresh_prices_skipped": len(companies) - len(stale), "updated_prices_count": len(rows), "price_errors": errors}
+
+
+def portfolio_values(portfolios, positions, companies):
+    """{ portfolio_id: cash + sum(|quantity| x price) }, pricing each position at its company's
+    latest_price (by company_id, else ticker) and falling back to avg_entry_price.
+    """
+    cash = pd.Series({p['id']: float(p.get('cash_balance') or 0) for p in portfolios}, dtype=float)
+    if not positions:
+        return cash.to_dict()
+    by_id = {c.get('id'): c.get('latest_price') for c in companies}
+    by_ticker = {(c.get('ticker') or '').upper(): c.get('latest_price') for c in companies}
+    frame = pd.DataFrame(positions)
+    for column in ('company_id', 'ticker', 'quantity', 'avg_entry_price'):
+        if column not in frame:
+            frame[column] = None
+    price = pd.to_numeric(frame['company_id'].map(by_id), errors='coerce')
+    price = price.fillna(pd.to_numeric(frame['ticker'].fillna('').str.upper().map(by_ticker), errors='coerce'))
+    price = price.where(price > 0, pd.to_numeric(frame['avg_entry_price'], errors='coerce'))
+    frame['value'] = pd.to_numeric(frame['quantity'], errors='coerce').abs() * price.fillna(0)
+    held = frame.groupby('portfolio_id')['value'].sum()
+    return cash.add(held.reindex(cash.index).fillna(0)).to_dict()
+
+
+def create_snapshots(client, companies, now):
+    """Stage 2: paged reads of portfolios, positions and today's snapshots, chunked bulk inserts.
+
+    `companies` are stage 1's rows, already carrying the refreshed prices.
+    """
+    portfolios = select_all(lambda: client.table('portfolios').select('id, cash_balance').order('id'))
+    positions = select_all(lambda: client.table('positions').select('id, portfolio_id, quantity, avg_entry_price, company_id, ticker').order('id'))
+    day_start = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    existing = select_all(
+        lambda: client.table('portfolio_snapshots').select('id, portfolio_id')
+        .gte('recorded_at', day_start.isoformat()).lt('recorded_at', (day_start + timedelta(days=1)).isoformat()).order('id')
+    )
+    done_today = {r.get('portfolio_id') for r in existing}
+
+    values = portfolio_values(portfolios, positions, companies)
+    rows = [
+        {'portfolio_id': pid, 'recorded_at': now.isoformat(), 'total_value': round(value, 2)}
+        for pid, value in values.items() if pid not in done_today
+    ]
+    for chunk in _chunks(rows):
+        client.table('portfolio_snapshots').insert(chunk).execute()
+    return {
+        "total_portfolios": len(portfolios),
+        "created_snapshots_count": len(rows),
+        "skipped_snapshots_count": len(values) - len(rows),
+    }
+
+
+class SnapshotJob:
+    """One run of the price refresh + portfolio snapshot pipeline, run in the background.
+
+    Stages run in worker threads (the Supabase client and yf.download block) so the
+    event loop keeps serving requests. `info()` is the status handle clients poll.
+    """
+
+    def __init__(self, get_client):
+        self.job_id = uuid.uuid4().hex
+        self.get_client = get_client
+        self.status = "running"
+        self.stage = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        return self.task
+
+    async def _run(self):
+        start = time.time()
+        try:
+            now = datetime.now(timezone.utc)
+            client = await asyncio.to_thread(self.get_client)
+            self.stage = "prices"
+            companies, price_stats = await asyncio.to_thread(refresh_company_prices, client, now)
+            self.stage = "snapshots"
+            snapshot_stats = await asyncio.to_thread(create_snapshots, client, companies, now)
+            self.result = {
+                **price_stats,
+                **snapshot_stats,
+                "message": f"Portfolio snapshots update completed. Updated {price_stats['updated_prices_count']} companies, "
+                           f"created {snapshot_stats['created_snapshots_count']} snapshots, skipped {snapshot_stats['skipped_snapshots_count']} portfolios.",
+                "duration_sec": round(time.time() - start, 2),
+            }
+            self.status = "done"
+            print(f"📊 {self.result['message']} ({self.result['duration_sec']}s)")
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "error"
+            self.error = str(e)
+            print(f"[ERROR] Portfolio snapshot job {self.job_id} failed in stage {self.stage}: {e}")
+        finally:
+            self.stage = "finished"
+            self.finished_at = time.time()
+
+    def info(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "started_at": datetime.fromtimestamp(self.created_at, timezone.utc).isoformat(),
+            "finished_at": datetime.fromtimestamp(self.finished_at, timezone.utc).isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+# In-memory job store; jobs do not survive a process restart
+_jobs = {}
+_jobs_lock = Lock()
+
+
+def start_snapshot_job(get_client):
+    """Start a pipeline run, or return the one already running so overlapping triggers share it."""
+    with _jobs_lock:
+        now = time.time()
+        for job_id in [j for j, job in _jobs.items() if job.finished_at and now - job.finished_at > SNAPSHOT_JOB_RESULT_TTL_SEC]:
+            del _jobs[job_id]
+        running = next((job for job in _jobs.values() if job.finished_at is None), None)
+        if running is not None:
+            return running
+        job = SnapshotJob(get_client)
+        _jobs[job.job_id] = job
+    job.start()
+    return job
+
+
+def get_snapshot_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -1,5 +1,18 @@
 from datetime import datetime
 from models.schema import SimulationRequest
+from services.benchmarks import EQUAL_WEIGHT
+from services.price_cache import is_valid_ticker
+from services.profiler import is_admin_token
+from services.robustness import MAX_ROBUSTNESS_PATHS
+from services.walk_forward import expand_grid
+from utils.bar_store import BAR_INTERVALS
+
+MAX_BOOTSTRAP_BLOCK_DAYS = 252  # one trading year
+MAX_EXTRA_BENCHMARKS = 3  # each ticker not in the universe is another download
+MAX_WALK_FORWARD_FOLDS = 50
+MAX_WALK_FORWARD_TRAIN_MONTHS = 60
+# Grid values get the same bounds as the request's own parameters
+WALK_FORWARD_GRID_BOUNDS = {"lookback_months": (1, 12), "skip_recent_months": (0, 6), "top_n": (1, 20)}
 
 def validate_simulation_params(params: SimulationRequest):
     try:
@@ -23,6 +36,51 @@ def validate_simulation_params(params: SimulationRequest):
     if params.skip_recent_months < 0 or params.skip_recent_months > 6:
         return False, "Skip recent months must be between 0 and 6."
 
+    if not is_valid_ticker(params.benchmark):
+        return False, "Benchmark must be a ticker symbol like SPY."
+
+    extra_benchmarks = params.extra_benchmarks or []
+    if len(extra_benchmarks) > MAX_EXTRA_BENCHMARKS:
+        return False, f"At most {MAX_EXTRA_BENCHMARKS} extra benchmarks are allowed."
+
+    if any(b != EQUAL_WEIGHT and not is_valid_ticker(b) for b in extra_benchmarks):
+        return False, f"Extra benchmarks must be ticker symbols or {EQUAL_WEIGHT}."
+
+    if params.bar_interval is not None and params.bar_interval not in BAR_INTERVALS:
+        return False, f"Bar interval must be one of {', '.join(BAR_INTERVALS)}."
+
+    if params.nav_sample_minutes < 1:
+        return False, "NAV sample minutes must be at least 1."
+
+    if params.memory_budget_mb is not None and params.memory_budget_mb <= 0:
+        return False, "Memory budget must be a positive number of MB."
+
+    if params.robustness_paths is not None and not 1 <= params.robustness_paths <= MAX_ROBUSTNESS_PATHS:
+        return False, f"Robustness paths must be between 1 and {MAX_ROBUSTNESS_PATHS}."
+
+    if params.bootstrap_block_days < 1 or params.bootstrap_block_days > MAX_BOOTSTRAP_BLOCK_DAYS:
+        return False, f"Bootstrap block days must be between 1 and {MAX_BOOTSTRAP_BLOCK_DAYS}."
+
+    if params.walk_forward_folds is not None:
+        if params.walk_forward_folds < 1 or params.walk_forward_folds > MAX_WALK_FORWARD_FOLDS:
+            return False, f"Walk-forward folds must be between 1 and {MAX_WALK_FORWARD_FOLDS}."
+
+        if params.walk_forward_train_months < 1 or params.walk_forward_train_months > MAX_WALK_FORWARD_TRAIN_MONTHS:
+            return False, f"Walk-forward train months must be between 1 and {MAX_WALK_FORWARD_TRAIN_MONTHS}."
+
+        for key, values in (params.walk_forward_grid or {}).items():
+            low, high = WALK_FORWARD_GRID_BOUNDS.get(key, (None, None))
+            if low is not None and any(v < low or v > high for v in values):
+                return False, f"Walk-forward {key} values must be between {low} and {high}."
+
+        try:
+            expand_grid(params.walk_forward_grid, params)
+        except ValueError as e:
+            return False, f"{e}."
+
+    if params.profile and not is_admin_token(params.admin_token):
+        return False, "Profiling is restricted to admins."
+
     # Strategy-specific validations
     if params.strategy in ["momentum", "sma_crossover"]:
         if params.hold_months < 1 or params.hold_months > 3:
@@ -0,0 +1,147 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.robustness import ROWS_PER_MONTH, benchmark_curve, candidate_prices, rule_nav
+
+WALK_FORWARD_WORKERS = int(os.getenv("WALK_FORWARD_WORKERS", "4"))
+MAX_COMBINATIONS = int(os.getenv("WALK_FORWARD_MAX_COMBINATIONS", "200"))
+GRID_KEYS = ("lookback_months", "skip_recent_months", "top_n")
+DEFAULT_GRID = {"lookback_months": [3, 6, 9, 12], "skip_recent_months": [0, 1]}
+TRADING_DAYS_PER_YEAR = 252
+
+
+def expand_grid(grid, params):
+    """Every combination of the grid's values as { lookback_months, skip_recent_months, top_n }.
+
+    Keys missing from `grid` take the request's own value.
+    """
+    grid = grid or DEFAULT_GRID
+    unknown = set(grid) - set(GRID_KEYS)
+    if unknown:
+        raise ValueError(f"Unsupported walk-forward parameters: {', '.join(sorted(unknown))}")
+    axes = [sorted(set(grid.get(key) or [getattr(params, key)])) for key in GRID_KEYS]
+    combos = [dict(zip(GRID_KEYS, values)) for values in itertools.product(*axes)]
+    if len(combos) > MAX_COMBINATIONS:
+        raise ValueError(f"Walk-forward grid has {len(combos)} combinations (max {MAX_COMBINATIONS})")
+    return combos
+
+
+def sharpe(returns):
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    return float(returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)) if std > 0 else -np.inf
+
+
+def _finite(value, digits=3):
+    return round(value, digits) if np.isfinite(value) else None
+
+
+class WalkForward:
+    """Walk-forward selection of a strategy's parameters on the shared price panel.
+
+    The simulation window is split into `folds` consecutive out-of-sample test segments,
+    each preceded by `train_months` of in-sample history. Per fold, every grid
+    combination is scored by its in-sample Sharpe ratio, the winner is applied to the
+    test segment, and the test segments are chained into one out-of-sample equity curve.
+
+    Each combination's daily returns over the whole window are computed once (the
+    vectorized rule from services.robustness, on a worker pool) and every fold scores
+    slices of them, so 10 folds x 50 combinations cost 50 rule evaluations rather than
+    500 backtests. Slice scores are memoized as well, for folds whose train windows repeat.
+    """
+
+    def __init__(self, strategy, params, grid=None, folds=10, train_months=12):
+        self.strategy = strategy
+        self.params = params
+        self.combos = expand_grid(grid, params)
+        prices = candidate_prices(strategy.price_data, params.benchmark, params.end_date)
+        self.dates = prices.index
+        self.prices = prices.to_numpy(dtype=np.float32)[None]
+        self.start_row = int(np.searchsorted(self.dates.values, np.datetime64(params.start_date)))
+        self.rebalance_rows = list(range(self.start_row, len(self.dates), ROWS_PER_MONTH))
+        self.folds = self._make_folds(len(self.dates) - self.start_row, folds, train_months * ROWS_PER_MONTH)
+        self._returns = {}  # { combo key: daily returns over the simulation window }
+        self._scores = {}   # { (combo key, start, stop): in-sample Sharpe }
+        self.score_cache_hits = 0
+
+    @staticmethod
+    def preload_params(params, grid=None):
+        """A copy of `params` whose history covers the longest lookback and skip in the grid."""
+        combos = expand_grid(grid, params)
+        return params.model_copy(update={
+            "lookback_months": max(c["lookback_months"] for c in combos),
+            "skip_recent_months": max(c["skip_recent_months"] for c in combos),
+        })
+
+    @staticmethod
+    def _make_folds(n_rows, folds, train_rows):
+        """[(train_start, test_start, test_stop)] as row offsets into the simulation window."""
+        if folds < 1:
+            raise ValueError("Walk-forward needs at least one fold")
+        test_rows = (n_rows - train_rows) // folds
+        if test_rows < 1:
+            raise ValueError(f"Window too short for {folds} folds after {train_rows} training days")
+        bounds = []
+        for k in range(folds):
+            test_start = train_rows + k * test_rows
+            test_stop = n_rows if k == folds - 1 else test_start + test_rows
+            bounds.append((test_start - train_rows, test_start, test_stop))
+        return bounds
+
+    @staticmethod
+    def _key(combo):
+        return tuple(combo[key] for key in GRID_KEYS)
+
+    def _combo_returns(self, combo):
+        key = self._key(combo)
+        if key not in self._returns:
+            nav = rule_nav(
+                self.strategy, self.prices, self.rebalance_rows,
+                combo["lookback_months"] * ROWS_PER_MONTH, combo["skip_recent_months"] * ROWS_PER_MONTH,
+                combo["top_n"] or 10, 1.0
+            )[0]
+            self._returns[key] = np.diff(nav, prepend=1.0) / np.concatenate([[1.0], nav[:-1]])
+        return self._returns[key]
+
+    def precompute(self):
+        """Evaluate every combination once, in parallel."""
+        with ThreadPoolExecutor(max_workers=max(1, min(WALK_FORWARD_WORKERS, len(self.combos)))) as pool:
+            list(pool.map(self._combo_returns, self.combos))
+
+    def score(self, combo, start, stop):
+        key = (self._key(combo), start, stop)
+        if key in self._scores:
+            self.score_cache_hits += 1
+        else:
+            self._scores[key] = sharpe(self._combo_returns(combo)[start:stop])
+        return self._scores[key]
+
+    def run_fold(self, k):
+        train_start, test_start, test_stop = self.folds[k]
+        best = max(self.combos, key=lambda combo: self.score(combo, train_start, test_start))
+        oos = self._combo_returns(best)[test_start:test_stop]
+        dates = self.dates[self.start_row:]
+        return {
+            "fold": k + 1,
+            "train_start": str(dates[train_start].date()),
+            "test_start": str(dates[test_start].date()),
+            "test_end": str(dates[test_stop - 1].date()),
+            "params": best,
+            "in_sample_sharpe": _finite(self.score(best, train_start, test_start)),
+            "out_of_sample_sharpe": _finite(sharpe(oos)),
+            "out_of_sample_return_pct": round(float(np.prod(1 + oos) - 1) * 100, 2),
+            "returns": oos,
+        }
+
+    def stitch(self, fold_results):
+        """(dates, NAV) of the chained out-of-sample segments, starting from starting_value."""
+        returns = np.concatenate([r["returns"] for r in fold_results])
+        first = self.start_row + self.folds[0][1]
+        dates = self.dates[first:first + len(returns)]
+        nav = self.params.starting_value * np.cumprod(1 + returns) / (1 + returns[0])
+        return dates, np.round(nav, 2)
+
+    def benchmark(self, dates):
+        return benchmark_curve(self.strategy.price_data, self.params.benchmark, dates, self.params.starting_value)
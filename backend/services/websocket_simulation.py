@@ -1,74 +1,297 @@
 from models.schema import SimulationRequest
-from utils.price_utils import PriceUtils
-from strategies.momentum_strategy import MomentumStrategy
-from strategies.sma_crossover_strategy import SMACrossoverStrategy
-from strategies.cointegration_strategy import CointegrationStrategy
-from strategies.leveraged_etf_strategy import LeveragedETFSwingStrategy
+from strategies import get_strategy
+from strategies.base_strategy import PathScoringStrategy
+from services import metrics
+from services.metrics import PhaseTimer, timed
+from services.profiler import ProfileCapture
+from services.memory_budget import MemoryTracker
+from services.analytics import simulation_metrics
+from services.robustness import RobustnessRun
+from services.walk_forward import WalkForward
+from services.simulation_engine import SimulationEngine
+from services.simulation_jobs import CHECKPOINT_EVERY_DAYS
+from utils.negative_cache import get_negative_cache
+from contextlib import nullcontext
+import asyncio
 import json
-import pandas as pd
+import time
+import numpy as np
 
-STRATEGY_MAP = {
-    "momentum": MomentumStrategy,
-    "sma_crossover": SMACrossoverStrategy,
-    "cointegration": CointegrationStrategy,
-    "leveraged_etf": LeveragedETFSwingStrategy
-}
+# Bulky arrays left out of the done payload when the client asks for summary_only
+SUMMARY_ONLY_OMITTED = ("daily_values", "daily_benchmark_values", "all_trades", "trade_history_by_date")
 
 class WebSocketSimulationService:
-    def __init__(self, websocket, params: SimulationRequest):
+    def __init__(self, websocket, params: SimulationRequest, job=None):
         self.websocket = websocket
         self.params = params
+        self.job = job  # SimulationJob when running detached; `websocket` is then its JobChannel
         self.strategy = None
-        self.benchmark_shares = None
+        self.engine = None
+        self.memory = MemoryTracker(params.memory_budget_mb)
+        self.daily_frames_sent = 0
 
     async def send(self, event_type, payload):
-        await self.websocket.send_text(json.dumps({"type": event_type, "payload": payload}))
+        with timed("send"):
+            frame = {"type": event_type, "payload": payload}
+            if self.job is not None:
+                await self.websocket.send_frame(frame)
+            else:
+                await self.websocket.send_text(json.dumps(frame))
 
-    async def get_benchmark_value(self, date):
+    async def send_progress(self, loaded, total):
+        await self.send("status", f"Loaded {loaded}/{total} tickers")
+
+    async def run(self):
+        # Collect per-phase timings for this run (initialize, data fetch, rebalance, valuation, send)
+        timer = PhaseTimer()
+        token = metrics.activate(timer)
+        capture = ProfileCapture(label=self._profile_label()) if self.params.profile else None
         try:
-            df = self.strategy.price_data[self.params.benchmark]
-            ts = pd.to_datetime(date)
-            price = df["adj_close"].asof(ts)
-            if pd.isna(price):
-                return None
-            return round(self.benchmark_shares * price, 2)
-        except Exception as e:
-            print(f"[ERROR] Failed to get benchmark value on {date}: {e}")
+            with capture or nullcontext():
+                done = await self._simulate()
+            if done is None:
+                return
+            if self.params.summary_only:
+                for key in SUMMARY_ONLY_OMITTED:
+                    done.pop(key, None)
+            done["data_summary"] = self._data_summary(timer)
+            if self.params.include_timings:
+                done["timings"] = timer.summary()
+            if capture is not None and capture.profile_id:
+                done["profile_id"] = capture.profile_id
+            await self.send("done", done)
+            await self.websocket.close()
+        finally:
+            metrics.deactivate(token)
+
+    async def _simulate_intraday(self, start_time):
+        if not self.strategy.supports_intraday:
+            await self.send("error", f"Strategy {self.params.strategy} does not support intraday bars")
+            await self.websocket.close()
             return None
 
-    async def run(self):
+        async def send_nav(ts_str, portfolio_value, benchmark_value):
+            await self.send("daily", {
+                "date": ts_str,
+                "portfolio_value": portfolio_value,
+                "benchmark_value": benchmark_value
+            })
+            self.daily_frames_sent += 1
+
+        result = await self.engine.run_intraday(self.send, send_nav)
+        if not result["bars_processed"]:
+            await self.send("error", f"No {self.params.bar_interval} bars in the local store for {self.params.start_date} to {self.params.end_date}; load them with scripts/ingest_bars.py")
+            await self.websocket.close()
+            return None
+
+        return {
+            "start_date": self.params.start_date,
+            "end_date": self.params.end_date,
+            "benchmark": self.params.benchmark,
+            "starting_value": self.params.starting_value,
+            "bar_interval": self.params.bar_interval,
+            "nav_sample_minutes": self.params.nav_sample_minutes,
+            "bars_processed": result["bars_processed"],
+            "final_portfolio_value": round(result["final_value"], 2),
+            "final_benchmark_value": result["final_benchmark_value"],
+            "total_return_pct": round(((result["final_value"] - self.params.starting_value) / self.params.starting_value) * 100, 2),
+            "trade_history_by_date": self.strategy.portfolio.trade_history_by_date,
+            "daily_values": result["daily_values"],
+            "daily_benchmark_values": result["daily_benchmark_values"],
+            "all_trades": result.get("all_trades", []),
+            "metrics": self._metrics(result),
+            "duration_sec": round(time.time() - start_time, 2)
+        }
+
+    async def _simulate_robustness(self, start_time):
+        run = RobustnessRun(
+            self.strategy, self.params, self.params.robustness_paths,
+            self.params.bootstrap_block_days, self.params.robustness_seed
+        )
+        await self.send("status", f"Running {run.n_paths} bootstrap paths...")
+        # Path NAVs are joined once at the end; progress frames only need each path's outcome
+        chunks, finals, drawdowns = [], [], []
+        paths_done = 0
+        for size in run.chunk_sizes():
+            # Each chunk is seconds of NumPy work; keep it off the event loop
+            with timed("robustness_chunk"):
+                chunk = await asyncio.to_thread(run.run_chunk, size)
+            chunks.append(chunk)
+            final, drawdown = run.path_outcomes(chunk)
+            finals.append(final)
+            drawdowns.append(drawdown)
+            paths_done += len(chunk)
+            await self.send("robustness", {
+                "paths_done": paths_done,
+                "paths_total": run.n_paths,
+                "distribution": run.outcome_distribution(np.concatenate(finals), np.concatenate(drawdowns))
+            })
+        navs = np.concatenate(chunks)
+        del chunks
+
+        with timed("robustness_summary"):
+            summary = await asyncio.to_thread(run.summary, navs)
+        median = summary["nav_bands"]["p50"]
+        dates = summary["dates"]
+        benchmark = run.benchmark.tolist() if run.benchmark is not None else [None] * len(dates)
+        return {
+            "start_date": self.params.start_date,
+            "end_date": self.params.end_date,
+            "benchmark": self.params.benchmark,
+            "starting_value": self.params.starting_value,
+            "lookback_months": self.params.lookback_months,
+            "skip_recent_months": self.params.skip_recent_months,
+            "top_n": self.params.top_n,
+            "final_portfolio_value": median[-1],
+            "final_benchmark_value": benchmark[-1],
+            "total_return_pct": summary["distribution"]["total_return_pct"]["p50"],
+            "daily_values": [{"date": d, "portfolio_value": v} for d, v in zip(dates, median)],
+            "daily_benchmark_values": [{"date": d, "benchmark_value": v} for d, v in zip(dates, benchmark)],
+            "robustness": summary,
+            "duration_sec": round(time.time() - start_time, 2)
+        }
+
+    async def _simulate_walk_forward(self, start_time):
+        try:
+            study = WalkForward(
+                self.strategy, self.params, self.params.walk_forward_grid,
+                self.params.walk_forward_folds, self.params.walk_forward_train_months
+            )
+        except ValueError as e:
+            await self.send("error", str(e))
+            await self.websocket.close()
+            return None
+
+        await self.send("status", f"Evaluating {len(study.combos)} parameter sets over {len(study.folds)} folds...")
+        with timed("walk_forward_grid"):
+            await asyncio.to_thread(study.precompute)
+        folds = []
+        for k in range(len(study.folds)):
+            with timed("walk_forward_fold"):
+                fold = study.run_fold(k)
+            folds.append(fold)
+            await self.send("walk_forward", {key: value for key, value in fold.items() if key != "returns"})
+
+        dates, nav = study.stitch(folds)
+        date_strs = [str(d.date()) for d in dates]
+        benchmark = study.benchmark(dates)
+        benchmark = benchmark.tolist() if benchmark is not None else [None] * len(date_strs)
+        final_value = float(nav[-1])
+        return {
+            "start_date": self.params.start_date,
+            "end_date": self.params.end_date,
+            "benchmark": self.params.benchmark,
+            "starting_value": self.params.starting_value,
+            "final_portfolio_value": round(final_value, 2),
+            "final_benchmark_value": benchmark[-1],
+            "total_return_pct": round((final_value / self.params.starting_value - 1) * 100, 2),
+            "daily_values": [{"date": d, "portfolio_value": float(v)} for d, v in zip(date_strs, nav)],
+            "daily_benchmark_values": [{"date": d, "benchmark_value": v} for d, v in zip(date_strs, benchmark)],
+            "walk_forward": {
+                "folds": [{key: value for key, value in fold.items() if key != "returns"} for fold in folds],
+                "combinations": len(study.combos),
+                "train_months": self.params.walk_forward_train_months,
+                "score_cache_hits": study.score_cache_hits
+            },
+            "metrics": simulation_metrics(date_strs, nav.tolist(), benchmark, []),
+            "duration_sec": round(time.time() - start_time, 2)
+        }
+
+    @staticmethod
+    def _metrics(result):
+        with timed("analytics"):
+            nav = result["nav"]
+            return simulation_metrics(nav["dates"], nav["values"], nav["benchmark"], result.get("all_trades", []))
+
+    @staticmethod
+    def _data_summary(timer):
+        counters = timer.counters
+        return {
+            "tickers_downloaded": counters.get("tickers_downloaded", 0),
+            "tickers_failed": counters.get("tickers_failed", 0),
+            "negative_cache_hits": counters.get("negative_cache_hits", 0),
+            "negative_cache": get_negative_cache().stats(),
+        }
+
+    def _profile_label(self):
+        return f"{self.params.strategy} {self.params.start_date}..{self.params.end_date}"
+
+    async def _simulate(self):
         # Start the timer
-        import time
         start_time = time.time()
-        
+
         # Step 1: Initialize the selected strategy class
-        strategy_cls = STRATEGY_MAP.get(self.params.strategy)
+        strategy_cls = get_strategy(self.params.strategy)
         if not strategy_cls:
             await self.send("error", f"Unknown strategy: {self.params.strategy}")
             await self.websocket.close()
-            return
+            return None
 
         self.strategy = strategy_cls(self.params)
-        await self.strategy.initialize()
-
-        # Step 2: Calculate benchmark shares based on initial price data
-        self.benchmark_shares = PriceUtils.get_benchmark_shares(
-            self.strategy.price_data,
-            self.params.benchmark,
-            self.params.starting_value,
-            self.params.start_date
+        self.engine = SimulationEngine(self.strategy, self.params)
+        if self.params.bar_interval:
+            return await self._simulate_intraday(start_time)
+        if (self.params.robustness_paths or self.params.walk_forward_folds) and not isinstance(self.strategy, PathScoringStrategy):
+            await self.send("error", f"Strategy {self.params.strategy} does not support robustness or walk-forward runs")
+            await self.websocket.close()
+            return None
+        if self.params.walk_forward_folds:
+            try:
+                # Load enough history for the longest lookback in the grid
+                self.strategy.params = WalkForward.preload_params(self.params, self.params.walk_forward_grid)
+            except ValueError as e:
+                await self.send("error", str(e))
+                await self.websocket.close()
+                return None
+
+        # Refuse or degrade before loading anything if the request would not fit the memory budget
+        plan = self.memory.plan(
+            self.strategy.estimate_universe_size(),
+            self.params.start_date,
+            self.params.end_date,
+            self.strategy.history_months(),
+            can_sample_universe=self.strategy.supports_universe_sampling
         )
+        self.strategy.retain_daily_values = plan.retain_daily_values
+        if self.job is not None and not plan.retain_daily_values:
+            self.job.stop_retaining_daily_values()
+        self.strategy.universe_fraction = plan.universe_fraction
+        if plan.degraded:
+            await self.send("status", f"Large request: running with reduced memory ({', '.join(plan.degraded)})")
 
-        async def send_daily(date, portfolio_value, benchmark_value):
-            await self.send("daily", {
+        with timed("initialize"):
+            await self.engine.initialize(progress=self.send_progress)
+        if self.params.robustness_paths:
+            return await self._simulate_robustness(start_time)
+        if self.params.walk_forward_folds:
+            return await self._simulate_walk_forward(start_time)
+
+        async def send_daily(date, portfolio_value, benchmark_value, extra=None):
+            frame = {
                 "date": date.strftime("%Y-%m-%d"),
                 "portfolio_value": portfolio_value,
                 "benchmark_value": benchmark_value
-            })
+            }
+            if extra:
+                frame["benchmarks"] = extra
+            await self.send("daily", frame)
+            self.daily_frames_sent += 1
+            self.memory.observe(
+                self.strategy.price_data, self.strategy.portfolio,
+                buffered_frames=self.daily_frames_sent if self.strategy.retain_daily_values else 0
+            )
+            if self.strategy.retain_daily_values and self.memory.over_budget():
+                # Stop buffering the series; clients already have it from the daily frames
+                self.strategy.retain_daily_values = False
+                self.memory.plan_result.degraded.append("daily_values_dropped_mid_run")
+                if self.job is not None:
+                    self.job.stop_retaining_daily_values()
+            if self.job is not None and self.daily_frames_sent % CHECKPOINT_EVERY_DAYS == 0:
+                self.job.save_checkpoint(date.strftime("%Y-%m-%d"), self.daily_frames_sent, self.strategy.portfolio)
 
-        result = await self.strategy.run(self.websocket, self.get_benchmark_value, send_daily)
-
-        await self.send("done", {
+        result = await self.engine.run(self.send, send_daily)
+        self.memory.observe(self.strategy.price_data, self.strategy.portfolio, force=True)
+        done = {
             "start_date": self.params.start_date,
             "end_date": self.params.end_date,
             "benchmark": self.params.benchmark,
@@ -77,15 +300,20 @@ class WebSocketSimulationService:
             "skip_recent_months": self.params.skip_recent_months,
             "top_n": self.params.top_n,
             "final_portfolio_value": round(result["final_value"], 2),
-            "final_benchmark_value": await self.get_benchmark_value(
-                result["daily_values"][-1]["date"] if result["daily_values"] else self.params.end_date
-            ),
+            "final_benchmark_value": result["final_benchmark_value"],
             "total_return_pct": round(((result["final_value"] - self.params.starting_value) / self.params.starting_value) * 100, 2),
             "trade_history_by_date": self.strategy.portfolio.trade_history_by_date,
             "daily_values": result["daily_values"],
             "daily_benchmark_values": result["daily_benchmark_values"],
             "all_trades": result.get("all_trades", []),
+            "metrics": self._metrics(result),
+            "memory": self.memory.report(),
             "duration_sec": round(time.time() - start_time, 2)
-        })
-
-        await self.websocket.close()
+        }
+        if result.get("final_benchmarks"):
+            done["final_benchmarks"] = result["final_benchmarks"]
+        if not self.strategy.retain_daily_values:
+            # Series were streamed only; a partial copy here would overwrite the client's full one
+            done.pop("daily_values")
+            done.pop("daily_benchmark_values")
+        return done
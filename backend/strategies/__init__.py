@@ -0,0 +1,4 @@
+from .registry import register_strategy, get_strategy, available_strategies
+
+# Importing the built-in strategies registers them
+from . import momentum_strategy, sma_crossover_strategy, cointegration_strategy, leveraged_etf_strategy  # noqa: F401
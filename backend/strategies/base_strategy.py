@@ -1,11 +1,114 @@
 from abc import ABC, abstractmethod
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from utils.data_fetcher import data_fetcher
+from services.memory_budget import sample_universe
+
+SP500_UNIVERSE_SIZE = 505
+
 
 class BaseStrategy(ABC):
-    def __init__(self, portfolio, price_data, params):
-        self.portfolio = portfolio
-        self.price_data = price_data
+    """A strategy plugin run by services.simulation_engine.SimulationEngine.
+
+    A strategy declares what it needs and reacts to the engine's calendar:
+
+    - `universe(date_str)`: tickers to load (S&P 500 members by default). With
+      `dynamic_universe` the engine re-resolves it on every rebalance and loads the
+      newly added names.
+    - `history_months()`: months of history loaded before start_date.
+    - `indicators_spec()`: { name: causal function of an adj_close Series }, served
+      by `self.indicators` (a utils.indicator_cache.IndicatorCache).
+    - `rebalance_due(date, last_rebalance)`: whether to call `on_rebalance` today.
+    - `prepare(date_str)`: one-off setup once price data is loaded, before the first bar.
+      It runs in a worker thread, so it may block on I/O or heavy computation.
+    - `on_rebalance(date, date_str)` and `on_bar(date, date_str)`: trade through
+      `self.portfolio`. on_bar runs every calendar day, after any rebalance.
+
+    Strategies with `supports_intraday` can also run on intraday bars (params.bar_interval):
+    the engine streams bars from utils.bar_store.BarStore and calls
+    `on_intraday_bar(timestamp, ts_str, ticker, close)` for each, with `self.portfolio`
+    priced at the latest bar. Only rolling state (utils.rolling) should be kept, since
+    no price history is loaded in that mode.
+
+    Strategies that also derive from PathScoringStrategy implement `path_scores(window)`,
+    a vectorized ranking over many resampled price paths used by services.robustness.
+
+    The engine owns preloading, iteration, valuation, streaming, error handling and
+    end-of-run close-out, and sets `portfolio`, `price_data`, `indicators`, `calendar`
+    (a utils.trading_calendar.TradingCalendar) and `benchmarks` (a
+    services.benchmarks.BenchmarkSet) before the first bar.
+    """
+
+    start_message = "Starting Simulation..."
+    dynamic_universe = False
+    supports_intraday = False
+
+    # Memory controls, set by the simulation service from its MemoryPlan before preloading
+    retain_daily_values = True
+    universe_fraction = None
+    supports_universe_sampling = False
+
+    def __init__(self, params):
         self.params = params
+        self.price_data = {}
+        self.portfolio = None
+        self.indicators = None
+        self.calendar = None
+        self.benchmarks = None
+        self.current_tickers = set()
 
-    @abstractmethod
-    async def run(self, websocket, get_benchmark_value, send_daily, send_rebalance):
+    def universe(self, date_str):
+        """Tickers to trade as of `date_str`. The engine adds the benchmark."""
+        return sample_universe(data_fetcher.get_sp500_tickers_as_of(date_str), self.universe_fraction)
+
+    def estimate_universe_size(self):
+        """Upper bound on tickers this strategy loads, used for memory planning."""
+        return SP500_UNIVERSE_SIZE
+
+    def history_months(self):
+        """Months of price history loaded before start_date."""
+        return self.params.lookback_months + self.params.skip_recent_months
+
+    def indicators_spec(self):
+        """{ name: function(adj_close Series) -> Series }; every function must be causal."""
+        return {}
+
+    def prepare(self, date_str):
         pass
+
+    def rebalance_due(self, date, last_rebalance):
+        return False
+
+    def on_rebalance(self, date, date_str):
+        pass
+
+    def on_bar(self, date, date_str):
+        pass
+
+    def on_intraday_bar(self, timestamp, ts_str, ticker, close):
+        pass
+
+    def summary(self, end_date_str):
+        """Extra keys merged into the engine's result at the end of the run."""
+        return {}
+
+
+class PathScoringStrategy(ABC):
+    """Mixin for strategies that can rank resampled price paths (robustness and walk-forward runs)."""
+
+    @abstractmethod
+    def path_scores(self, window):
+        """Scores (paths x tickers) from prices (paths x days x tickers); higher ranks first."""
+
+
+def every_n_days(n):
+    """rebalance_due implementation for a fixed calendar-day cadence starting on start_date."""
+    def due(self, date, last_rebalance):
+        return last_rebalance is None or date >= last_rebalance + timedelta(days=n)
+    return due
+
+
+def every_n_months(n):
+    def due(self, date, last_rebalance):
+        return last_rebalance is None or date >= last_rebalance + relativedelta(months=n)
+    return due
@@ -1,16 +1,14 @@
 import pandas as pd
-from datetime import datetime, timedelta
-from .base_strategy import BaseStrategy
-from services.portfolio import Portfolio
-from utils.data_fetcher import DataFetcher
+from dateutil.relativedelta import relativedelta
+from .base_strategy import BaseStrategy, SP500_UNIVERSE_SIZE
+from .registry import register_strategy
+from utils.pair_screener import pair_screener, load_sector_map
 import numpy as np
 
+@register_strategy("cointegration")
 class CointegrationStrategy(BaseStrategy):
     def __init__(self, params):
-        self.params = params
-        self.price_data = {}
-        self.portfolio = None
-        self.data_fetcher = DataFetcher()
+        super().__init__(params)
 
         # Multiple cointegrated pairs for better diversification
         self.pairs = [
@@ -20,7 +18,7 @@ class CointegrationStrategy(BaseStrategy):
             ("JPM", "BAC"),  # JPMorgan vs Bank of America (Banking)
             ("AAPL", "MSFT"), # Apple vs Microsoft (Technology)
             ("HD", "LOW"),   # Home Depot vs Lowe's (Retail)
-            ("UNH", "ANTM"), # UnitedHealth vs Anthem (Healthcare)
+            ("UNH", "ELV"),  # UnitedHealth vs Elevance, formerly Anthem/ANTM (Healthcare)
             ("WMT", "TGT"),  # Walmart vs Target (Retail)
         ]
         
@@ -31,26 +29,64 @@ class CointegrationStrategy(BaseStrategy):
         self.max_positions = 4  # Maximum number of pairs to trade simultaneously
         self.market_exposure_pct = 0.30  # Keep 30% in market exposure (SPY) for upside capture
 
-    async def initialize(self):
-        start_date = self.params.start_date
-        end_date = self.params.end_date
-        
+        self.active_pairs = set()
+        self.days_processed = 0
+        self.market_position_established = False
+
+        # With screen_pairs, the pairs are picked from the S&P members by PairScreener
+        # over the lookback window before start_date instead of the static list above
+        self.screen_pairs = params.screen_pairs
+        self.max_pairs = len(self.pairs)
+        self.screened_pairs = []
+        if self.screen_pairs:
+            self.supports_universe_sampling = True
+
+    def universe(self, date_str):
+        if self.screen_pairs:
+            return super().universe(date_str)
         # Get all unique tickers from pairs
-        all_tickers = set()
-        for pair in self.pairs:
-            all_tickers.update(pair)
-        
-        # Add benchmark to tickers if not already present
-        if self.params.benchmark not in all_tickers:
-            all_tickers.add(self.params.benchmark)
-
-        self.price_data = self.data_fetcher.preload_price_data_cointegration(
-            start_date, end_date,
-            self.params.lookback_months,
-            self.params.benchmark,
-            list(all_tickers)
-        )
-        self.portfolio = Portfolio(self.params.starting_value, self.price_data)
+        return {t for pair in self.pairs for t in pair}
+
+    def estimate_universe_size(self):
+        if self.screen_pairs:
+            return SP500_UNIVERSE_SIZE
+        return len({t for pair in self.pairs for t in pair}) + 1
+
+    def prepare(self, date_str):
+        if not self.screen_pairs:
+            return
+        reserved = {self.params.benchmark, "SPY"}
+        candidates = {t: df for t, df in self.price_data.items() if t not in reserved}
+        window_start = pd.to_datetime(date_str) - relativedelta(months=self.params.lookback_months)
+        window_end = pd.to_datetime(date_str) - pd.Timedelta(days=1)
+        ranked = pair_screener.screen(candidates, window_start, window_end, load_sector_map(candidates))
+
+        # Take the strongest pairs with no ticker in two pairs, since positions are closed per ticker
+        pairs, used = [], set()
+        for entry in ranked:
+            x, y = entry["pair"]
+            if x in used or y in used:
+                continue
+            pairs.append((x, y))
+            self.screened_pairs.append(entry)
+            used.update((x, y))
+            if len(pairs) >= self.max_pairs:
+                break
+        if pairs:
+            self.pairs = pairs
+        else:
+            self.pairs = [p for p in self.pairs if all(t in self.price_data for t in p)]
+        print(f"[INFO] Trading {len(self.pairs)} pairs: {self.pairs}")
+
+        # Release the screening universe; only the pairs and the market leg are traded
+        keep = {t for pair in self.pairs for t in pair} | reserved
+        for ticker in list(self.price_data):
+            if ticker not in keep:
+                del self.price_data[ticker]
+        self.current_tickers = keep
+
+    def history_months(self):
+        return self.params.lookback_months
 
     def calculate_spread_zscore(self, x, y):
         """Calculate spread and z-score using numpy arrays"""
@@ -151,146 +187,104 @@ class CointegrationStrategy(BaseStrategy):
         return (ticker1 in self.portfolio.holdings and self.portfolio.holdings[ticker1] != 0) or \
                (ticker2 in self.portfolio.holdings and self.portfolio.holdings[ticker2] != 0)
 
-    async def run(self, websocket, get_benchmark_value, send_daily):
-        await websocket.send_text('{"type":"status","payload":"Starting Simulation..."}')
-        current = datetime.strptime(self.params.start_date, "%Y-%m-%d")
-        end = datetime.strptime(self.params.end_date, "%Y-%m-%d")
+    def on_bar(self, date, date_str):
+        self.days_processed += 1
 
-        print(f"[DEBUG] Starting multi-pair cointegration simulation from {current} to {end}")
-        print(f"[DEBUG] Trading pairs: {self.pairs}")
-        print(f"[DEBUG] Entry threshold: {self.entry_threshold}, Exit threshold: {self.exit_threshold}")
-        
-        daily_values, daily_benchmarks = [], []
-        active_pairs = set()
-        days_processed = 0
-        market_position_established = False
+        # Establish market exposure if not already done
+        if not self.market_position_established:
+            market_amount = self.params.starting_value * self.market_exposure_pct
+            market_trade = self.portfolio.open_long_position("SPY", market_amount, date_str)
+            if market_trade:
+                self.market_position_established = True
+                print(f"📈 [{date_str}] Established market exposure: ${market_amount:.2f} in SPY")
 
-        while current <= end:
-            try:
-                date_str = current.strftime("%Y-%m-%d")
-                days_processed += 1
-                
-                # Establish market exposure if not already done
-                if not market_position_established:
-                    market_amount = self.params.starting_value * self.market_exposure_pct
-                    market_trade = self.portfolio.open_long_position("SPY", market_amount, date_str)
-                    if market_trade:
-                        market_position_established = True
-                        print(f"📈 [{date_str}] Established market exposure: ${market_amount:.2f} in SPY")
-                
-                signals = self.check_trade_signal(current)
-
-                # Log z-score every 60 days for diagnostics
-                if days_processed % 60 == 0:
-                    try:
-                        for pair in self.pairs:
-                            ticker1, ticker2 = pair
-                            df1 = self.price_data[ticker1]
-                            df2 = self.price_data[ticker2]
-                            window_days = self.params.lookback_months * 21
-                            current_date = pd.to_datetime(current)
-                            df1_filtered = df1[df1.index <= current_date]
-                            df2_filtered = df2[df2.index <= current_date]
-                            x = df1_filtered["adj_close"].dropna().iloc[-window_days:]
-                            y = df2_filtered["adj_close"].dropna().iloc[-window_days:]
-                            if len(x) >= window_days and len(y) >= window_days:
-                                z_score = self.calculate_spread_zscore(x, y)
-                                if z_score is not None:
-                                    has_pos = self.has_position_in_pair(pair)
-                                    print(f"[DEBUG] Day {days_processed} ({date_str}): {pair} Z-score = {z_score:.2f} | Has position: {has_pos}")
-                    except Exception as e:
-                        print(f"[DEBUG] Could not calculate z-score on day {days_processed}: {e}")
-
-                if signals:
-                    for signal in signals:
-                        action = signal["action"]
-                        z_score = signal["z_score"]
-                        pair = signal["pair"]
-
-                        if action == "enter_short_spread" and pair not in active_pairs:
-                            if self.count_open_positions() >= self.max_positions:
-                                continue
-                                
-                            long_ticker = signal["long_ticker"]
-                            short_ticker = signal["short_ticker"]
-                            position_amount = self.get_position_amount()
-                            
-                            long_trade = self.portfolio.open_long_position(long_ticker, position_amount, date_str)
-                            short_trade = self.portfolio.open_short_position(short_ticker, position_amount, date_str)
-                            
-                            if long_trade and short_trade:
-                                active_pairs.add(pair)
-                                print(f"📊 [{date_str}] Opened spread: Long {long_ticker}, Short {short_ticker} (Z-score: {z_score:.2f})")
-
-                        elif action == "enter_long_spread" and pair not in active_pairs:
-                            if self.count_open_positions() >= self.max_positions:
-                                continue
-                                
-                            long_ticker = signal["long_ticker"]
-                            short_ticker = signal["short_ticker"]
-                            position_amount = self.get_position_amount()
-                            
-                            long_trade = self.portfolio.open_long_position(long_ticker, position_amount, date_str)
-                            short_trade = self.portfolio.open_short_position(short_ticker, position_amount, date_str)
-                            
-                            if long_trade and short_trade:
-                                active_pairs.add(pair)
-                                print(f"📊 [{date_str}] Opened spread: Long {long_ticker}, Short {short_ticker} (Z-score: {z_score:.2f})")
-
-                        elif action == "exit_spread" and pair in active_pairs:
-                            ticker1, ticker2 = pair
-                            
-                            if ticker1 in self.portfolio.holdings and self.portfolio.holdings[ticker1] > 0:
-                                self.portfolio.close_long_position(ticker1, date_str)
-                            elif ticker2 in self.portfolio.holdings and self.portfolio.holdings[ticker2] > 0:
-                                self.portfolio.close_long_position(ticker2, date_str)
-                            
-                            if ticker1 in self.portfolio.holdings and self.portfolio.holdings[ticker1] < 0:
-                                self.portfolio.close_short_position(ticker1, date_str)
-                            elif ticker2 in self.portfolio.holdings and self.portfolio.holdings[ticker2] < 0:
-                                self.portfolio.close_short_position(ticker2, date_str)
-                            
-                            active_pairs.discard(pair)
-                            print(f"📊 [{date_str}] Closed spread: {ticker1}-{ticker2} (Z-score: {z_score:.2f})")
-
-                value = self.portfolio.value_on(date_str)
-                benchmark = await get_benchmark_value(current)
-                await send_daily(current, value, benchmark)
-
-                daily_values.append({"date": date_str, "portfolio_value": value})
-                daily_benchmarks.append({"date": date_str, "benchmark_value": benchmark})
-                current += timedelta(days=1)
+        signals = self.check_trade_signal(date)
 
+        # Log z-score every 60 days for diagnostics
+        if self.days_processed % 60 == 0:
+            try:
+                for pair in self.pairs:
+                    ticker1, ticker2 = pair
+                    df1 = self.price_data[ticker1]
+                    df2 = self.price_data[ticker2]
+                    window_days = self.params.lookback_months * 21
+                    current_date = pd.to_datetime(date)
+                    df1_filtered = df1[df1.index <= current_date]
+                    df2_filtered = df2[df2.index <= current_date]
+                    x = df1_filtered["adj_close"].dropna().iloc[-window_days:]
+                    y = df2_filtered["adj_close"].dropna().iloc[-window_days:]
+                    if len(x) >= window_days and len(y) >= window_days:
+                        z_score = self.calculate_spread_zscore(x, y)
+                        if z_score is not None:
+                            has_pos = self.has_position_in_pair(pair)
+                            print(f"[DEBUG] Day {self.days_processed} ({date_str}): {pair} Z-score = {z_score:.2f} | Has position: {has_pos}")
             except Exception as e:
-                import traceback
-                traceback.print_exc()
-                await websocket.send_text(f'{{"type":"error","payload":"Error on {date_str}: {str(e)}"}}')
-                break
+                print(f"[DEBUG] Could not calculate z-score on day {self.days_processed}: {e}")
+
+        if signals:
+            for signal in signals:
+                action = signal["action"]
+                z_score = signal["z_score"]
+                pair = signal["pair"]
+
+                if action == "enter_short_spread" and pair not in self.active_pairs:
+                    if self.count_open_positions() >= self.max_positions:
+                        continue
+
+                    long_ticker = signal["long_ticker"]
+                    short_ticker = signal["short_ticker"]
+                    position_amount = self.get_position_amount()
+
+                    long_trade = self.portfolio.open_long_position(long_ticker, position_amount, date_str)
+                    short_trade = self.portfolio.open_short_position(short_ticker, position_amount, date_str)
+
+                    if long_trade and short_trade:
+                        self.active_pairs.add(pair)
+                        print(f"📊 [{date_str}] Opened spread: Long {long_ticker}, Short {short_ticker} (Z-score: {z_score:.2f})")
+
+                elif action == "enter_long_spread" and pair not in self.active_pairs:
+                    if self.count_open_positions() >= self.max_positions:
+                        continue
+
+                    long_ticker = signal["long_ticker"]
+                    short_ticker = signal["short_ticker"]
+                    position_amount = self.get_position_amount()
+
+                    long_trade = self.portfolio.open_long_position(long_ticker, position_amount, date_str)
+                    short_trade = self.portfolio.open_short_position(short_ticker, position_amount, date_str)
+
+                    if long_trade and short_trade:
+                        self.active_pairs.add(pair)
+                        print(f"📊 [{date_str}] Opened spread: Long {long_ticker}, Short {short_ticker} (Z-score: {z_score:.2f})")
+
+                elif action == "exit_spread" and pair in self.active_pairs:
+                    ticker1, ticker2 = pair
+
+                    if ticker1 in self.portfolio.holdings and self.portfolio.holdings[ticker1] > 0:
+                        self.portfolio.close_long_position(ticker1, date_str)
+                    elif ticker2 in self.portfolio.holdings and self.portfolio.holdings[ticker2] > 0:
+                        self.portfolio.close_long_position(ticker2, date_str)
+
+                    if ticker1 in self.portfolio.holdings and self.portfolio.holdings[ticker1] < 0:
+                        self.portfolio.close_short_position(ticker1, date_str)
+                    elif ticker2 in self.portfolio.holdings and self.portfolio.holdings[ticker2] < 0:
+                        self.portfolio.close_short_position(ticker2, date_str)
 
-        # Close all remaining positions at the end
-        final_trades = []
-        for ticker in list(self.portfolio.holdings.keys()):
-            if self.portfolio.holdings[ticker] > 0:
-                trade = self.portfolio.close_long_position(ticker, end.strftime("%Y-%m-%d"))
-                if trade:
-                    final_trades.append(trade.to_dict())
-            elif self.portfolio.holdings[ticker] < 0:
-                trade = self.portfolio.close_short_position(ticker, end.strftime("%Y-%m-%d"))
-                if trade:
-                    final_trades.append(trade.to_dict())
+                    self.active_pairs.discard(pair)
+                    print(f"📊 [{date_str}] Closed spread: {ticker1}-{ticker2} (Z-score: {z_score:.2f})")
 
+    def summary(self, end_date_str):
         return {
-            "final_orders": final_trades,
-            "final_value": self.portfolio.cash,
-            "daily_values": daily_values,
-            "daily_benchmark_values": daily_benchmarks,
-            "all_trades": self.portfolio.get_all_trades(),
             "strategy_summary": {
                 "total_trades": len(self.portfolio.get_all_trades()),
                 "closed_trades": len(self.portfolio.get_closed_trades()),
                 "open_trades": len(self.portfolio.get_open_trades()),
                 "market_exposure_pct": self.market_exposure_pct,
                 "pairs_trading_pct": 1 - self.market_exposure_pct,
-                "final_portfolio_summary": self.portfolio.get_portfolio_summary(end.strftime("%Y-%m-%d"))
+                "pairs": [list(pair) for pair in self.pairs],
+                "screened_pairs": [
+                    {**entry, "pair": list(entry["pair"])} for entry in self.screened_pairs
+                ],
+                "final_portfolio_summary": self.portfolio.get_portfolio_summary(end_date_str)
             }
         }
@@ -1,16 +1,73 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 from .base_strategy import BaseStrategy
-from services.portfolio import Portfolio
-from utils.data_fetcher import DataFetcher
+from .registry import register_strategy
+from utils.rolling import EMA, RollingRSI, RollingWindow
 
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+MACD_MIN_PRICES = MACD_SLOW + MACD_SIGNAL
+
+
+def rsi_series(prices, window=RSI_WINDOW):
+    """RSI over a whole price series"""
+    delta = prices.diff().dropna()
+    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def macd_series(prices, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """(MACD line, signal line) over a whole price series"""
+    ema_fast = prices.ewm(span=fast).mean()
+    ema_slow = prices.ewm(span=slow).mean()
+    macd_line = ema_fast - ema_slow
+    return macd_line, macd_line.ewm(span=signal).mean()
+
+
+class _IntradayState:
+    """Per-ticker rolling state for intraday bars, mirroring the daily indicators bar by bar."""
+
+    def __init__(self):
+        self.bars = 0
+        self.closes = RollingWindow(10)
+        self.returns = RollingWindow(20)
+        self.rsi = RollingRSI(RSI_WINDOW)
+        self.ema_fast, self.ema_slow, self.signal = EMA(MACD_FAST), EMA(MACD_SLOW), EMA(MACD_SIGNAL)
+        self.macd = None
+        self.peak = None  # Highest close since entry while a position is open
+
+    def update(self, close):
+        previous = self.closes.last()
+        if previous:
+            self.returns.push(close / previous - 1)
+        self.closes.push(close)
+        self.bars += 1
+        self.rsi.update(close)
+        self.macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        self.signal.update(self.macd)
+        if self.peak is not None:
+            self.peak = max(self.peak, close)
+
+    def volatility(self):
+        return self.returns.std() if self.returns.full else None
+
+    def technicals(self):
+        """(rsi, macd, signal) like LeveragedETFSwingStrategy._technicals; None without enough bars."""
+        rsi = self.rsi.value if self.bars >= RSI_WINDOW + 1 else None
+        if self.bars < MACD_MIN_PRICES:
+            return rsi, None, None
+        return rsi, self.macd, self.signal.value
+
+
+@register_strategy("leveraged_etf")
 class LeveragedETFSwingStrategy(BaseStrategy):
+    start_message = "Starting Leveraged ETF Swing Simulation..."
+    supports_intraday = True
+
     def __init__(self, params):
-        self.params = params
-        self.price_data = {}
-        self.portfolio = None
-        self.data_fetcher = DataFetcher()
+        super().__init__(params)
         # More conservative ETF selection - mix of 2x and 3x
         self.etfs = ["TQQQ", "SPXL", "QLD", "SSO"]  # TQQQ, SPXL (3x), QLD, SSO (2x)
         self.hold_period_days = 10  # Longer hold period
@@ -18,17 +75,13 @@ class LeveragedETFSwingStrategy(BaseStrategy):
         self.max_position_size = 0.25  # Max 25% in any single ETF
         self.last_entry_dates = {}  # Track when we entered each ETF
         self.entry_prices = {}  # Track entry prices for better risk management
+        self.intraday_state = {}  # { ticker: _IntradayState } in intraday mode
 
-    async def initialize(self):
-        self.price_data = self.data_fetcher.preload_price_data(
-            self.params.start_date,
-            self.params.end_date,
-            self.params.lookback_months,
-            self.params.skip_recent_months,
-            self.params.benchmark,
-            self.etfs
-        )
-        self.portfolio = Portfolio(self.params.starting_value, self.price_data)
+    def universe(self, date_str):
+        return set(self.etfs)
+
+    def estimate_universe_size(self):
+        return len(self.etfs) + 1
 
     def calculate_volatility(self, prices, window=20):
         """Calculate rolling volatility"""
@@ -37,57 +90,47 @@ class LeveragedETFSwingStrategy(BaseStrategy):
             return None
         return returns.rolling(window=window).std().iloc[-1]
 
-    def calculate_rsi(self, prices, window=14):
-        """Calculate RSI indicator"""
-        if len(prices) < window + 1:
-            return None
-        
-        delta = prices.diff().dropna()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi.iloc[-1]
-
-    def calculate_macd(self, prices, fast=12, slow=26, signal=9):
-        """Calculate MACD indicator"""
-        if len(prices) < slow + signal:
-            return None
-        
-        ema_fast = prices.ewm(span=fast).mean()
-        ema_slow = prices.ewm(span=slow).mean()
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal).mean()
-        histogram = macd_line - signal_line
-        
+    def indicators_spec(self):
         return {
-            'macd': macd_line.iloc[-1],
-            'signal': signal_line.iloc[-1],
-            'histogram': histogram.iloc[-1]
+            "close": lambda prices: prices.dropna(),
+            "volatility": lambda prices: prices.dropna().pct_change().dropna().rolling(window=20).std(),
+            "rsi": lambda prices: rsi_series(prices.dropna()),
+            "macd": lambda prices: macd_series(prices.dropna())[0],
+            "macd_signal": lambda prices: macd_series(prices.dropna())[1],
         }
 
+    def _technicals(self, ticker, date):
+        """(n_prices, rsi, macd, signal) as of `date`; rsi/macd are None without enough history."""
+        n = self.indicators.count("close", ticker, date)
+        rsi = self.indicators.value("rsi", ticker, date) if n >= RSI_WINDOW + 1 else None
+        if n < MACD_MIN_PRICES:
+            return n, rsi, None, None
+        return n, rsi, self.indicators.value("macd", ticker, date), self.indicators.value("macd_signal", ticker, date)
+
     def should_enter(self, ticker, date):
         df = self.price_data[ticker]
         if date not in df.index:
             return False
 
-        # Get price data up to current date
-        prices = df[df.index <= date]["adj_close"].dropna()
-        if len(prices) < 30:
+        # Price history up to the current date
+        n, rsi, macd, signal = self._technicals(ticker, date)
+        if n < 30:
             return False
 
-        # Calculate technical indicators
-        volatility = self.calculate_volatility(prices)
-        rsi = self.calculate_rsi(prices)
-        macd_data = self.calculate_macd(prices)
-        
-        if volatility is None or rsi is None or macd_data is None:
+        volatility = self.indicators.value("volatility", ticker, date)
+        if volatility is None or rsi is None or macd is None:
             return False
 
+        recent_prices = self.indicators.window("close", ticker, date, 10)
+        return self._entry_signal(
+            volatility, rsi, macd, signal,
+            recent_prices.iloc[-1], recent_prices.mean(), self.indicators.value("close", ticker, date, offset=4)
+        )
+
+    def _entry_signal(self, volatility, rsi, macd, signal, price, recent_mean, price_4_ago):
+        """Entry rules shared by daily and intraday bars, given the latest 10 closes' mean."""
         # More sophisticated entry criteria
-        recent_prices = prices.tail(10)
-        price_trend = recent_prices.iloc[-1] > recent_prices.mean()
+        price_trend = price > recent_mean
         
         # Volatility filter - avoid extremely volatile periods
         if volatility > 0.05:  # 5% daily volatility threshold
@@ -98,10 +141,10 @@ class LeveragedETFSwingStrategy(BaseStrategy):
             return False
         
         # MACD filter - look for bullish crossover
-        macd_bullish = macd_data['macd'] > macd_data['signal'] and macd_data['histogram'] > 0
+        macd_bullish = macd > signal and (macd - signal) > 0
         
         # Price momentum filter
-        momentum_positive = price_trend and prices.iloc[-1] > prices.iloc[-5]
+        momentum_positive = price_trend and price > price_4_ago
         
         # Volume confirmation (if available)
         volume_ok = True  # Placeholder for volume analysis
@@ -125,8 +168,12 @@ class LeveragedETFSwingStrategy(BaseStrategy):
         if len(prices_since_entry) < 2:
             return False
 
+        _, rsi, macd, signal = self._technicals(ticker, date)
+        return self._exit_signal(current_price, prices_since_entry.max(), entry_price, date - entry_date, rsi, macd, signal)
+
+    def _exit_signal(self, current_price, peak, entry_price, held, rsi, macd, signal):
+        """Exit rules shared by daily and intraday bars; `held` is the time since entry."""
         # Calculate drawdown from peak
-        peak = prices_since_entry.max()
         drawdown = (peak - current_price) / peak
         
         # Calculate total return
@@ -134,18 +181,14 @@ class LeveragedETFSwingStrategy(BaseStrategy):
         
         # Exit conditions
         stop_loss_hit = drawdown >= self.trailing_stop_pct
-        hold_period_expired = (date - entry_date).days >= self.hold_period_days
+        hold_period_expired = held.days >= self.hold_period_days
         profit_taking = total_return >= 0.15  # Take profit at 15% gain
         
         # Technical exit signals
-        prices = df[df.index <= date]["adj_close"].dropna()
-        rsi = self.calculate_rsi(prices)
-        macd_data = self.calculate_macd(prices)
-        
         technical_exit = False
-        if rsi and macd_data:
+        if rsi and macd is not None:
             # Exit if RSI becomes overbought or MACD turns bearish
-            technical_exit = (rsi > 75) or (macd_data['macd'] < macd_data['signal'] and macd_data['histogram'] < 0)
+            technical_exit = (rsi > 75) or (macd < signal and (macd - signal) < 0)
         
         return stop_loss_hit or hold_period_expired or profit_taking or technical_exit
 
@@ -154,8 +197,9 @@ class LeveragedETFSwingStrategy(BaseStrategy):
         # Get current volatility
         df = self.price_data[ticker]
         prices = df["adj_close"].dropna().tail(30)
-        volatility = self.calculate_volatility(prices)
-        
+        return self._allocation(self.calculate_volatility(prices), available_cash)
+
+    def _allocation(self, volatility, available_cash):
         if volatility is None:
             volatility = 0.03  # Default 3% volatility
         
@@ -174,68 +218,58 @@ class LeveragedETFSwingStrategy(BaseStrategy):
         
         return max(0, final_allocation)
 
-    async def run(self, websocket, get_benchmark_value, send_daily):
-        await websocket.send_text('{"type":"status","payload":"Starting Leveraged ETF Swing Simulation..."}')
-        current = datetime.strptime(self.params.start_date, "%Y-%m-%d")
-        end = datetime.strptime(self.params.end_date, "%Y-%m-%d")
-
-        daily_values, daily_benchmarks = [], []
-
-        while current <= end:
-            try:
-                date_str = current.strftime("%Y-%m-%d")
-
-                # Check exits first
-                for ticker in self.etfs:
-                    if ticker in self.portfolio.holdings and self.portfolio.holdings[ticker] > 0:
-                        if self.should_exit(ticker, current):
-                            trade = self.portfolio.close_long_position(ticker, date_str)
-                            if trade:
-                                entry_price = self.entry_prices.get(ticker, 0)
-                                current_price = self.price_data[ticker].loc[current]["adj_close"]
-                                pnl = ((current_price - entry_price) / entry_price) * 100 if entry_price > 0 else 0
-                                print(f"📉 [{date_str}] Exited {ticker} (PnL: {pnl:.1f}%)")
-                                self.last_entry_dates.pop(ticker, None)
-                                self.entry_prices.pop(ticker, None)
-
-                # Check entries
-                available_cash = self.portfolio.cash
-                if available_cash > 0:
-                    for ticker in self.etfs:
-                        if ticker not in self.portfolio.holdings and self.should_enter(ticker, current):
-                            allocation = self.calculate_position_size(ticker, available_cash)
-                            if allocation > 0:
-                                trade = self.portfolio.open_long_position(ticker, allocation, date_str)
-                                if trade:
-                                    self.last_entry_dates[ticker] = current
-                                    self.entry_prices[ticker] = self.price_data[ticker].loc[current]["adj_close"]
-                                    print(f"📈 [{date_str}] Entered {ticker} with ${allocation:.2f}")
-
-                value = self.portfolio.value_on(date_str)
-                benchmark = await get_benchmark_value(current)
-                await send_daily(current, value, benchmark)
-
-                daily_values.append({"date": date_str, "portfolio_value": value})
-                daily_benchmarks.append({"date": date_str, "benchmark_value": benchmark})
-                current += timedelta(days=1)
-
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                await websocket.send_text(f'{{"type":"error","payload":"Error on {date_str}: {str(e)}"}}')
-                break
-
-        # Close all positions at the end
-        final_trades = []
-        for ticker in list(self.portfolio.holdings.keys()):
-            trade = self.portfolio.close_long_position(ticker, end.strftime("%Y-%m-%d"))
-            if trade:
-                final_trades.append(trade.to_dict())
+    def on_bar(self, date, date_str):
+        # Check exits first
+        for ticker in self.etfs:
+            if ticker in self.portfolio.holdings and self.portfolio.holdings[ticker] > 0:
+                if self.should_exit(ticker, date):
+                    trade = self.portfolio.close_long_position(ticker, date_str)
+                    if trade:
+                        entry_price = self.entry_prices.get(ticker, 0)
+                        current_price = self.price_data[ticker].loc[date]["adj_close"]
+                        pnl = ((current_price - entry_price) / entry_price) * 100 if entry_price > 0 else 0
+                        print(f"📉 [{date_str}] Exited {ticker} (PnL: {pnl:.1f}%)")
+                        self.last_entry_dates.pop(ticker, None)
+                        self.entry_prices.pop(ticker, None)
 
-        return {
-            "final_orders": final_trades,
-            "final_value": self.portfolio.cash,
-            "daily_values": daily_values,
-            "daily_benchmark_values": daily_benchmarks,
-            "all_trades": self.portfolio.get_all_trades()
-        }
+        # Check entries
+        available_cash = self.portfolio.cash
+        if available_cash > 0:
+            for ticker in self.etfs:
+                if ticker not in self.portfolio.holdings and self.should_enter(ticker, date):
+                    allocation = self.calculate_position_size(ticker, available_cash)
+                    if allocation > 0:
+                        trade = self.portfolio.open_long_position(ticker, allocation, date_str)
+                        if trade:
+                            self.last_entry_dates[ticker] = date
+                            self.entry_prices[ticker] = self.price_data[ticker].loc[date]["adj_close"]
+                            print(f"📈 [{date_str}] Entered {ticker} with ${allocation:.2f}")
+
+    def on_intraday_bar(self, timestamp, ts_str, ticker, close):
+        if ticker not in self.etfs:
+            return
+        state = self.intraday_state.setdefault(ticker, _IntradayState())
+        state.update(close)
+        rsi, macd, signal = state.technicals()
+
+        if self.portfolio.holdings.get(ticker, 0) > 0:
+            entry_price = self.entry_prices.get(ticker)
+            held = timestamp - self.last_entry_dates[ticker]
+            if entry_price and self._exit_signal(close, state.peak, entry_price, held, rsi, macd, signal):
+                if self.portfolio.close_long_position(ticker, ts_str):
+                    print(f"📉 [{ts_str}] Exited {ticker} (PnL: {(close - entry_price) / entry_price * 100:.1f}%)")
+                    self.last_entry_dates.pop(ticker, None)
+                    self.entry_prices.pop(ticker, None)
+                    state.peak = None
+            return
+
+        volatility = state.volatility()
+        if state.bars < 30 or volatility is None or rsi is None or macd is None or self.portfolio.cash <= 0:
+            return
+        if self._entry_signal(volatility, rsi, macd, signal, close, state.closes.mean(), state.closes.last(4)):
+            allocation = self._allocation(volatility, self.portfolio.cash)
+            if allocation > 0 and self.portfolio.open_long_position(ticker, allocation, ts_str):
+                self.last_entry_dates[ticker] = timestamp
+                self.entry_prices[ticker] = close
+                state.peak = close
+                print(f"📈 [{ts_str}] Entered {ticker} with ${allocation:.2f}")
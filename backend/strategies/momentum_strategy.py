@@ -1,37 +1,15 @@
 import pandas as pd
-from math import isfinite
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from .base_strategy import BaseStrategy
-from services.portfolio import Portfolio
-from utils.data_fetcher import DataFetcher
-from utils.price_utils import PriceUtils
+from .base_strategy import BaseStrategy, PathScoringStrategy, every_n_months
+from .registry import register_strategy
 import numpy as np
 
-class MomentumStrategy(BaseStrategy):
-    def __init__(self, params):
-        self.params = params
-        self.price_data = {}
-        self.portfolio = None
-        self.current_tickers = set()
-        self.loaded_dates = set()
-        self.data_fetcher = DataFetcher()
+@register_strategy("momentum")
+class MomentumStrategy(BaseStrategy, PathScoringStrategy):
+    dynamic_universe = True
+    supports_universe_sampling = True
 
-    async def initialize(self):
-        start_date = self.params.start_date
-        self.current_tickers = set(self.data_fetcher.get_sp500_tickers_as_of(start_date))
-        self.price_data = self.data_fetcher.preload_price_data(
-            start_date, self.params.end_date,
-            self.params.lookback_months, self.params.skip_recent_months,
-            self.params.benchmark, self.current_tickers
-        )
-        self.portfolio = Portfolio(self.params.starting_value, self.price_data)
-
-    def should_rebalance(self, date, last_date):
-        if not last_date:
-            return True
-        # Rebalance on a fixed monthly schedule
-        return date >= last_date + relativedelta(months=1)
+    # Rebalance on a fixed monthly schedule
+    rebalance_due = every_n_months(1)
 
     def calculate_momentum_score(self, prices: pd.Series):
         """Calculate momentum using multiple factors for better stock selection"""
@@ -70,6 +48,19 @@ class MomentumStrategy(BaseStrategy):
         
         return momentum_score if np.isfinite(momentum_score) else None
 
+    def path_scores(self, window):
+        """calculate_momentum_score for every path and ticker at once; window is (paths, days, tickers)."""
+        length = window.shape[1]
+        if length < 20:
+            return np.full((window.shape[0], window.shape[2]), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_momentum = window[:, -1] / window[:, 0] - 1
+            volatility = (window[:, 1:] / window[:, :-1] - 1).std(axis=1, ddof=1)
+            recent = int(length * 0.2)
+            recent_momentum = window[:, -1] / window[:, -recent] - 1 if recent >= 2 else 0
+            scores = 0.5 * price_momentum + 0.3 * volatility + 0.2 * recent_momentum
+        return np.where((volatility > 0) & np.isfinite(scores), scores, np.nan)
+
     def get_top_momentum_stocks(self, date):
         end = date - pd.DateOffset(months=self.params.skip_recent_months)
         start = end - pd.DateOffset(months=self.params.lookback_months)
@@ -93,19 +84,10 @@ class MomentumStrategy(BaseStrategy):
 
         return sorted(scores, key=lambda x: x[1], reverse=True)[:self.params.top_n]
 
-    def rebalance(self, date_str):
-        if date_str != self.params.start_date:
-            self.current_tickers, self.loaded_dates, self.price_data = PriceUtils.update_universe(
-                self.current_tickers,
-                self.loaded_dates,
-                self.price_data,
-                self.portfolio,
-                date_str,
-                self.params.end_date,
-                self.params.lookback_months,
-                self.params.skip_recent_months
-            )
+    def on_rebalance(self, date, date_str):
+        self.rebalance(date_str)
 
+    def rebalance(self, date_str):
         print(f"\n📆 \033[1mRebalancing on {date_str}\033[0m")
         top_n = self.get_top_momentum_stocks(pd.to_datetime(date_str))
         top_set = {t for t, _ in top_n}
@@ -154,47 +136,3 @@ class MomentumStrategy(BaseStrategy):
                         print(f"   📈 Allocated ${allocation:.2f} to {ticker} (volatility-based sizing)")
 
         return orders
-
-    async def run(self, websocket, get_benchmark_value, send_daily):
-        await websocket.send_text('{"type":"status","payload":"Starting Simulation..."}')
-        current = datetime.strptime(self.params.start_date, "%Y-%m-%d")
-        end = datetime.strptime(self.params.end_date, "%Y-%m-%d")
-        last_rebalance = None
-        daily_values, daily_benchmarks = [], []
-
-        while current <= end:
-            try:
-                date_str = current.strftime("%Y-%m-%d")
-                if self.should_rebalance(current, last_rebalance):
-                    await websocket.send_text(f'{{"type":"status","payload":"Rebalancing on {date_str}"}}')
-                    self.rebalance(date_str)
-                    last_rebalance = current
-
-                value = self.portfolio.value_on(date_str)
-                benchmark = await get_benchmark_value(current)
-                await send_daily(current, value, benchmark)
-
-                daily_values.append({"date": date_str, "portfolio_value": value})
-                daily_benchmarks.append({"date": date_str, "benchmark_value": benchmark})
-                current += timedelta(days=1)
-
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                await websocket.send_text(f'{{"type":"error","payload":"Error on {date_str}: {str(e)}"}}')
-                break
-
-        # Close all remaining positions at the end
-        final_trades = []
-        for ticker in list(self.portfolio.holdings.keys()):
-            trade = self.portfolio.close_long_position(ticker, end.strftime("%Y-%m-%d"))
-            if trade:
-                final_trades.append(trade.to_dict())
-        
-        return {
-            "final_orders": final_trades,
-            "final_value": self.portfolio.cash,
-            "daily_values": daily_values,
-            "daily_benchmark_values": daily_benchmarks,
-            "all_trades": self.portfolio.get_all_trades()
-        }
@@ -0,0 +1,20 @@
+STRATEGY_REGISTRY = {}
+
+
+def register_strategy(name):
+    """Class decorator making a BaseStrategy subclass selectable as `strategy=<name>`."""
+    def decorator(cls):
+        if name in STRATEGY_REGISTRY and STRATEGY_REGISTRY[name] is not cls:
+            raise ValueError(f"Strategy '{name}' is already registered")
+        cls.name = name
+        STRATEGY_REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+def get_strategy(name):
+    return STRATEGY_REGISTRY.get(name)
+
+
+def available_strategies():
+    return sorted(STRATEGY_REGISTRY)
@@ -9,6 +9,7 @@ from .orders import OrderService
 from .universe import UniverseService
 from .positions import PositionService
 from .snapshots import SnapshotService
+from .symbols import SymbolMaster
 
 # Global instances
 _client = None
@@ -22,6 +23,7 @@ _portfolios = None
 _orders = None
 _positions = None
 _universe = None
+_symbols = None
 
 def get_client() -> SupabaseClient:
     """Get the global Supabase client instance"""
@@ -97,6 +99,13 @@ def get_universe() -> UniverseService:
         _universe = UniverseService(get_client())
     return _universe
 
+def get_symbols() -> SymbolMaster:
+    """Get the global symbol master instance"""
+    global _symbols
+    if _symbols is None:
+        _symbols = SymbolMaster(get_client())
+    return _symbols
+
 __all__ = [
     'SupabaseClient',
     'AccountService',
@@ -109,6 +118,7 @@ __all__ = [
     'OrderService',
     'PositionService',
     'UniverseService',
+    'SymbolMaster',
     'get_client',
     'get_accounts',
     'get_transactions',
@@ -116,5 +126,5 @@ __all__ = [
     'get_institutions',
     'get_sync',
     'get_snapshots'
-    , 'get_portfolios', 'get_orders', 'get_positions', 'get_universe'
+    , 'get_portfolios', 'get_orders', 'get_positions', 'get_universe', 'get_symbols'
 ] 
\ No newline at end of file
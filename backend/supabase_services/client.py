@@ -1,6 +1,8 @@
 import os
 from supabase import create_client, Client
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+PAGE_SIZE = 1000  # PostgREST caps a select at 1000 rows by default
 
 
 class _InMemoryTableQuery:
@@ -56,6 +58,23 @@ class _InMemoryClient:
 	def table(self, name: str):
 		return _InMemoryTableQuery(self, name)
 
+def select_all(query: Callable[[], Any], page_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Every row of a select, fetched in .range() pages so none are cut off at the row cap.
+
+    `query` returns a fresh, filtered and ordered query builder (not executed), e.g.
+    lambda: client.table('positions').select('id, ticker').order('id'); order by a
+    unique column so pages neither overlap nor skip rows.
+    """
+    page_size = page_size or PAGE_SIZE
+    rows, start = [], 0
+    while True:
+        page = query().range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
 class SupabaseClient:
     """Base Supabase client for database operations"""
     
@@ -0,0 +1,200 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock, RLock, Thread
+from typing import Any, Dict, Iterable, Optional
+from .client import SupabaseClient, select_all
+
+SYMBOL_MASTER_REFRESH_SEC = int(os.getenv("SYMBOL_MASTER_REFRESH_SEC", "60"))
+SYMBOL_MASTER_RECONCILE_SEC = int(os.getenv("SYMBOL_MASTER_RECONCILE_SEC", "3600"))
+COMPANY_COLUMNS = 'id, ticker, name, logo_url, domain, sector, sector_id'
+SECTOR_COLUMNS = 'id, name, color'
+
+
+class SymbolMaster:
+    """Process-wide ticker -> company/sector index over the companies and sectors tables.
+
+    Loads id, ticker, name, logo, domain and sector for every company (and every sector's
+    name and color) on first use, then answers lookups from memory. Once the index is
+    older than SYMBOL_MASTER_REFRESH_SEC a background thread pulls only companies whose
+    updated_at moved since the last pass (add_companies_updated_at.sql; a full reload if
+    the column is missing) and reloads the small sectors table; lookups keep serving the
+    current index meanwhile. Deletes leave no updated_at behind, so every
+    SYMBOL_MASTER_RECONCILE_SEC the refresh is a full reload instead, which evicts them. Lookups that
+    miss read through to the database in one query and are kept,
+    and rows this process writes are added with note_company / note_sector, so new
+    symbols never wait for a refresh. Prices are not held here; they change too often and
+    live in the quote cache.
+    """
+
+    def __init__(self, client: SupabaseClient):
+        self.client = client
+        self._lock = RLock()
+        self._by_id: Dict[Any, Dict[str, Any]] = {}
+        self._by_ticker: Dict[str, Dict[str, Any]] = {}
+        self._sectors: Dict[Any, Dict[str, Any]] = {}
+        self._sectors_by_name: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._synced_at: Optional[datetime] = None  # database clock lower bound for incremental pulls
+        self._reconciled_at: Optional[float] = None  # last full load
+        self._load_lock = Lock()  # one first load; later refreshes run on a background thread
+        self._refreshing = False
+
+    # --- Loading ---
+    def _table(self, name: str):
+        return self.client.client.table(name)
+
+    def _select_all(self, table: str, columns: str):
+        return select_all(lambda: self._table(table).select(columns).order('id'))
+
+    def _full_load(self):
+        started = datetime.now(timezone.utc)
+        companies = self._select_all('companies', COMPANY_COLUMNS)
+        sectors = self._select_all('sectors', SECTOR_COLUMNS)
+        with self._lock:
+            self._by_id.clear()
+            self._by_ticker.clear()
+            for row in companies:
+                self.note_company(row)
+            self._set_sectors(sectors)
+            self._synced_at = started
+            self._loaded_at = self._reconciled_at = time.time()
+
+    def _incremental(self):
+        started = datetime.now(timezone.utc)
+        since = (self._synced_at - timedelta(seconds=5)).isoformat()  # margin for clock skew
+        try:
+            changed = self._table('companies').select(COMPANY_COLUMNS).gte('updated_at', since).execute().data or []
+        except Exception as e:
+            print(f"[WARN] companies.updated_at query failed ({e}); run add_companies_updated_at.sql. Reloading all companies.")
+            self._full_load()
+            return
+        sectors = self._select_all('sectors', SECTOR_COLUMNS)
+        with self._lock:
+            for row in changed:
+                self.note_company(row)
+            self._set_sectors(sectors)
+            self._synced_at = started
+            self._loaded_at = time.time()
+
+    def _refresh(self):
+        try:
+            if self._synced_at and time.time() - self._reconciled_at <= SYMBOL_MASTER_RECONCILE_SEC:
+                self._incremental()
+            else:
+                self._full_load()
+        except Exception as e:
+            # Serve what we have until the next interval; lookups still read through on a miss
+            print(f"[WARN] Symbol master refresh failed: {e}")
+            self._loaded_at = time.time()
+        finally:
+            self._refreshing = False
+
+    def _ensure_fresh(self):
+        """Load on first use; afterwards start a background refresh when stale and return at once."""
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self._refreshing = True
+                    self._refresh()
+            return
+        with self._lock:
+            if self._refreshing or time.time() - self._loaded_at <= SYMBOL_MASTER_REFRESH_SEC:
+                return
+            self._refreshing = True
+        Thread(target=self._refresh, name='symbol-master-refresh', daemon=True).start()
+
+    def _set_sectors(self, rows):
+        self._sectors = {r.get('id'): r for r in rows if r.get('id') is not None}
+        self._sectors_by_name = {str(r.get('name') or '').strip().lower(): r for r in rows if r.get('name')}
+
+    # --- Writes observed by this process ---
+    def note_company(self, row: Dict[str, Any]):
+        """Add or replace a company row; call after inserting or updating one."""
+        with self._lock:
+            company_id = row.get('id')
+            previous = self._by_id.get(company_id) if company_id is not None else None
+            if previous and previous.get('ticker') and (previous.get('ticker') or '').upper() != (row.get('ticker') or '').upper():
+                self._by_ticker.pop(previous['ticker'].upper(), None)
+            if company_id is not None:
+                self._by_id[company_id] = row
+            if row.get('ticker'):
+                self._by_ticker[row['ticker'].upper()] = row
+
+    def note_sector(self, row: Dict[str, Any]):
+        with self._lock:
+            if row.get('id') is not None:
+                self._sectors[row['id']] = row
+            if row.get('name'):
+                self._sectors_by_name[str(row['name']).strip().lower()] = row
+
+    # --- Lookups ---
+    def companies_by_ticker(self, tickers: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """{ TICKER: company } for the tickers that exist; one query for any the index does not know yet."""
+        wanted = {(t or '').strip().upper() for t in tickers if t}
+        self._ensure_fresh()
+        with self._lock:
+            found = {t: self._by_ticker[t] for t in wanted if t in self._by_ticker}
+        missing = list(wanted - set(found))
+        if missing:
+            try:
+                for row in self._table('companies').select(COMPANY_COLUMNS).in_('ticker', missing).execute().data or []:
+                    self.note_company(row)
+                    found[(row.get('ticker') or '').upper()] = row
+            except Exception:
+                pass
+        return found
+
+    def companies_by_id(self, ids: Iterable[Any]) -> Dict[Any, Dict[str, Any]]:
+        """{ id: company } for the ids that exist; one query for any the index does not know yet."""
+        wanted = {i for i in ids if i}
+        self._ensure_fresh()
+        with self._lock:
+            found = {i: self._by_id[i] for i in wanted if i in self._by_id}
+        missing = list(wanted - set(found))
+        if missing:
+            try:
+                for row in self._table('companies').select(COMPANY_COLUMNS).in_('id', missing).execute().data or []:
+                    self.note_company(row)
+                    found[row.get('id')] = row
+            except Exception:
+                pass
+        return found
+
+    def company_for_ticker(self, ticker: str) -> Optional[Dict[str, Any]]:
+        return self.companies_by_ticker([ticker]).get((ticker or '').strip().upper())
+
+    def sector(self, sector_id: Any) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        with self._lock:
+            return self._sectors.get(sector_id)
+
+    def sector_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Sector row by case-insensitive name, reading through to the database on a miss."""
+        key = str(name or '').strip().lower()
+        self._ensure_fresh()
+        with self._lock:
+            row = self._sectors_by_name.get(key)
+        if row is None and key:
+            try:
+                rows = self._table('sectors').select(SECTOR_COLUMNS).eq('name', str(name).strip()).limit(1).execute().data or []
+                if rows:
+                    row = rows[0]
+                    self.note_sector(row)
+            except Exception:
+                pass
+        return row
+
+    def sector_colors(self) -> set:
+        self._ensure_fresh()
+        with self._lock:
+            return {str(r.get('color') or '').strip().lower() for r in self._sectors.values() if r.get('color')}
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "companies": len(self._by_id),
+                "tickers": len(self._by_ticker),
+                "sectors": len(self._sectors),
+                "loaded_at": datetime.fromtimestamp(self._loaded_at, timezone.utc).isoformat() if self._loaded_at else None,
+            }
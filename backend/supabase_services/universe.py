@@ -1,12 +1,23 @@
+import os
+import time
+from threading import Lock
 from typing import Any, Dict, List, Optional
 from .client import SupabaseClient
 
+# Precomputed by create_universe_ranked.sql; refreshed after each enrichment run
+UNIVERSE_VIEW = 'universe_ranked'
+CAP_BUCKETS = ('micro', 'small', 'mid', 'large')
+UNIVERSE_CACHE_TTL_SEC = int(os.getenv("UNIVERSE_CACHE_TTL_SEC", "60"))
+UNIVERSE_CACHE_MAX_ENTRIES = 256
+
 
 class UniverseService:
 	"""Service to manage daily universe candidates for LLM selection."""
 
 	def __init__(self, client: SupabaseClient):
 		self.client = client
+		self._cache: Dict[tuple, tuple] = {}  # { (cap, limit, min_dollar_volume): (expires_at, rows) }
+		self._lock = Lock()
 
 	def upsert_batch(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 		try:
@@ -15,25 +26,50 @@ class UniverseService:
 		except Exception as e:
 			return {"success": False, "error": str(e)}
 
-	def get_top(self, date: Optional[str] = None, cap: str = 'micro', limit: int = 50) -> Dict[str, Any]:
+	def get_top(self, date: Optional[str] = None, cap: str = 'micro', limit: int = 50, min_median_dollar_volume: int = 0) -> Dict[str, Any]:
+		"""Most liquid tradable candidates, filtered, ordered by avg_volume_30d and limited in the database.
+
+		Reads the indexed universe_ranked view (listed, non-OTC, non-ETF, non-warrant companies
+		priced at $1+, bucketed by market cap), so the cost follows `limit`, not the size of
+		companies. `cap` is one of CAP_BUCKETS, anything else means every bucket. Results are
+		cached in-process for UNIVERSE_CACHE_TTL_SEC.
+		"""
+		key = (cap, limit, min_median_dollar_volume)
+		with self._lock:
+			entry = self._cache.get(key)
+			if entry is not None and entry[0] > time.time():
+				return {"success": True, "data": entry[1]}
 		try:
-			filters: Dict[str, Any] = {}
-			# server-side filter by market cap bucket if your table stores a bucket; fallback handled client-side in API
-			res = self.client.select('universe_candidates', columns='ticker, price, market_cap, avg_volume, exchange', filters=filters, order_by=None, limit=None)
-			if not res.get('success'):
-				return {"success": False, "error": res.get('error')}
-			rows = res.get('data') or []
-			# client-side filter by cap
-			def is_micro(r: Dict[str, Any]) -> bool:
-				try:
-					return float(r.get('market_cap') or 0) < 300_000_000
-				except Exception:
-					return False
-			candidates = [r for r in rows if is_micro(r)] if cap == 'micro' else rows
-			# rank by liquidity
-			candidates.sort(key=lambda r: int(r.get('avg_volume') or 0), reverse=True)
-			return {"success": True, "data": candidates[:limit]}
+			q = self.client.client.table(UNIVERSE_VIEW).select('ticker, latest_price, market_cap, avg_volume_30d, exchange')
+			if cap in CAP_BUCKETS:
+				q = q.eq('cap_bucket', cap)
+			if min_median_dollar_volume:
+				q = q.gte('median_dollar_volume_30d', min_median_dollar_volume)
+			res = q.order('avg_volume_30d', desc=True).limit(limit).execute()
+			rows = [
+				{
+					'ticker': r.get('ticker'),
+					'price': float(r.get('latest_price') or 0),
+					'market_cap': float(r.get('market_cap') or 0),
+					'avg_volume': int(r.get('avg_volume_30d') or 0),
+					'exchange': r.get('exchange'),
+				}
+				for r in (res.data or [])
+			]
 		except Exception as e:
 			return {"success": False, "error": str(e)}
+		with self._lock:
+			if len(self._cache) >= UNIVERSE_CACHE_MAX_ENTRIES:
+				self._cache.clear()
+			self._cache[key] = (time.time() + UNIVERSE_CACHE_TTL_SEC, rows)
+		return {"success": True, "data": rows}
 
-
+	def refresh(self) -> Dict[str, Any]:
+		"""Recompute the universe_ranked view from companies and drop cached results."""
+		try:
+			self.client.client.rpc('refresh_universe_ranked').execute()
+		except Exception as e:
+			return {"success": False, "error": str(e)}
+		with self._lock:
+			self._cache.clear()
+		return {"success": True}
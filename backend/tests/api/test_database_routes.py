@@ -179,3 +179,70 @@ def test_errors_insufficient_cash_and_oversell(app):
     assert r3.status_code == 400
 
 
+
+
+def test_symbol_master_serves_company_and_sector_lookups_from_memory(app, monkeypatch):
+    client = TestClient(app)
+    from backend.supabase_services import get_client
+    fake = get_client().client
+    fake.insert('sectors', { 'id': 'sec-1', 'name': 'Automobiles', 'color': '#6b8afd' })
+    fake.insert('companies', { 'id': 'co-TSLA', 'name': 'Tesla Inc.', 'ticker': 'TSLA', 'logo_url': 'https://logo.clearbit.com/tesla.com', 'sector_id': 'sec-1' })
+    fake.insert('positions', { 'portfolio_id': 'pf-1', 'company_id': 'co-TSLA', 'quantity': 2, 'avg_entry_price': 100 })
+    fake.insert('orders', { 'portfolio_id': 'pf-1', 'company_id': 'co-TSLA', 'side': 'buy', 'quantity': 2 })
+    client.get('/database/portfolios/pf-1/positions')  # first use loads the symbol master
+
+    tables = []
+    table = fake.table
+    monkeypatch.setattr(fake, 'table', lambda name: tables.append(name) or table(name))
+
+    pos = client.get('/database/portfolios/pf-1/positions').json()['positions']
+    assert (pos[0]['ticker'], pos[0]['company_name'], pos[0]['sector'], pos[0]['sector_color']) == ('TSLA', 'Tesla Inc.', 'Automobiles', '#6b8afd')
+    orders = client.get('/database/portfolios/pf-1/orders').json()['orders']
+    assert (orders[0]['ticker'], orders[0]['company_name']) == ('TSLA', 'Tesla Inc.')
+    resp = client.post('/database/portfolios/order', json={
+        'portfolio_id': 'pf-1', 'ticker': 'TSLA', 'side': 'buy', 'order_type': 'limit', 'quantity': 1, 'limit_price': 110
+    })
+    assert resp.status_code == 200
+    assert tables == ['companies']  # only the execution-price update
+    assert [p['quantity'] for p in fake.db['positions']] == [3]
+
+    # A company added elsewhere after the load is found with one read-through query
+    fake.insert('companies', { 'id': 'co-RIVN', 'name': 'Rivian', 'ticker': 'RIVN', 'sector_id': 'sec-1' })
+    fake.insert('positions', { 'portfolio_id': 'pf-1', 'ticker': 'RIVN', 'quantity': 1, 'avg_entry_price': 10 })
+    pos = client.get('/database/portfolios/pf-1/positions').json()['positions']
+    assert {p['ticker']: p.get('company_name') for p in pos} == { 'TSLA': 'Tesla Inc.', 'RIVN': 'Rivian' }
+    assert tables == ['companies', 'companies']
+
+
+def test_symbol_master_refreshes_in_the_background_and_reconciles_deletes(monkeypatch):
+    from backend.supabase_services import get_client, symbols
+    fake = get_client().client
+    fake.insert('companies', { 'id': 'co-A', 'ticker': 'AAA', 'name': 'Old A', 'updated_at': '2026-01-01T00:00:00+00:00' })
+    fake.insert('companies', { 'id': 'co-B', 'ticker': 'BBB', 'name': 'B', 'updated_at': '2026-01-01T00:00:00+00:00' })
+    master = symbols.SymbolMaster(get_client())
+    assert set(master.companies_by_ticker(['AAA', 'BBB'])) == {'AAA', 'BBB'}
+
+    started = []
+    monkeypatch.setattr(symbols, 'Thread', lambda target, **kw: started.append(target) or type('T', (), {'start': lambda self: None})())
+    monkeypatch.setattr(symbols, 'SYMBOL_MASTER_REFRESH_SEC', 0)
+    fake.db['companies'] = [r for r in fake.db['companies'] if r['id'] != 'co-B']
+    fake.db['companies'][0].update(name='New A', updated_at='2999-01-01T00:00:00+00:00')
+
+    # A stale index is served as-is while one refresh is queued
+    tables = []
+    table = fake.table
+    monkeypatch.setattr(fake, 'table', lambda name: tables.append(name) or table(name))
+    assert master.company_for_ticker('AAA')['name'] == 'Old A'
+    master.company_for_ticker('AAA')
+    assert len(started) == 1 and tables == []
+
+    # The incremental pass reads only changed companies, so the delete is not seen yet
+    started[0]()
+    assert tables == ['companies', 'sectors']
+    assert master.company_for_ticker('AAA')['name'] == 'New A' and master.info()['companies'] == 2
+
+    # The periodic full reload evicts it
+    monkeypatch.setattr(symbols, 'SYMBOL_MASTER_RECONCILE_SEC', 0)
+    master.company_for_ticker('AAA')
+    started[1]()
+    assert master.info()['companies'] == 1 and master.companies_by_id(['co-B']) == {}
@@ -0,0 +1,147 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure project root is importable
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "../.."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import backend.api.market_routes as market_routes
+import services.price_history as price_history
+from services.price_cache import PriceCache
+from utils.data_fetcher import DataFetcher
+from utils.downsample import lttb_indices
+
+
+class MemoryPriceCache(PriceCache):
+    """PriceCache over an in-memory dict of ticker-month chunks."""
+
+    def __init__(self):
+        self.chunks = {}
+
+    def _read_chunk(self, ticker, year, month):
+        return self.chunks.get((ticker, year, month))
+
+    def _write_chunk(self, ticker, year, month, chunk):
+        self.chunks[(ticker, year, month)] = chunk
+
+    def _chunk_age(self, ticker, year, month):
+        return 0 if (ticker, year, month) in self.chunks else None
+
+
+@pytest.fixture()
+def downloads(monkeypatch):
+    """An empty in-memory price store whose Yahoo downloads return a deterministic walk; yields the calls."""
+    monkeypatch.setattr(price_history, '_cache', price_history.HistoryCache(store=MemoryPriceCache()))
+    calls = []
+
+    def fetch(self, ticker, start_str, end_str):
+        calls.append((ticker, start_str, end_str))
+        dates = pd.bdate_range(start_str, pd.Timestamp(end_str) - pd.Timedelta(days=1))
+        walk = 100 + np.cumsum(np.random.default_rng(len(ticker)).normal(0, 1, len(dates)))
+        return pd.DataFrame({'date': dates, 'adj_close': walk})
+
+    monkeypatch.setattr(DataFetcher, '_fetch_ticker', fetch)
+    return calls
+
+
+@pytest.fixture()
+def client():
+    app = FastAPI()
+    app.include_router(market_routes.router)
+    return TestClient(app)
+
+
+class TestLttb:
+    """Largest-Triangle-Three-Buckets keeps a chart's shape at a fraction of the points."""
+
+    def test_keeps_endpoints_and_extremes(self):
+        x = np.arange(5000)
+        y = np.sin(x / 300.0)
+        y[2500] = 5.0
+        idx = lttb_indices(x, y, 300)
+        assert len(idx) == 300 and idx[0] == 0 and idx[-1] == 4999
+        assert np.all(np.diff(idx) > 0)
+        assert 2500 in idx
+        assert y[idx].min() == pytest.approx(-1.0, abs=1e-3)
+
+    def test_short_series_are_returned_whole(self):
+        assert list(lttb_indices([1, 2, 3], [1, 5, 2], 10)) == [0, 1, 2]
+
+
+class TestHistoryRoutes:
+    """/market/history serves the local store, downsampled, with ETags and a response cache."""
+
+    def test_twenty_years_cost_a_few_hundred_points(self, client, downloads):
+        resp = client.get('/market/history/aapl', params={'range': '20y', 'points': 300})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body['ticker'] == 'AAPL' and body['points'] == 300 and body['source_points'] > 5000
+        assert body['series'][0]['date'] >= body['start'] and body['series'][-1]['date'] <= body['end']
+        assert len(downloads) == 1  # every missing month in one request
+
+        etag = resp.headers['ETag']
+        assert client.get('/market/history/AAPL', params={'range': '20y', 'points': 300}, headers={'If-None-Match': etag}).status_code == 304
+
+        # A shorter range is read from the store without touching Yahoo
+        price_history.get_history_cache().clear()
+        assert client.get('/market/history/AAPL', params={'range': '1y', 'points': 1000}).json()['points'] < 300
+        assert len(downloads) == 1
+
+    def test_batch_and_validation(self, client, downloads):
+        resp = client.get('/market/history', params={'tickers': 'AAPL,MSFT,AAPL', 'range': '2020-01-01:2020-12-31', 'points': 50})
+        history = resp.json()['history']
+        assert list(history) == ['AAPL', 'MSFT']
+        assert [h['points'] for h in history.values()] == [50, 50]
+        assert client.get('/market/history', params={'tickers': 'AAPL,MSFT', 'range': '2020-01-01:2020-12-31', 'points': 50}, headers={'If-None-Match': resp.headers['ETag']}).status_code == 304
+
+        assert client.get('/market/history/AAPL', params={'range': '7w'}).status_code == 400
+        assert client.get('/market/history/AAPL', params={'range': '2021-01-01:2020-01-01'}).status_code == 400
+
+    def test_malformed_tickers_never_reach_the_store(self, client, downloads, tmp_path, monkeypatch):
+        root = tmp_path / 'cache'
+        monkeypatch.setattr(price_history, '_cache', price_history.HistoryCache(store=PriceCache(str(root))))
+        for path in ('/market/history/%2E%2E', '/market/history/a%5Cb', '/market/history/' + 'X' * 16):
+            assert client.get(path).status_code == 400
+        resp = client.get('/market/history', params={'tickers': 'AAPL,../../X'})
+        assert resp.status_code == 400 and '../../X' in resp.json()['detail']
+        assert client.get('/market/history', params={'tickers': ' , '}).status_code == 400
+        assert downloads == [] and list(tmp_path.iterdir()) == [root] and list(root.iterdir()) == []
+        with pytest.raises(ValueError):
+            PriceCache(str(root)).save_month('..', 2020, 1, pd.DataFrame(columns=['date', 'adj_close']))
+
+    def test_only_gaps_before_returned_data_are_stored_empty(self, client, downloads, monkeypatch):
+        store = price_history.get_history_cache().store
+        monkeypatch.setattr(DataFetcher, '_fetch_ticker', lambda self, t, s, e: 'no_data')
+        assert client.get('/market/history/NEWCO', params={'range': '2020-01-01:2020-06-30'}).json()['points'] == 0
+        assert store.chunks == {}  # a throttled or failed download is retried next time
+
+        def listed_in_march(self, ticker, start_str, end_str):
+            dates = pd.bdate_range('2020-03-02', '2020-04-15')
+            return pd.DataFrame({'date': dates, 'adj_close': np.linspace(10, 20, len(dates))})
+
+        monkeypatch.setattr(DataFetcher, '_fetch_ticker', listed_in_march)
+        assert client.get('/market/history/NEWCO', params={'range': '2020-01-02:2020-06-30'}).json()['source_points'] > 0
+        assert sorted(m for _, _, m in store.chunks) == [1, 2, 3, 4]
+        assert store.chunks[('NEWCO', 2020, 1)].empty and not store.chunks[('NEWCO', 2020, 4)].empty
+
+    def test_price_cache_round_trips_parquet_files(self, client, downloads, tmp_path, monkeypatch):
+        monkeypatch.setattr(price_history, '_cache', price_history.HistoryCache(store=PriceCache(str(tmp_path))))
+        params = {'range': '2019-01-01:2020-12-31', 'points': 2000}
+        first = client.get('/market/history/MSFT', params=params).json()
+        assert len(list((tmp_path / 'MSFT').glob('*.parquet'))) == 24
+
+        def offline(self, ticker, start_str, end_str):
+            raise AssertionError('months on disk must not be downloaded again')
+
+        monkeypatch.setattr(DataFetcher, '_fetch_ticker', offline)
+        monkeypatch.setattr(price_history, '_cache', price_history.HistoryCache(store=PriceCache(str(tmp_path))))
+        assert client.get('/market/history/MSFT', params=params).json()['series'] == first['series']
+        assert len(downloads) == 1
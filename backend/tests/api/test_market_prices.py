@@ -0,0 +1,603 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure project root is importable
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "../.."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import backend.api.market_routes as market_routes
+import services.quotes as quotes_service
+from services.price_refresher import HotTickerRefresher, get_price_refresher, market_is_open
+import services.quote_stream as quote_stream
+from services.quote_stream import QuoteSubscriber, get_quote_hub
+from services.quotes import SingleFlight, refresh_quotes
+import services.snapshot_pipeline as snapshot_pipeline
+from services.snapshot_pipeline import portfolio_values
+from supabase_services import get_universe
+import utils.market_calendar as market_calendar
+from utils.market_calendar import (
+    CLOSED, POST, PRE, REGULAR, is_price_fresh, market_session, next_session_start, nyse_early_closes, nyse_holidays,
+    price_valid_until,
+)
+from utils.quote_cache import QuoteCache, get_quote_cache
+
+_real_market_session = market_session
+
+
+def _pin_session(monkeypatch, session):
+    """Make every freshness decision see `session` (a fixed value, or the real calendar), whatever the wall clock says."""
+    pinned = session if callable(session) else (lambda now=None: session)
+    monkeypatch.setattr(market_calendar, 'market_session', pinned)
+    monkeypatch.setattr('services.price_refresher.market_session', pinned)
+
+
+@pytest.fixture(autouse=True)
+def regular_session(monkeypatch):
+    """Route tests run as if the market were open, so plain PRICE_STALE_SECONDS applies."""
+    _pin_session(monkeypatch, REGULAR)
+
+
+@pytest.fixture()
+def client(monkeypatch, mock_supabase_globally):
+    """A TestClient for the market routes backed by the shared FakeSupabaseClient."""
+    monkeypatch.setattr(market_routes, 'get_client', lambda: type('C', (), {'client': mock_supabase_globally})())
+    app = FastAPI()
+    app.include_router(market_routes.router)
+    return TestClient(app)
+
+
+def _ticker(price, currency='USD'):
+    stock = MagicMock()
+    stock.fast_info = {'last_price': price, 'currency': currency}
+    return stock
+
+
+class TestBatchedPriceRefresh:
+    """Stale /market/prices symbols are fetched together and written back in one upsert."""
+
+    def test_stale_and_missing_symbols_refresh_in_one_upsert(self, client, mock_supabase_globally):
+        fake = mock_supabase_globally
+        now = datetime.now(timezone.utc)
+        fake.db['companies'] = [
+            {'id': 1, 'ticker': 'AAPL', 'name': 'Apple Inc.', 'latest_price': 190.0, 'latest_price_as_of': now.isoformat()},
+            {'id': 2, 'ticker': 'MSFT', 'name': 'Microsoft', 'latest_price': 400.0, 'latest_price_as_of': (now - timedelta(hours=1)).isoformat()},
+        ]
+        quotes = {'MSFT': _ticker(410.5), 'NVDA': _ticker(120.25), 'ZZZZ': _ticker(None)}
+        quotes['ZZZZ'].history.return_value.empty = True
+
+        with patch('yfinance.Ticker', side_effect=lambda sym: quotes[sym]) as mock_ticker:
+            resp = client.get('/market/prices', params={'tickers': 'aapl,MSFT,NVDA,ZZZZ,msft'})
+
+        assert resp.status_code == 200
+        assert resp.json()['prices'] == [
+            {'ticker': 'AAPL', 'price': 190.0, 'currency': 'USD'},
+            {'ticker': 'MSFT', 'price': 410.5, 'currency': 'USD'},
+            {'ticker': 'NVDA', 'price': 120.25, 'currency': 'USD'},
+            {'ticker': 'ZZZZ', 'price': None, 'currency': 'USD'},
+        ]
+        assert sorted(c.args[0] for c in mock_ticker.call_args_list) == ['MSFT', 'NVDA', 'ZZZZ']
+
+        # One bulk write covering only the symbols that got a price
+        assert len(fake.upsert_calls) == 1
+        table, rows = fake.upsert_calls[0]
+        assert table == 'companies' and [r['ticker'] for r in rows] == ['MSFT', 'NVDA']
+        by_ticker = {r['ticker']: r for r in fake.db['companies']}
+        assert by_ticker['MSFT']['latest_price'] == 410.5 and by_ticker['MSFT']['name'] == 'Microsoft'
+        assert by_ticker['NVDA']['name'] == 'NVDA' and by_ticker['NVDA']['latest_price_source'] == 'yfinance'
+        assert 'ZZZZ' not in by_ticker
+
+    def test_failed_company_lookup_never_renames_companies(self, client, mock_supabase_globally, monkeypatch):
+        fake = mock_supabase_globally
+        fake.db['companies'] = [{'id': 2, 'ticker': 'MSFT', 'name': 'Microsoft', 'latest_price': 400.0, 'latest_price_as_of': '2020-01-01T00:00:00+00:00'}]
+        table = fake.table
+
+        def failing_select(name):
+            query = table(name)
+            def select(*args):
+                raise RuntimeError('statement timeout')
+            query.select = select
+            return query
+
+        monkeypatch.setattr(fake, 'table', failing_select)
+        with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(410.5)):
+            assert client.get('/market/prices', params={'tickers': 'MSFT'}).json()['prices'][0]['price'] == 410.5
+            get_quote_cache().clear()
+            assert client.get('/market/quote/MSFT').json()['price'] == 410.5
+        assert fake.upsert_calls == [] and fake.insert_calls == []
+        assert fake.db['companies'][0]['name'] == 'Microsoft'
+
+    def test_fresh_watchlist_makes_no_quote_calls(self, client, mock_supabase_globally):
+        mock_supabase_globally.db['companies'] = [
+            {'id': 1, 'ticker': 'AAPL', 'latest_price': 190.0, 'latest_price_as_of': datetime.now(timezone.utc).isoformat()},
+        ]
+        with patch('yfinance.Ticker') as mock_ticker:
+            resp = client.get('/market/prices', params={'tickers': 'AAPL'})
+        assert resp.json()['prices'] == [{'ticker': 'AAPL', 'price': 190.0, 'currency': 'USD'}]
+        mock_ticker.assert_not_called()
+        assert mock_supabase_globally.upsert_calls == []
+
+    def test_prices_are_written_by_id_when_the_ticker_upsert_is_rejected(self, client, mock_supabase_globally, capsys):
+        fake = mock_supabase_globally
+        upsert = fake.upsert
+
+        def no_unique_ticker(table, data, conflict_column):
+            if conflict_column == 'ticker':
+                raise Exception('there is no unique or exclusion constraint matching the ON CONFLICT specification')
+            return upsert(table, data, conflict_column)
+
+        fake.upsert = no_unique_ticker
+        stale = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+        fake.db['companies'] = [
+            {'id': 2, 'ticker': 'MSFT', 'name': 'Microsoft', 'latest_price': 400.0, 'latest_price_as_of': stale},
+            {'id': 3, 'ticker': 'MSFT', 'name': 'Microsoft Corp', 'latest_price': 399.0, 'latest_price_as_of': stale},
+        ]
+        quotes = {'MSFT': _ticker(410.5), 'NVDA': _ticker(120.25)}
+        with patch('yfinance.Ticker', side_effect=lambda sym: quotes[sym]):
+            resp = client.get('/market/prices', params={'tickers': 'MSFT,NVDA'})
+
+        assert [p['price'] for p in resp.json()['prices']] == [410.5, 120.25]
+        assert 'run add_companies_ticker_unique.sql' in capsys.readouterr().out
+        # Both duplicate rows got the price and the new ticker was inserted once
+        assert sorted((r['id'], r['latest_price']) for r in fake.db['companies'] if r['ticker'] == 'MSFT') == [(2, 410.5), (3, 410.5)]
+        assert [r['latest_price'] for r in fake.db['companies'] if r['ticker'] == 'NVDA'] == [120.25]
+        assert [table for table, _ in fake.insert_calls] == ['companies']
+
+class TestQuoteCache:
+    """Process-local quotes expire with the staleness window and evict least-recently-used symbols."""
+
+    def test_entries_expire_relative_to_their_as_of_time(self):
+        cache = QuoteCache(ttl=300, max_entries=10)
+        now = datetime.now(timezone.utc)
+        cache.put('AAPL', 190, as_of=now - timedelta(seconds=100))
+        cache.put('MSFT', 400, as_of=(now - timedelta(seconds=301)).isoformat())
+        assert cache.get('AAPL')['price'] == 190.0
+        assert cache.get('MSFT') is None
+        cache._entries['AAPL'] = (0, cache._entries['AAPL'][1])
+        assert cache.get('AAPL') is None and cache.stats()['entries'] == 0
+
+    def test_lru_eviction(self):
+        cache = QuoteCache(ttl=300, max_entries=2)
+        cache.put('A', 1)
+        cache.put('B', 2)
+        cache.get('A')
+        cache.put('C', 3)
+        assert cache.get('B') is None
+        assert cache.get('A')['price'] == 1.0 and cache.get('C')['price'] == 3.0
+
+    def test_repeat_reads_are_served_from_the_process(self, client, mock_supabase_globally):
+        with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(100.0)) as mock_ticker:
+            first = client.get('/market/prices', params={'tickers': 'NVDA'}).json()
+            mock_supabase_globally.db['companies'].clear()
+            second = client.get('/market/prices', params={'tickers': 'NVDA'}).json()
+            quote = client.get('/market/quote/nvda').json()
+        assert first['prices'] == second['prices'] == [{'ticker': 'NVDA', 'price': 100.0, 'currency': 'USD'}]
+        assert quote['price'] == 100.0
+        assert mock_ticker.call_count == 1
+
+    def test_fresh_db_rows_populate_the_cache(self, client, mock_supabase_globally):
+        as_of = datetime.now(timezone.utc).isoformat()
+        mock_supabase_globally.db['companies'] = [{'id': 1, 'ticker': 'AAPL', 'latest_price': 190.0, 'latest_price_as_of': as_of}]
+        client.get('/market/quote/AAPL')
+        cached = get_quote_cache().get('AAPL')
+        assert cached['price'] == 190.0 and cached['as_of'] == as_of
+
+    def test_order_execution_writes_through(self, mock_supabase_globally):
+        from backend.api.database_routes import _execute_order_internal
+        hist = MagicMock(empty=False)
+        hist.__getitem__.return_value.iloc.__getitem__.return_value = 55.5
+        with patch('yfinance.Ticker') as mock_ticker:
+            mock_ticker.return_value.history.return_value = hist
+            res = _execute_order_internal('pf-1', 'amd', 'buy', 'market', 2, None)
+        assert res['success'] is True
+        cached = get_quote_cache().get('AMD')
+        assert cached['price'] == 55.5 and cached['source'] == 'order_execution'
+
+    def test_limit_fills_are_not_served_as_quotes(self, mock_supabase_globally):
+        from backend.api.database_routes import _execute_order_internal
+        with patch('yfinance.Ticker') as mock_ticker:
+            mock_ticker.return_value.history.side_effect = RuntimeError('rate limited')
+            assert _execute_order_internal('pf-1', 'amd', 'buy', 'limit', 1, 40.0)['success'] is True
+            assert _execute_order_internal('pf-1', 'amd', 'buy', 'market', 1, 41.0)['success'] is True  # falls back to the limit
+        assert get_quote_cache().get('AMD') is None
+
+
+class TestSingleFlight:
+    """Concurrent refreshes of the same symbol share one Yahoo call and one DB write."""
+
+    def test_concurrent_refreshes_share_one_fetch_and_write(self, monkeypatch):
+        fetched, writes = [], []
+        lock = threading.Lock()
+
+        def slow_quote(symbol):
+            with lock:
+                fetched.append(symbol)
+            time.sleep(0.05)
+            return 10.0 + len(symbol), 'USD'
+
+        monkeypatch.setattr(quotes_service, 'fetch_quote', slow_quote)
+
+        async def main():
+            calls = [refresh_quotes(['AAPL'], writes.append) for _ in range(5)]
+            calls.append(refresh_quotes(['AAPL', 'MSFT'], writes.append))
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(main())
+        assert sorted(fetched) == ['AAPL', 'MSFT']
+        assert all(r['AAPL'] == (14.0, 'USD') for r in results)
+        assert results[-1]['MSFT'] == (14.0, 'USD')
+        # The first caller led AAPL, the last led MSFT only
+        assert sorted(writes, key=list) == [{'AAPL': (14.0, 'USD')}, {'MSFT': (14.0, 'USD')}]
+        assert get_quote_cache().get('MSFT')['price'] == 14.0
+        assert quotes_service._quote_flight._inflight == {}
+
+    def test_waiters_receive_the_leaders_error(self):
+        flight = SingleFlight()
+
+        async def main():
+            gate = asyncio.Event()
+
+            async def failing(keys):
+                gate.set()
+                await asyncio.sleep(0.01)
+                raise RuntimeError('rate limited')
+
+            async def waiter():
+                await gate.wait()
+                return await flight.do_many(['X'], failing)
+
+            return await asyncio.gather(flight.do_many(['X'], failing), waiter(), return_exceptions=True)
+
+        leader, waiter = asyncio.run(main())
+        assert isinstance(leader, RuntimeError) and waiter is leader
+        assert flight._inflight == {}
+
+    def test_concurrent_quote_requests_call_yahoo_once(self, client, mock_supabase_globally):
+        calls = []
+
+        def slow_ticker(symbol):
+            calls.append(symbol)
+            time.sleep(0.05)
+            return _ticker(42.0)
+
+        async def main():
+            import httpx
+            transport = httpx.ASGITransport(app=client.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+                return await asyncio.gather(*(http.get('/market/quote/TSLA') for _ in range(4)))
+
+        with patch('yfinance.Ticker', side_effect=slow_ticker):
+            responses = asyncio.run(main())
+        assert [r.json()['price'] for r in responses] == [42.0] * 4
+        assert calls == ['TSLA']
+        assert [r['ticker'] for r in mock_supabase_globally.db['companies']] == ['TSLA']
+
+
+class TestHotTickerRefresher:
+    """Held and recently requested tickers are refreshed in the background."""
+
+    def test_refresh_pass_warms_held_and_recent_tickers(self, client, mock_supabase_globally):
+        fake = mock_supabase_globally
+        fake.db['companies'] = [{'id': 7, 'ticker': 'MSFT', 'name': 'Microsoft'}]
+        fake.insert('positions', {'portfolio_id': 'pf-1', 'ticker': 'aapl', 'quantity': 1})
+        fake.insert('positions', {'portfolio_id': 'pf-1', 'company_id': 7, 'quantity': 2})
+        refresher = get_price_refresher()
+        refresher._get_client = lambda: fake
+        refresher.batch_size = 2
+        refresher.touch(['NVDA'])
+
+        with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(100.0 + len(fake.upsert_calls))) as mock_ticker:
+            assert asyncio.run(refresher.refresh_once()) == 3
+        assert sorted(c.args[0] for c in mock_ticker.call_args_list) == ['AAPL', 'MSFT', 'NVDA']
+        assert [[r['ticker'] for r in rows] for _, rows in fake.upsert_calls] == [['AAPL', 'MSFT'], ['NVDA']]
+        assert {r['ticker']: r['name'] for r in fake.db['companies']} == {'MSFT': 'Microsoft', 'AAPL': 'AAPL', 'NVDA': 'NVDA'}
+
+        # Requests for the hot set are now answered from the cache
+        with patch('yfinance.Ticker') as mock_ticker:
+            prices = client.get('/market/prices', params={'tickers': 'AAPL,MSFT,NVDA'}).json()['prices']
+        mock_ticker.assert_not_called()
+        assert [p['price'] for p in prices] == [100.0, 100.0, 101.0]
+
+    def test_requests_join_the_hot_set_and_expire(self, client, monkeypatch):
+        with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(5.0)):
+            client.get('/market/quote/AMD')
+            client.get('/market/prices', params={'tickers': 'INTC,AMD'})
+        refresher = get_price_refresher()
+        assert refresher.recent_symbols() == ['INTC', 'AMD']
+        monkeypatch.setattr('services.price_refresher.RECENT_QUOTE_TTL_SEC', -1)
+        assert refresher.recent_symbols() == []
+
+
+    def test_a_cold_miss_waits_on_the_refresh_already_in_flight(self, mock_supabase_globally):
+        fake = mock_supabase_globally
+        fake.insert('positions', {'portfolio_id': 'pf-1', 'ticker': 'AMD', 'quantity': 1})
+        refresher = get_price_refresher()
+        refresher._get_client = lambda: fake
+        calls, started, release = [], threading.Event(), threading.Event()
+
+        def blocked_ticker(symbol):
+            calls.append(symbol)
+            started.set()
+            release.wait(5)
+            return _ticker(99.0)
+
+        async def main():
+            refresh = asyncio.create_task(refresher.refresh_once())
+            await asyncio.to_thread(started.wait, 5)
+            request = asyncio.create_task(market_routes.get_prices('AMD'))
+            await asyncio.sleep(0.01)
+            release.set()
+            return await refresh, await request
+
+        with patch('yfinance.Ticker', side_effect=blocked_ticker):
+            refreshed, response = asyncio.run(main())
+        assert refreshed == 1 and calls == ['AMD']
+        assert response['prices'] == [{'ticker': 'AMD', 'price': 99.0, 'currency': 'USD'}]
+
+    def test_failed_passes_are_counted_and_the_loop_keeps_running(self, monkeypatch):
+        refresher = get_price_refresher()
+        passes = []
+
+        async def failing_pass():
+            passes.append(1)
+            raise RuntimeError('supabase unavailable')
+
+        monkeypatch.setattr(refresher, 'refresh_once', failing_pass)
+        monkeypatch.setattr(refresher, 'interval', lambda now=None: 0)
+
+        async def main():
+            refresher.start()
+            while len(passes) < 3:
+                await asyncio.sleep(0)
+            info = refresher.info()
+            await refresher.stop()
+            return info
+
+        info = asyncio.run(main())
+        assert info['running'] and info['errors'] >= 2
+        assert refresher.task is None
+
+    def test_interval_waits_for_the_open_when_closed(self, monkeypatch):
+        monkeypatch.setattr('services.price_refresher.market_session', lambda now=None: CLOSED)
+        monkeypatch.setattr('services.price_refresher.REFRESH_CLOSED_INTERVAL_SEC', 1800)
+        now = datetime(2025, 1, 6, 14, 20, tzinfo=timezone.utc)  # 09:20 ET, ten minutes before the open
+        monkeypatch.setattr('services.price_refresher.next_session_start', lambda now: now + timedelta(minutes=10))
+        assert HotTickerRefresher.interval(now) == 600
+
+class TestUniverse:
+    """/market/universe reads the precomputed view with filters, order and limit applied in the query."""
+
+    def test_ranked_in_the_database_and_cached(self, client, mock_supabase_globally):
+        fake = mock_supabase_globally
+        fake.db['universe_ranked'] = [
+            {'ticker': 'AAA', 'cap_bucket': 'micro', 'latest_price': 2.0, 'market_cap': 1e8, 'avg_volume_30d': 100, 'median_dollar_volume_30d': 5e5, 'exchange': 'NYSE'},
+            {'ticker': 'BBB', 'cap_bucket': 'micro', 'latest_price': 3.0, 'market_cap': 2e8, 'avg_volume_30d': 300, 'median_dollar_volume_30d': 5e5, 'exchange': 'NASDAQ'},
+            {'ticker': 'CCC', 'cap_bucket': 'micro', 'latest_price': 4.0, 'market_cap': 2e8, 'avg_volume_30d': 900, 'median_dollar_volume_30d': 1e3, 'exchange': 'AMEX'},
+            {'ticker': 'DDD', 'cap_bucket': 'large', 'latest_price': 50.0, 'market_cap': 5e10, 'avg_volume_30d': 10**6, 'median_dollar_volume_30d': 1e9, 'exchange': 'NYSE'},
+            {'ticker': 'EEE', 'cap_bucket': 'micro', 'latest_price': 1.5, 'market_cap': 9e7, 'avg_volume_30d': 200, 'median_dollar_volume_30d': 4e5, 'exchange': 'NYSE'},
+        ]
+        params = {'cap': 'micro', 'limit': 2, 'min_median_dollar_volume': 300000}
+        universe = client.get('/market/universe', params=params).json()['universe']
+        assert universe == [
+            {'ticker': 'BBB', 'price': 3.0, 'market_cap': 2e8, 'avg_volume': 300, 'exchange': 'NASDAQ'},
+            {'ticker': 'EEE', 'price': 1.5, 'market_cap': 9e7, 'avg_volume': 200, 'exchange': 'NYSE'},
+        ]
+        assert [r['ticker'] for r in client.get('/market/universe', params={'cap': 'all', 'limit': 1}).json()['universe']] == ['DDD']
+
+        # Served from the in-process cache until the view is refreshed
+        fake.db['universe_ranked'] = []
+        assert client.get('/market/universe', params=params).json()['universe'] == universe
+        assert get_universe().refresh() == {'success': True}
+        assert fake.rpc_calls == [('refresh_universe_ranked', None)]
+        assert client.get('/market/universe', params=params).json()['universe'] == []
+
+
+class TestQuoteStream:
+    """/market/stream pushes refreshed prices to every subscriber from one upstream fetch."""
+
+    def test_one_fetch_fans_out_to_every_subscriber(self, client, monkeypatch, mock_supabase_globally):
+        monkeypatch.setattr(quote_stream, 'QUOTE_STREAM_MIN_INTERVAL_SEC', 0)
+        get_quote_cache().put('AAPL', 190.0)
+        with client.websocket_connect('/market/stream') as first, client.websocket_connect('/market/stream') as second:
+            for ws in (first, second):
+                ws.send_json({'action': 'subscribe', 'tickers': ['aapl']})
+                assert ws.receive_json() == {'type': 'quotes', 'payload': [{'ticker': 'AAPL', 'price': 190.0, 'currency': 'USD'}]}
+            assert get_quote_hub().info() == {'symbols': 1, 'connections': 2}
+
+            refresher = get_price_refresher()
+            refresher._get_client = lambda: mock_supabase_globally
+            get_quote_cache().clear()  # due for refresh
+            with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(195.0)) as mock_ticker:
+                asyncio.run(refresher.refresh_once())
+            assert [c.args[0] for c in mock_ticker.call_args_list] == ['AAPL']
+            for ws in (first, second):
+                assert [(q['ticker'], q['price']) for q in ws.receive_json()['payload']] == [('AAPL', 195.0)]
+        assert get_quote_hub().info() == {'symbols': 0, 'connections': 0}
+
+    def test_updates_are_throttled_and_coalesced_per_connection(self):
+        sent = []
+
+        class Socket:
+            async def send_text(self, text):
+                sent.append(json.loads(text))
+
+        async def burst():
+            subscriber = QuoteSubscriber(Socket(), min_interval=0.05)
+            subscriber.symbols.add('AAPL')
+            subscriber.offer({'ticker': 'AAPL', 'price': 1.0})
+            await asyncio.sleep(0.01)
+            for price in (2.0, 3.0, 3.0):
+                subscriber.offer({'ticker': 'AAPL', 'price': price})
+            subscriber.offer({'ticker': 'MSFT', 'price': 9.0})  # not subscribed
+            await asyncio.sleep(0.1)
+            subscriber.offer({'ticker': 'AAPL', 'price': 3.0})  # unchanged
+            await asyncio.sleep(0.01)
+            subscriber.cancel()
+
+        asyncio.run(burst())
+        assert [[q['price'] for q in frame['payload']] for frame in sent] == [[1.0], [3.0]]
+
+    def test_unsubscribe_and_bad_messages(self, client):
+        with client.websocket_connect('/market/stream') as ws:
+            ws.send_json({'action': 'subscribe', 'tickers': []})
+            ws.send_text('not json')
+            assert ws.receive_json()['type'] == 'error'
+            with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(5.0)):
+                ws.send_json({'action': 'subscribe', 'tickers': 'NVDA,AMD'})
+                assert [q['ticker'] for q in ws.receive_json()['payload']] == ['NVDA', 'AMD']
+            ws.send_json({'action': 'unsubscribe', 'tickers': ['NVDA']})
+            ws.send_json({'action': 'ping'})
+            assert ws.receive_json() == {'type': 'error', 'payload': 'Unknown action: ping'}
+            assert get_quote_hub().symbols() == ['AMD']
+
+
+class TestSnapshotPipeline:
+    """Portfolio snapshots run as a bulk background job behind a status handle."""
+
+    def test_portfolio_values_price_by_company_then_ticker_then_entry(self):
+        portfolios = [{'id': 'pf-1', 'cash_balance': 100}, {'id': 'pf-2', 'cash_balance': 50}]
+        positions = [
+            {'portfolio_id': 'pf-1', 'company_id': 1, 'quantity': 2, 'avg_entry_price': 1},
+            {'portfolio_id': 'pf-1', 'ticker': 'msft', 'quantity': -1, 'avg_entry_price': 1},
+            {'portfolio_id': 'pf-1', 'ticker': 'GONE', 'quantity': 3, 'avg_entry_price': 10},
+        ]
+        companies = [{'id': 1, 'ticker': 'AAPL', 'latest_price': 200.0}, {'id': 2, 'ticker': 'MSFT', 'latest_price': 400.0}]
+        assert portfolio_values(portfolios, positions, companies) == {'pf-1': 100 + 400 + 400 + 30, 'pf-2': 50}
+
+    def test_job_refreshes_stale_prices_and_snapshots_in_bulk(self, monkeypatch, mock_supabase_globally):
+        fake = mock_supabase_globally
+        now = datetime.now(timezone.utc)
+        fake.db['companies'] = [
+            {'id': 1, 'ticker': 'AAPL', 'name': 'Apple Inc.', 'latest_price': 190.0, 'latest_price_as_of': now.isoformat()},
+            {'id': 2, 'ticker': 'MSFT', 'name': 'Microsoft', 'latest_price': 400.0, 'latest_price_as_of': (now - timedelta(hours=1)).isoformat()},
+        ]
+        fake.db['portfolios'] = [{'id': 'pf-1', 'cash_balance': 100}, {'id': 'pf-2', 'cash_balance': 0}]
+        fake.db['positions'] = [{'portfolio_id': 'pf-1', 'company_id': 2, 'quantity': 1}]
+        fake.db['portfolio_snapshots'] = [{'portfolio_id': 'pf-2', 'recorded_at': now.isoformat(), 'total_value': 0}]
+        downloads = []
+        monkeypatch.setattr(snapshot_pipeline, 'download_closes', lambda symbols: downloads.append(symbols) or {s: (410.0, 'USD') for s in symbols})
+        monkeypatch.setattr(market_routes, 'get_client', lambda: type('C', (), {'client': fake})())
+        monkeypatch.setattr(snapshot_pipeline, '_jobs', {})
+        app = FastAPI()
+        app.include_router(market_routes.router)
+
+        with TestClient(app) as client:
+            started = client.post('/market/update-portfolio-snapshots').json()
+            assert started['success'] is True and started['status'] == 'running'
+            for _ in range(200):
+                job = client.get(started['status_url']).json()
+                if job['status'] != 'running':
+                    break
+                time.sleep(0.01)
+            assert client.get('/market/update-portfolio-snapshots/missing').status_code == 404
+
+        assert job['status'] == 'done', job
+        assert downloads == [['MSFT']]
+        assert [[r['ticker'] for r in rows] for _, rows in fake.upsert_calls] == [['MSFT']]
+        assert [[r['portfolio_id'] for r in rows] for _, rows in fake.insert_calls] == [['pf-1']]
+        assert [r['total_value'] for r in fake.db['portfolio_snapshots'] if r['portfolio_id'] == 'pf-1'] == [510.0]
+        assert {k: job['result'][k] for k in ('fresh_prices_skipped', 'updated_prices_count', 'created_snapshots_count', 'skipped_snapshots_count')} == {
+            'fresh_prices_skipped': 1, 'updated_prices_count': 1, 'created_snapshots_count': 1, 'skipped_snapshots_count': 1,
+        }
+        assert get_quote_cache().get('MSFT')['price'] == 410.0
+
+    def test_every_page_of_every_table_is_read(self, monkeypatch, mock_supabase_globally):
+        fake = mock_supabase_globally
+        fake.max_rows = 2
+        monkeypatch.setattr('supabase_services.client.PAGE_SIZE', 2)
+        now = datetime.now(timezone.utc)
+        fake.db['companies'] = [{'id': i, 'ticker': f'T{i}', 'name': f'T{i}', 'latest_price': None} for i in range(5)]
+        fake.db['portfolios'] = [{'id': f'pf-{i}', 'cash_balance': 10 * i} for i in range(5)]
+        fake.db['positions'] = [{'id': i, 'portfolio_id': f'pf-{i}', 'company_id': i, 'quantity': 1} for i in range(5)]
+        fake.db['portfolio_snapshots'] = [{'id': f's-{i}', 'portfolio_id': f'pf-{i}', 'recorded_at': now.isoformat(), 'total_value': 0} for i in (0, 4)]
+        monkeypatch.setattr(snapshot_pipeline, 'download_closes', lambda symbols: {s: (float(s[1:]), 'USD') for s in symbols})
+
+        companies, price_stats = snapshot_pipeline.refresh_company_prices(fake, now)
+        stats = snapshot_pipeline.create_snapshots(fake, companies, now)
+
+        assert price_stats['total_companies'] == price_stats['updated_prices_count'] == 5
+        assert stats == {'total_portfolios': 5, 'created_snapshots_count': 3, 'skipped_snapshots_count': 2}
+        created = {r['portfolio_id']: r['total_value'] for _, rows in fake.insert_calls for r in rows}
+        assert created == {'pf-1': 11.0, 'pf-2': 22.0, 'pf-3': 33.0}
+
+    def test_overlapping_triggers_share_the_running_job(self, monkeypatch):
+        monkeypatch.setattr(snapshot_pipeline, '_jobs', {})
+        release = threading.Event()
+
+        async def trigger_twice():
+            first = snapshot_pipeline.start_snapshot_job(lambda: release.wait(5) and None)
+            second = snapshot_pipeline.start_snapshot_job(lambda: None)
+            release.set()
+            await first.task
+            return first, second
+
+        first, second = asyncio.run(trigger_twice())
+        assert first is second
+        assert first.status == 'error' and first.stage == 'finished'
+
+
+class TestMarketCalendar:
+    """NYSE sessions drive how long a price stays fresh."""
+
+    @pytest.fixture(autouse=True)
+    def real_calendar(self, monkeypatch):
+        _pin_session(monkeypatch, _real_market_session)
+
+    def test_holidays_and_early_closes(self):
+        assert nyse_holidays(2024) >= {date(2024, 1, 1), date(2024, 3, 29), date(2024, 6, 19), date(2024, 11, 28)}
+        assert date(2026, 7, 3) in nyse_holidays(2026)      # Jul 4 on a Saturday
+        assert date(2021, 12, 31) not in nyse_holidays(2021)  # New Year's on a Saturday is not observed
+        assert nyse_early_closes(2024) == {date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24)}
+        assert date(2026, 7, 2) not in nyse_early_closes(2026)
+
+    def test_sessions(self):
+        ny = market_calendar.MARKET_TZ
+        assert market_session(datetime(2024, 3, 12, 8, 0, tzinfo=ny)) == PRE
+        assert market_session(datetime(2024, 3, 12, 9, 30, tzinfo=ny)) == REGULAR
+        assert market_session(datetime(2024, 3, 12, 16, 30, tzinfo=ny)) == POST
+        assert market_session(datetime(2024, 3, 12, 21, 0, tzinfo=ny)) == CLOSED
+        assert market_session(datetime(2024, 11, 29, 13, 30, tzinfo=ny)) == POST  # early close
+        assert market_session(datetime(2024, 3, 29, 11, 0, tzinfo=ny)) == CLOSED  # Good Friday
+
+    def test_off_hours_prices_stay_valid_until_the_next_open(self):
+        ny = market_calendar.MARKET_TZ
+        friday_close = datetime(2024, 3, 28, 16, 5, tzinfo=ny)  # Good Friday follows
+        reopen = datetime(2024, 4, 1, 9, 30, tzinfo=ny)
+        assert price_valid_until(friday_close, 300, extended=False) == reopen
+        assert next_session_start(friday_close, extended=True) == datetime(2024, 4, 1, 4, 0, tzinfo=ny)
+        assert is_price_fresh(friday_close.isoformat(), 300, now=datetime(2024, 3, 31, 12, 0, tzinfo=ny))
+        assert not is_price_fresh(friday_close, 300, now=reopen)
+
+        midday = datetime(2024, 4, 1, 11, 0, tzinfo=ny)
+        assert price_valid_until(midday, 300) == midday + timedelta(seconds=300)
+        assert not is_price_fresh(midday, 300, now=midday + timedelta(seconds=301))
+        assert not is_price_fresh(None, 300)
+
+    def test_refresher_skips_symbols_valid_until_the_open(self, monkeypatch, mock_supabase_globally):
+        _pin_session(monkeypatch, CLOSED)
+        get_quote_cache().put('AAPL', 190.0)
+        refresher = get_price_refresher()
+        refresher._get_client = lambda: mock_supabase_globally
+        refresher.touch(['AAPL', 'NVDA'])
+        with patch('yfinance.Ticker', side_effect=lambda sym: _ticker(100.0)) as mock_ticker:
+            asyncio.run(refresher.refresh_once())
+        assert [c.args[0] for c in mock_ticker.call_args_list] == ['NVDA']
+
+    def test_schedule_follows_market_hours(self):
+        open_utc = datetime(2024, 3, 12, 15, 0, tzinfo=timezone.utc)     # Tue 11:00 New York
+        evening_utc = datetime(2024, 3, 12, 22, 0, tzinfo=timezone.utc)  # Tue 18:00
+        weekend_utc = datetime(2024, 3, 16, 15, 0, tzinfo=timezone.utc)  # Sat
+        assert market_is_open(open_utc)
+        assert not market_is_open(evening_utc) and not market_is_open(weekend_utc)
+        assert HotTickerRefresher.interval(open_utc) < HotTickerRefresher.interval(weekend_utc)
@@ -30,6 +30,24 @@ def fake_client_with_account(fake_client: FakeSupabaseClient) -> FakeSupabaseCli
 	return fake_client 
 
 
+@pytest.fixture(autouse=True)
+def isolate_negative_cache(monkeypatch, tmp_path):
+	"""Keep the persisted negative price cache out of the working tree during tests."""
+	import utils.negative_cache as negative_cache
+	monkeypatch.setattr(negative_cache, '_cache', negative_cache.NegativeCache(path=str(tmp_path / 'negative_cache.json')))
+
+
+@pytest.fixture(autouse=True)
+def isolate_quote_cache(monkeypatch):
+	"""Give every test an empty process-local quote cache, hot-ticker set and stream hub."""
+	import utils.quote_cache as quote_cache
+	monkeypatch.setattr(quote_cache, '_cache', quote_cache.QuoteCache())
+	import services.quote_stream as quote_stream
+	monkeypatch.setattr(quote_stream, '_hub', None)
+	import services.price_refresher as price_refresher
+	monkeypatch.setattr(price_refresher, '_refresher', price_refresher.HotTickerRefresher())
+
+
 @pytest.fixture(autouse=True)
 def mock_supabase_globally(monkeypatch):
 	"""Provide a global FakeSupabaseClient backing backend.supabase_services for tests that don't stub it themselves."""
@@ -46,6 +64,7 @@ def mock_supabase_globally(monkeypatch):
 	})
 
 	services_dict['_client'] = None
+	services_dict['_symbols'] = None
 	def _get_client():
 		# Tiny wrapper exposing .client and convenience passthroughs
 		return type('C', (), {
@@ -64,7 +83,7 @@ def mock_supabase_globally(monkeypatch):
 		import supabase_services as top_services
 		monkeypatch.setattr('supabase_services.get_client', _get_client, raising=False)
 		# Reset singletons on both namespaces
-		for name in ['_accounts','_transactions','_categories','_institutions','_sync','_snapshots','_portfolios','_orders','_positions','_client']:
+		for name in ['_accounts','_transactions','_categories','_institutions','_sync','_snapshots','_portfolios','_orders','_positions','_universe','_symbols','_client']:
 			if name in top_services.__dict__:
 				top_services.__dict__[name] = None
 	except Exception:
@@ -77,6 +96,7 @@ def mock_supabase_globally(monkeypatch):
 	monkeypatch.setattr(routes, 'get_portfolios', be_services.get_portfolios, raising=False)
 	monkeypatch.setattr(routes, 'get_positions', be_services.get_positions, raising=False)
 	monkeypatch.setattr(routes, 'get_orders', be_services.get_orders, raising=False)
+	monkeypatch.setattr(routes, 'get_symbols', be_services.get_symbols, raising=False)
 	# Reset service singletons to ensure they bind to the fake
 	services_dict['_accounts'] = None
 	services_dict['_transactions'] = None
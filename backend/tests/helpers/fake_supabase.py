@@ -13,7 +13,14 @@ class FakeSupabaseClient:
 			'positions': [],
 			'orders': [],
 			'companies': [],
+			'portfolio_snapshots': [],
+			'universe_ranked': [],
+			'sectors': [],
 		}
+		self.upsert_calls: List = []  # (table, rows) per query-builder upsert, to count round trips
+		self.insert_calls: List = []  # (table, rows) per query-builder insert
+		self.rpc_calls: List = []  # (function, params)
+		self.max_rows = None  # like PostgREST's db-max-rows: cap on rows any one select returns
 
 	# --- Basic helpers ---
 	def _match_filters(self, row: Dict[str, Any], filters: Dict[str, Any]) -> bool:
@@ -101,6 +108,9 @@ class FakeSupabaseClient:
 			self._table = table_name
 			self._filters: Dict[str, Any] = {}
 			self._limit: int | None = None
+			self._order = None
+			self._range = None
+			self._upserted = None
 			self.data = None
 		def select(self, _cols: str = "*"):
 			return self
@@ -115,19 +125,61 @@ class FakeSupabaseClient:
 		def limit(self, n: int):
 			self._limit = n
 			return self
+		def range(self, start: int, end: int):
+			self._range = (start, end)
+			return self
+		def order(self, key: str, desc: bool = False):
+			self._order = (key, desc)
+			return self
+		def gte(self, key: str, value: Any):
+			self._filters[f"__gte__{key}"] = value
+			return self
+		def lt(self, key: str, value: Any):
+			self._filters[f"__lt__{key}"] = value
+			return self
+		def insert(self, rows):
+			self._outer.insert_calls.append((self._table, rows))
+			self._outer.insert(self._table, rows)
+			self._upserted = rows if isinstance(rows, list) else [rows]
+			return self
+		def upsert(self, rows, on_conflict: str = 'id'):
+			self._outer.upsert_calls.append((self._table, rows))
+			self._outer.upsert(self._table, rows, on_conflict)
+			self._upserted = rows if isinstance(rows, list) else [rows]
+			return self
 		def execute(self):
+			if self._upserted is not None:
+				self.data = [dict(r) for r in self._upserted]
+				return self
 			# apply simple equality filters
-			eq_filters = {k: v for k, v in self._filters.items() if not str(k).startswith("__in__")}
+			eq_filters = {k: v for k, v in self._filters.items() if not str(k).startswith("__")}
 			rows = self._outer._find_rows(self._table, eq_filters)
 			# apply inclusion filters
 			for k, v in self._filters.items():
 				if str(k).startswith("__in__"):
 					col = str(k).split("__in__", 1)[1]
 					rows = [r for r in rows if r.get(col) in v]
+				elif str(k).startswith("__gte__"):
+					col = str(k).split("__gte__", 1)[1]
+					rows = [r for r in rows if r.get(col) is not None and r.get(col) >= v]
+				elif str(k).startswith("__lt__"):
+					col = str(k).split("__lt__", 1)[1]
+					rows = [r for r in rows if r.get(col) is not None and r.get(col) < v]
+			if self._order is not None:
+				key, desc = self._order
+				rows = sorted(rows, key=lambda r: (r.get(key) is not None, r.get(key) or 0), reverse=desc)
+			if self._range is not None:
+				rows = rows[self._range[0]: self._range[1] + 1]
 			if self._limit is not None:
 				rows = rows[: self._limit]
+			if self._outer.max_rows is not None:
+				rows = rows[: self._outer.max_rows]
 			self.data = [dict(r) for r in rows]
 			return self
 
 	def table(self, name: str):
-		return FakeSupabaseClient._TableQuery(self, name)
\ No newline at end of file
+		return FakeSupabaseClient._TableQuery(self, name)
+
+	def rpc(self, name: str, params: Dict[str, Any] | None = None):
+		self.rpc_calls.append((name, params))
+		return type('R', (), {'execute': lambda _self: type('Res', (), {'data': None})()})()
\ No newline at end of file
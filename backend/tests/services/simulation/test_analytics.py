@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from services.analytics import performance_metrics, simulation_metrics, trade_metrics
+
+
+def _calendar_nav(values, start="2020-01-01"):
+	"""Calendar-day NAV like the engine's: business days take `values`, weekends repeat the last one."""
+	sessions = pd.bdate_range(start, periods=len(values))
+	series = pd.Series(values, index=sessions).reindex(pd.date_range(sessions[0], sessions[-1])).ffill()
+	return [str(d.date()) for d in series.index], series.tolist()
+
+
+def test_performance_metrics_match_direct_formulas():
+	rng = np.random.default_rng(0)
+	nav = 1000 * np.cumprod(1 + rng.normal(0.0004, 0.01, 600))
+	dates, values = _calendar_nav(nav)
+	metrics = performance_metrics(dates, values)
+
+	returns = np.diff(nav) / nav[:-1]
+	sessions = pd.bdate_range("2020-01-01", periods=len(nav))
+	years = (sessions[-1] - sessions[0]).days / 365.25
+	ppy = (len(nav) - 1) / years
+	assert abs(ppy - 252) < 10
+	assert metrics["total_return_pct"] == round((nav[-1] / nav[0] - 1) * 100, 2)
+	assert metrics["cagr_pct"] == round(((nav[-1] / nav[0]) ** (1 / years) - 1) * 100, 2)
+	assert metrics["volatility_pct"] == round(returns.std(ddof=1) * np.sqrt(ppy) * 100, 2)
+	assert metrics["sharpe"] == round(returns.mean() / returns.std(ddof=1) * np.sqrt(ppy), 3)
+
+	drawdowns = nav / np.maximum.accumulate(nav) - 1
+	assert metrics["max_drawdown_pct"] == round(drawdowns.min() * 100, 2)
+	assert metrics["trough_date"] == str(sessions[np.argmin(drawdowns)].date())
+	assert metrics["rolling_1y"]["count"] > 0
+
+
+def test_max_drawdown_dates_and_recovery():
+	dates, values = _calendar_nav([100, 120, 90, 60, 100, 121, 110])
+	metrics = performance_metrics(dates, values)
+	assert metrics["max_drawdown_pct"] == -50.0
+	assert metrics["peak_date"] == "2020-01-02"
+	assert metrics["trough_date"] == "2020-01-06"
+	assert metrics["recovery_date"] == "2020-01-08"
+	assert metrics["rolling_1y"] is None
+
+
+def _trade(ticker, entry_date, amount, exit_date=None, exit_amount=None, pnl=None, days=None):
+	trade = {
+		"ticker": ticker, "status": "closed" if exit_date else "open", "pnl": pnl, "duration_days": days,
+		"entry_order": {"date": entry_date, "amount": amount},
+	}
+	if exit_date:
+		trade["exit_order"] = {"date": exit_date, "amount": exit_amount}
+	return trade
+
+
+def test_trade_metrics_from_ledger():
+	dates, values = _calendar_nav([1000] * 21)  # 2020-01-01 .. 2020-01-29
+	trades = [
+		_trade("AAA", "2020-01-01", 500, "2020-01-15", 550, pnl=50, days=14),
+		_trade("BBB", "2020-01-02", 200, "2020-01-09", 180, pnl=-20, days=7),
+		_trade("AAA", "2020-01-20", 400),
+	]
+	metrics = trade_metrics(trades, dates, values)
+	assert metrics["closed_trades"] == 2
+	assert metrics["hit_rate_pct"] == 50.0
+	assert metrics["avg_holding_days"] == 10.5
+	assert metrics["traded_notional"] == 1830
+	# AAA: 500 for 14 days + 400 open for 9 days, over 28 days of 1000 NAV
+	assert metrics["exposure_by_ticker"] == {"AAA": round((500 * 14 + 400 * 9) / 28000, 4), "BBB": 0.05}
+
+
+def test_simulation_metrics_tolerates_missing_benchmark_values():
+	dates, values = _calendar_nav([100, 101, 102, 101, 103])
+	metrics = simulation_metrics(dates, values, [None] * len(dates), [])
+	assert metrics["portfolio"]["total_return_pct"] == 3.0
+	assert metrics["benchmark"] == {}
+	assert metrics["trading"]["trades"] == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from models.schema import SimulationRequest
+from services.benchmarks import EQUAL_WEIGHT, BenchmarkSet
+from services.simulation_engine import SimulationEngine
+from strategies.base_strategy import BaseStrategy
+
+
+def _frame(seed, start="2019-01-01", periods=200):
+	rng = np.random.default_rng(seed)
+	index = pd.bdate_range(start, periods=periods, name="date")
+	return pd.DataFrame({"adj_close": 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, periods)))}, index=index)
+
+
+def test_ticker_curve_matches_asof_lookup():
+	df = _frame(1)
+	benchmarks = BenchmarkSet("2019-02-02", "2019-05-31", 1000)
+	benchmarks.add_ticker("SPY", df)
+	shares = 1000 / df["adj_close"].asof(pd.Timestamp("2019-02-02"))
+	for date in benchmarks.calendar:
+		expected = round(shares * df["adj_close"].asof(date), 2)
+		assert benchmarks.value("SPY", benchmarks.index(date)) == expected
+	assert benchmarks.final("SPY") == round(shares * df["adj_close"].iloc[df.index.get_indexer([pd.Timestamp("2019-05-31")])[0]], 2)
+	assert benchmarks.value("SPY", -1) is None and benchmarks.value("QQQ", 0) is None
+
+
+def test_equal_weight_curve_rebalances_daily():
+	frames = {"AAA": _frame(2), "BBB": _frame(3), "SPY": _frame(4)}
+	benchmarks = BenchmarkSet("2019-03-01", "2019-04-30", 1000)
+	benchmarks.add_equal_weight(frames, exclude={"SPY"})
+
+	prices = pd.DataFrame({t: frames[t]["adj_close"] for t in ("AAA", "BBB")})
+	prices = prices.reindex(benchmarks.calendar, method="ffill")
+	expected = 1000 * (1 + prices.pct_change().mean(axis=1).fillna(0)).cumprod()
+	assert np.allclose(benchmarks.curves[EQUAL_WEIGHT], expected.round(2).to_numpy())
+
+
+class _Idle(BaseStrategy):
+	def universe(self, date_str):
+		return ["AAA"]
+
+	def history_months(self):
+		return 1
+
+
+def test_engine_streams_extra_benchmarks_loaded_outside_the_universe():
+	params = SimulationRequest(
+		start_date="2019-03-01", end_date="2019-03-10", starting_value=1000,
+		extra_benchmarks=["QQQ", "SPY", "QQQ", EQUAL_WEIGHT]
+	)
+	strategy = _Idle(params)
+	engine = SimulationEngine(strategy, params)
+	frames = {"AAA": _frame(5), "SPY": _frame(6)}
+	requested = []
+
+	async def preload(*args, **kwargs):
+		return frames
+
+	async def load_frames(tickers, start, end):
+		requested.append((list(tickers), start))
+		return {"QQQ": _frame(7)}
+
+	engine.data_fetcher.preload_price_data_async = preload
+	engine.data_fetcher.load_frames_async = load_frames
+	streamed = []
+
+	async def send(event_type, payload):
+		pass
+
+	async def send_daily(date, value, benchmark, extra):
+		streamed.append((benchmark, extra))
+
+	async def main():
+		await engine.initialize()
+		return await engine.run(send, send_daily)
+
+	result = asyncio.run(main())
+	assert requested == [(["QQQ"], "2019-02-22")]
+	assert "QQQ" not in strategy.price_data
+	assert len(streamed) == 10
+	assert streamed[0][0] == 1000 and streamed[0][1] == {"QQQ": 1000.0, EQUAL_WEIGHT: 1000.0}
+	assert result["final_benchmark_value"] == streamed[-1][0]
+	assert result["final_benchmarks"] == streamed[-1][1]
+	assert result["daily_benchmark_values"][3]["benchmarks"] == streamed[3][1]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pandas as pd
+
+import utils.data_fetcher as data_fetcher_module
+from utils.data_fetcher import DataFetcher
+
+
+class FakeTicker:
+	calls = []
+	flaky = set()
+	dead = set()
+
+	def __init__(self, ticker):
+		self.ticker = ticker
+
+	def history(self, start=None, end=None, **kwargs):
+		FakeTicker.calls.append(self.ticker)
+		if self.ticker in FakeTicker.dead:
+			return pd.DataFrame()
+		if self.ticker in FakeTicker.flaky:
+			FakeTicker.flaky.discard(self.ticker)
+			raise RuntimeError("rate limited")
+		index = pd.date_range(start, periods=3, freq="B", tz="America/New_York", name="Date")
+		return pd.DataFrame({"Adj Close": [1.0, 2.0, 3.0], "Close": [1.0, 2.0, 3.0]}, index=index)
+
+
+def _patch(monkeypatch, flaky=(), dead=()):
+	FakeTicker.calls = []
+	FakeTicker.flaky = set(flaky)
+	FakeTicker.dead = set(dead)
+	monkeypatch.setattr(data_fetcher_module.yf, "Ticker", FakeTicker)
+	monkeypatch.setattr(data_fetcher_module, "DOWNLOAD_CHUNK_SIZE", 4)
+	monkeypatch.setattr(data_fetcher_module, "RETRY_BACKOFF_SEC", 0)
+
+
+def test_async_download_reports_progress_and_retries_failures(monkeypatch):
+	_patch(monkeypatch, flaky={"T03"}, dead={"DEAD"})
+	tickers = [f"T{i:02d}" for i in range(10)] + ["DEAD"]
+	updates = []
+
+	async def progress(loaded, total):
+		updates.append((loaded, total))
+
+	result = asyncio.run(DataFetcher().download_price_data_batch_async(tickers, "2020-01-01", "2020-02-01", progress=progress))
+
+	assert set(result) == set(tickers) - {"DEAD"}
+	assert list(result["T00"].columns) == ["date", "adj_close"]
+	assert result["T00"]["date"].dt.tz is None
+	# One update per chunk plus one per retry round, ending with everything that could load
+	assert len(updates) >= 3
+	assert updates[-1] == (10, 11)
+	# The dead ticker is retried DOWNLOAD_RETRIES times, never more
+	assert FakeTicker.calls.count("DEAD") == 1 + data_fetcher_module.DOWNLOAD_RETRIES
+
+
+def test_tickers_with_no_data_are_cached_and_skipped(monkeypatch):
+	_patch(monkeypatch, dead={"DEAD"})
+	fetcher = DataFetcher()
+	asyncio.run(fetcher.download_price_data_batch_async(["T00", "DEAD"], "2008-01-01", "2012-12-31"))
+	first_run_calls = FakeTicker.calls.count("DEAD")
+
+	# A narrower range inside the cached one is answered without touching Yahoo
+	FakeTicker.calls = []
+	result = asyncio.run(fetcher.download_price_data_batch_async(["T00", "DEAD"], "2009-01-01", "2010-01-01"))
+	assert "DEAD" not in FakeTicker.calls
+	assert set(result) == {"T00"}
+	assert first_run_calls == 1 + data_fetcher_module.DOWNLOAD_RETRIES
+
+	# A wider range is not covered and is downloaded again
+	asyncio.run(fetcher.download_price_data_batch_async(["DEAD"], "2007-01-01", "2012-12-31"))
+	assert "DEAD" in FakeTicker.calls
+
+
+def test_download_errors_are_not_negatively_cached(monkeypatch):
+	_patch(monkeypatch)
+	monkeypatch.setattr(data_fetcher_module, "DOWNLOAD_RETRIES", 0)
+	FakeTicker.flaky = {"T05"}
+	fetcher = DataFetcher()
+	assert "T05" not in asyncio.run(fetcher.download_price_data_batch_async(["T05"], "2020-01-01", "2020-02-01"))
+	assert "T05" in asyncio.run(fetcher.download_price_data_batch_async(["T05"], "2020-01-01", "2020-02-01"))
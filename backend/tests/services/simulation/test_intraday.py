@@ -0,0 +1,146 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.schema import SimulationRequest
+from services.simulation_engine import SimulationEngine
+from strategies.leveraged_etf_strategy import LeveragedETFSwingStrategy, rsi_series
+from utils.bar_store import BarStore
+from utils.rolling import EMA, RollingRSI, RollingWindow
+
+
+def _bars(seed, start="2024-01-02", days=45):
+	"""5-minute regular-session bars as a [timestamp, close] frame."""
+	rng = np.random.default_rng(seed)
+	sessions = pd.bdate_range(start, periods=days)
+	stamps = [s + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(minutes=5 * k) for s in sessions for k in range(78)]
+	closes = 50 * np.exp(np.cumsum(rng.normal(0.0001, 0.002, len(stamps))))
+	return pd.DataFrame({"timestamp": stamps, "close": closes})
+
+
+class MemoryBarStore(BarStore):
+	"""BarStore over in-memory frames, recording which ticker-months were read."""
+
+	def __init__(self, frames):
+		super().__init__("5m", root="unused")
+		self.frames = frames
+		self.reads = []
+
+	def read_chunk(self, ticker, year, month):
+		df = self.frames.get(ticker)
+		if df is None:
+			return None
+		self.reads.append((ticker, year, month))
+		ts = pd.to_datetime(df["timestamp"])
+		return df[(ts.dt.year == year) & (ts.dt.month == month)]
+
+
+def test_rolling_indicators_match_pandas():
+	prices = pd.Series(100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 200))))
+	ema, rsi, window = EMA(12), RollingRSI(14), RollingWindow(20)
+	expected_ema = prices.ewm(span=12).mean()
+	expected_rsi = rsi_series(prices)
+	expected_std = prices.rolling(20).std()
+	for k, price in enumerate(prices):
+		window.push(price)
+		assert np.isclose(ema.update(price), expected_ema.iloc[k])
+		value = rsi.update(price)
+		if k >= 14:
+			assert np.isclose(value, expected_rsi.loc[k])
+		if k >= 19:
+			assert np.isclose(window.std(), expected_std.iloc[k])
+	assert window.last(4) == prices.iloc[-5]
+
+
+def test_bar_store_round_trips_parquet_files(tmp_path):
+	store = BarStore("5m", root=str(tmp_path))
+	bars = _bars(1)
+	store.write_bars("AAA", bars)
+	assert sorted(p.name for p in (tmp_path / "5m" / "AAA").iterdir()) == ["2024-01.parquet", "2024-02.parquet", "2024-03.parquet"]
+	january = store.read_chunk("AAA", 2024, 1)
+	expected = bars[bars["timestamp"] < "2024-02-01"].reset_index(drop=True)
+	pd.testing.assert_frame_equal(january, expected, check_dtype=False)
+	assert store.read_chunk("AAA", 2023, 12) is None
+	chunks = list(store.stream(["AAA"], "2024-01-02", "2024-03-04"))
+	assert sum(len(c) for c in chunks) == len(bars)
+
+
+def test_stream_yields_month_chunks_sorted_by_time():
+	store = MemoryBarStore({"AAA": _bars(1), "BBB": _bars(2)})
+	chunks = list(store.stream(["BBB", "AAA"], "2024-01-10", "2024-02-15"))
+	assert len(chunks) == 2
+	for chunk in chunks:
+		assert np.all(np.diff(chunk.timestamps.astype(np.int64)) >= 0)
+		assert chunk.tickers == ["AAA", "BBB"]
+	assert pd.Timestamp(chunks[0].timestamps[0]) == pd.Timestamp("2024-01-10 09:30")
+	assert pd.Timestamp(chunks[-1].timestamps[-1]) == pd.Timestamp("2024-02-15 15:55")
+	start, stop = chunks[0].groups()[0]
+	assert stop - start == 2
+
+
+def test_intraday_run_samples_nav_and_closes_out():
+	frames = {t: _bars(seed) for seed, t in enumerate(["SPY", "TQQQ", "SPXL", "QLD", "SSO"])}
+	store = MemoryBarStore(frames)
+	params = SimulationRequest(
+		strategy="leveraged_etf", start_date="2024-01-02", end_date="2024-03-04",
+		starting_value=10000, bar_interval="5m", nav_sample_minutes=60
+	)
+	strategy = LeveragedETFSwingStrategy(params)
+	engine = SimulationEngine(strategy, params)
+	navs = []
+
+	async def send(event_type, payload):
+		pass
+
+	async def send_nav(ts_str, value, benchmark):
+		navs.append((ts_str, value, benchmark))
+
+	result = asyncio.run(engine.run_intraday(send, send_nav, store=store))
+
+	assert result["bars_processed"] == 5 * 78 * 45
+	# Hourly samples: 09:30 and then the first bar of each following hour, 7 per session
+	assert [ts for ts, _, _ in navs[:8]] == [
+		"2024-01-02 09:30", "2024-01-02 10:00", "2024-01-02 11:00", "2024-01-02 12:00",
+		"2024-01-02 13:00", "2024-01-02 14:00", "2024-01-02 15:00", "2024-01-03 09:30"
+	]
+	assert navs[0][1] == navs[0][2] == 10000
+	assert len(result["all_trades"]) > 0
+	assert strategy.portfolio.holdings == {}
+	assert result["final_value"] == strategy.portfolio.cash
+	assert result["daily_values"][-1]["date"] == "2024-03-04 15:55"
+	# One month of bars per ticker is read at a time, each exactly once
+	assert len(store.reads) == len(set(store.reads)) == 5 * 3
+
+
+def test_ingest_writes_window_by_window_and_merges_reruns(tmp_path):
+	store = BarStore("5m", root=str(tmp_path))
+	today = pd.Timestamp.now().normalize()
+	start, end = (today - pd.Timedelta(days=40)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+	calls = []
+
+	def fetch(ticker, interval, window_start, window_end):
+		calls.append((window_start, window_end))
+		bars = _bars(len(calls), start=window_start, days=30)
+		return bars[bars["timestamp"] < pd.Timestamp(window_end)]
+
+	written = store.ingest(["AAA"], start, end, fetch=fetch)
+	middle = (today - pd.Timedelta(days=10)).strftime("%Y-%m-%d")
+	assert calls == [(start, middle), (middle, (today + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))]
+	assert written["AAA"] == sum(len(c) for c in store.stream(["AAA"], start, end)) > 0
+
+	# A second run over the same range replaces bars instead of duplicating them
+	store.ingest(["AAA"], start, end, fetch=fetch)
+	assert sum(len(c) for c in store.stream(["AAA"], start, end)) == written["AAA"]
+
+
+def test_bar_store_rejects_unknown_intervals_and_path_like_tickers(tmp_path):
+	with pytest.raises(ValueError):
+		BarStore("../..", root=str(tmp_path))
+	store = BarStore("1h", root=str(tmp_path))
+	with pytest.raises(ValueError):
+		store.write_bars("../X", _bars(0, days=1))
+	with pytest.raises(ValueError):
+		store.ingest(["AAA", ".."], "2024-01-01", "2024-01-02", fetch=lambda *a: None)
+	assert list(tmp_path.iterdir()) == []
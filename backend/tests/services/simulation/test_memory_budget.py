@@ -0,0 +1,42 @@
+import pytest
+
+from services.memory_budget import MemoryBudgetExceeded, MemoryTracker, sample_universe
+
+TICKERS = [f"T{i:03d}" for i in range(500)]
+
+
+def test_small_request_fits_without_degrading():
+	plan = MemoryTracker(budget_mb=512).plan(20, "2020-01-01", "2021-01-01", 13)
+	assert plan.degraded == []
+	assert plan.retain_daily_values is True
+	assert plan.universe_fraction is None
+
+
+def test_oversized_request_drops_retained_series_then_samples_universe():
+	tracker = MemoryTracker(budget_mb=64)
+	plan = tracker.plan(505, "2015-01-01", "2024-12-31", 13, can_sample_universe=True)
+	assert plan.retain_daily_values is False
+	assert 0 < plan.universe_fraction < 1
+	assert plan.estimated_bytes <= tracker.budget_bytes
+	assert tracker.report()["degraded"][0] == "daily_values_not_retained"
+
+
+def test_request_that_cannot_be_sampled_is_refused():
+	with pytest.raises(MemoryBudgetExceeded):
+		MemoryTracker(budget_mb=1).plan(505, "2015-01-01", "2024-12-31", 13, can_sample_universe=False)
+
+
+def test_request_budget_cannot_exceed_process_budget(monkeypatch):
+	monkeypatch.setattr("services.memory_budget.MEMORY_BUDGET_MB", 100)
+	assert MemoryTracker(budget_mb=10_000).budget_bytes == 100 * 1024 * 1024
+
+
+def test_sample_universe_is_stable_across_membership_changes():
+	first = sample_universe(TICKERS[:450], 0.3)
+	second = sample_universe(TICKERS[50:], 0.3)
+	# Names present in both snapshots get the same decision
+	overlap = set(TICKERS[50:450])
+	assert first & overlap == second & overlap
+	assert 90 < len(sample_universe(TICKERS, 0.3)) < 210
+	assert "T001" in sample_universe(TICKERS, 0.0, always_keep={"T001"})
+	assert sample_universe(TICKERS, None) == set(TICKERS)
@@ -0,0 +1,69 @@
+import asyncio
+
+from services import metrics
+from services.metrics import MetricsRegistry, PhaseTimer, timed
+
+
+def test_phase_timer_summary_reports_totals_counts_and_percentiles():
+	timer = PhaseTimer()
+	for seconds in [0.001, 0.002, 0.003, 0.004]:
+		timer.record("valuation", seconds)
+	timer.incr("negative_cache_skips", 3)
+
+	summary = timer.summary()
+	valuation = summary["phases"]["valuation"]
+	assert valuation["count"] == 4
+	assert valuation["total_sec"] == 0.01
+	assert valuation["p50_ms"] == 2.5
+	assert valuation["max_ms"] == 4.0
+	assert summary["counters"] == {"negative_cache_skips": 3}
+
+
+def test_timed_records_on_active_run_and_registry():
+	registry = metrics.get_registry()
+	registry.reset()
+	timer = PhaseTimer()
+	token = metrics.activate(timer)
+	try:
+		with timed("rebalance"):
+			pass
+		with timed("rebalance"):
+			pass
+	finally:
+		metrics.deactivate(token)
+
+	# Outside the run only the registry sees it
+	with timed("rebalance"):
+		pass
+
+	assert len(timer.samples["rebalance"]) == 2
+	assert registry.snapshot()["phases"]["rebalance"]["count"] == 3
+
+
+def test_active_timer_is_isolated_per_task():
+	async def run_one(name):
+		timer = PhaseTimer()
+		token = metrics.activate(timer)
+		try:
+			await asyncio.sleep(0)
+			with timed(name):
+				await asyncio.sleep(0)
+		finally:
+			metrics.deactivate(token)
+		return timer
+
+	async def main():
+		return await asyncio.gather(run_one("a"), run_one("b"))
+
+	first, second = asyncio.run(main())
+	assert list(first.samples) == ["a"]
+	assert list(second.samples) == ["b"]
+
+
+def test_registry_reservoir_is_bounded_but_totals_exact():
+	registry = MetricsRegistry(reservoir_size=4)
+	for _ in range(10):
+		registry.observe("send", 0.5)
+	phase = registry.snapshot()["phases"]["send"]
+	assert phase["count"] == 10
+	assert phase["total_sec"] == 5.0
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+import utils.negative_cache as negative_cache
+from utils.negative_cache import NegativeCache
+
+
+def test_entries_persist_and_cover_contained_ranges(tmp_path):
+	path = str(tmp_path / "cache.json")
+	NegativeCache(path=path).record({"LEH": "no_data"}, "2008-01-01", "2012-12-31")
+
+	reloaded = NegativeCache(path=path)
+	assert reloaded.lookup("LEH", "2009-06-01", "2010-06-01")["reason"] == "no_data"
+	assert reloaded.lookup("LEH", "2007-01-01", "2010-06-01") is None
+	assert reloaded.partition(["LEH", "AAPL"], "2008-01-01", "2012-12-31") == (["AAPL"], {"LEH": "no_data"})
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+	cache = NegativeCache(path=str(tmp_path / "cache.json"), ttl_days=30)
+	cache.record({"LEH": "no_data"}, "2008-01-01", "2012-12-31")
+	later = datetime.now(timezone.utc) + timedelta(days=31)
+	monkeypatch.setattr(negative_cache, "_now", lambda: later)
+	assert cache.lookup("LEH", "2008-01-01", "2012-12-31") is None
+	assert cache.stats()["live_entries"] == 0
+
+
+def test_wider_entry_replaces_the_ranges_it_contains(tmp_path):
+	cache = NegativeCache(path=str(tmp_path / "cache.json"))
+	cache.record({"LEH": "no_data"}, "2009-01-01", "2010-01-01")
+	cache.record({"LEH": "no_data"}, "2008-01-01", "2012-12-31")
+	assert cache.stats() == {"tickers": 1, "live_entries": 1}
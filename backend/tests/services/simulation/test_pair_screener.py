@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from models.schema import SimulationRequest
+from strategies.cointegration_strategy import CointegrationStrategy
+from utils.pair_screener import PairScreener, correlation_candidates, engle_granger, EG_CRITICAL_5PCT
+
+
+def _universe(seed=0, periods=300, walkers=12):
+	"""Independent random walks plus BBB, which is AAA plus a stationary spread."""
+	rng = np.random.default_rng(seed)
+	index = pd.bdate_range("2020-01-01", periods=periods, name="date")
+	logs = {f"W{k:02d}": np.cumsum(rng.normal(0, 0.02, periods)) for k in range(walkers)}
+	base = np.cumsum(rng.normal(0, 0.02, periods))
+	logs["AAA"] = base
+	logs["BBB"] = 0.1 + 1.2 * base + rng.normal(0, 0.01, periods)
+	return {t: pd.DataFrame({"adj_close": 50 * np.exp(v)}, index=index) for t, v in logs.items()}, index
+
+
+def test_engle_granger_separates_stationary_and_random_walk_spreads():
+	rng = np.random.default_rng(1)
+	x = np.cumsum(rng.normal(0, 1, 500))
+	stationary = 2.0 * x + rng.normal(0, 1, 500)
+	walk = np.cumsum(rng.normal(0, 1, 500))
+	t_stat, beta, half_life = engle_granger(np.column_stack([x, x]), np.column_stack([stationary, walk]))
+	assert t_stat[0] < EG_CRITICAL_5PCT < t_stat[1]
+	assert abs(beta[0] - 2.0) < 0.05
+	assert half_life[0] < 5
+
+
+def test_correlation_candidates_respect_groups():
+	rng = np.random.default_rng(2)
+	base = np.cumsum(rng.normal(0, 1, 200))
+	logp = np.column_stack([base, base + rng.normal(0, 0.1, 200), base + rng.normal(0, 0.1, 200)])
+	assert {tuple(p) for p in correlation_candidates(logp, min_correlation=0.5)} == {(0, 1), (0, 2), (1, 2)}
+	grouped = correlation_candidates(logp, ["a", "b", "a"], min_correlation=0.5)
+	assert [tuple(p) for p in grouped] == [(0, 2)]
+	assert len(correlation_candidates(logp, [None, None, None], min_correlation=0.5)) == 0
+
+
+def test_screen_finds_the_cointegrated_pair_and_caches_by_window():
+	price_data, index = _universe()
+	screener = PairScreener(min_correlation=0.0, workers=2)
+	ranked = screener.screen(price_data, index[0], index[-1])
+	assert ranked[0]["pair"] == ("AAA", "BBB")
+	assert abs(ranked[0]["hedge_ratio"] - 1.2) < 0.05
+
+	calls = []
+	original = screener._screen
+	screener._screen = lambda *args: calls.append(args) or original(*args)
+	assert screener.screen(dict(reversed(list(price_data.items()))), index[0], index[-1]) == ranked
+	assert calls == []
+	screener.screen(price_data, index[10], index[-1])
+	assert len(calls) == 1
+
+
+def test_cointegration_strategy_trades_screened_pairs(monkeypatch):
+	price_data, index = _universe()
+	spy = price_data["W00"].copy()
+	monkeypatch.setattr("strategies.cointegration_strategy.pair_screener", PairScreener(min_correlation=0.0))
+	monkeypatch.setattr("strategies.cointegration_strategy.load_sector_map", lambda tickers: {})
+
+	params = SimulationRequest(strategy="cointegration", start_date=str(index[-1].date()), lookback_months=12, screen_pairs=True)
+	strategy = CointegrationStrategy(params)
+	strategy.price_data = {**price_data, "SPY": spy}
+	strategy.prepare(params.start_date)
+
+	assert strategy.pairs[0] == ("AAA", "BBB")
+	traded = {t for pair in strategy.pairs for t in pair}
+	assert set(strategy.price_data) == traded | {"SPY"}
+	assert len(traded) == 2 * len(strategy.pairs)
+
+
+def test_static_pairs_no_longer_reference_antm():
+	strategy = CointegrationStrategy(SimulationRequest(strategy="cointegration"))
+	assert "ANTM" not in strategy.universe("2024-01-01")
+	assert ("UNH", "ELV") in strategy.pairs
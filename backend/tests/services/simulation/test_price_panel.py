@@ -0,0 +1,143 @@
+"""Tolerance tests for compact (float32, shared-index) price data.
+
+float32 keeps ~7 significant digits, so individual prices may differ from float64 by
+up to ~6e-8 relative. These tests pin down that the strategy *decisions* built on top
+(momentum rankings, SMA crossover signals, cointegration z-scores and the resulting
+portfolio valuation) are unchanged on a realistic seeded universe.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.schema import SimulationRequest
+from strategies.cointegration_strategy import CointegrationStrategy
+from strategies.momentum_strategy import MomentumStrategy
+from strategies.sma_crossover_strategy import SMACrossoverStrategy
+from utils.indicator_cache import IndicatorCache
+from utils.data_fetcher import DataFetcher
+from utils.price_panel import PricePanel
+
+PRICE_RTOL = 1e-6
+SCORE_RTOL = 1e-4
+
+
+def _universe(n_tickers=60, start="2018-01-01", end="2021-12-31", seed=7):
+	rng = np.random.default_rng(seed)
+	index = pd.bdate_range(start, end, name="date")
+	frames = {}
+	for i in range(n_tickers):
+		drift = rng.normal(0.0003, 0.0004)
+		returns = rng.normal(drift, 0.02, len(index))
+		prices = 50 * np.exp(np.cumsum(returns))
+		df = pd.DataFrame({"adj_close": prices}, index=index)
+		# Late listings and gaps exercise the NaN mask
+		if i % 10 == 3:
+			df = df.iloc[200:]
+		if i % 7 == 0:
+			df.iloc[100:105] = np.nan
+		frames[f"T{i:02d}"] = df
+	frames["SPY"] = pd.DataFrame({"adj_close": 300 * np.exp(np.cumsum(rng.normal(0.0004, 0.01, len(index))))}, index=index)
+	return frames
+
+
+def test_panel_shares_one_index_and_stores_float32():
+	frames = _universe()
+	panel = PricePanel.from_frames(frames)
+	compact = panel.to_frames()
+
+	assert panel.days.dtype == np.int32
+	assert panel.prices.dtype == np.float32
+	assert len({id(df.index) for df in compact.values()}) == 1
+	assert all(df["adj_close"].dtype == np.float32 for df in compact.values())
+	# Late-listed ticker is NaN before its first bar
+	assert panel.mask[:200, panel.columns["T03"]].all()
+	assert panel.nbytes < sum(int(df.memory_usage(index=True).sum()) for df in frames.values()) / 2
+
+
+def test_asof_matches_pandas_semantics_including_gaps():
+	frames = _universe()
+	panel = PricePanel.from_frames(frames)
+	for ticker in ["T00", "T03", "T07", "SPY"]:
+		for date in ["2018-01-01", "2018-05-30", "2018-06-02", "2019-07-04", "2021-12-31", "2025-01-01"]:
+			expected = frames[ticker]["adj_close"].asof(pd.Timestamp(date))
+			actual = panel.asof(ticker, date)
+			if pd.isna(expected):
+				assert np.isnan(actual)
+			else:
+				assert actual == pytest.approx(expected, rel=PRICE_RTOL)
+	assert np.isnan(panel.asof("T00", "2017-12-29"))
+	assert np.isnan(panel.asof("MISSING", "2020-01-01"))
+
+
+def test_compact_round_trip_price_error_within_float32_tolerance():
+	frames = _universe()
+	compact = DataFetcher.to_compact(frames)
+	for ticker, df in frames.items():
+		original = df["adj_close"].dropna()
+		packed = compact[ticker]["adj_close"].reindex(original.index).astype(float)
+		np.testing.assert_allclose(packed.to_numpy(), original.to_numpy(), rtol=PRICE_RTOL)
+
+
+def test_momentum_rankings_unchanged():
+	params = SimulationRequest(start_date="2019-06-01", end_date="2021-12-31", top_n=10)
+	frames = _universe()
+	full, compact = MomentumStrategy(params), MomentumStrategy(params)
+	full.price_data = frames
+	compact.price_data = DataFetcher.to_compact(frames)
+
+	for date in pd.date_range("2019-06-01", "2021-12-01", freq="QS"):
+		expected = full.get_top_momentum_stocks(date)
+		actual = compact.get_top_momentum_stocks(date)
+		assert [t for t, _ in actual] == [t for t, _ in expected]
+		np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=SCORE_RTOL)
+
+
+def _crossovers(series):
+	prices = series.ffill().dropna().astype(float)
+	diff = prices.rolling(50).mean() - prices.rolling(200).mean()
+	prev, curr = diff.shift(1), diff
+	buy = (prev < 0) & (curr >= 0)
+	sell = (prev > 0) & (curr <= 0)
+	return buy, sell
+
+
+def test_sma_crossover_signals_unchanged():
+	params = SimulationRequest(start_date="2019-06-01", end_date="2021-12-31", strategy="sma_crossover")
+	frames = _universe()
+	compact_frames = DataFetcher.to_compact(frames)
+
+	# check_signals is causal, so comparing crossover events on the full series covers every date
+	events = []
+	for ticker in frames:
+		buy, sell = _crossovers(frames[ticker]["adj_close"])
+		buy_c, sell_c = _crossovers(compact_frames[ticker]["adj_close"])
+		pd.testing.assert_series_equal(buy, buy_c.reindex(buy.index, fill_value=False), check_names=False)
+		pd.testing.assert_series_equal(sell, sell_c.reindex(sell.index, fill_value=False), check_names=False)
+		events += [(ticker, d, "buy") for d in buy[buy].index] + [(ticker, d, "sell") for d in sell[sell].index]
+	assert events
+
+	# Spot-check the strategy method itself on the event dates
+	full, compact = SMACrossoverStrategy(params), SMACrossoverStrategy(params)
+	full.price_data, compact.price_data = frames, compact_frames
+	full.indicators = IndicatorCache(frames, full.indicators_spec())
+	compact.indicators = IndicatorCache(compact_frames, compact.indicators_spec())
+	for ticker, date, signal in events[::max(1, len(events) // 15)]:
+		date_str = date.strftime("%Y-%m-%d")
+		assert full.check_signals(ticker, date_str) == signal
+		assert compact.check_signals(ticker, date_str) == signal
+
+
+def test_cointegration_zscores_within_tolerance():
+	params = SimulationRequest(start_date="2019-06-01", end_date="2021-12-31", strategy="cointegration", lookback_months=6)
+	frames = _universe()
+	strategy = CointegrationStrategy(params)
+	compact = DataFetcher.to_compact(frames)
+	window = params.lookback_months * 21
+	for a, b in [("T01", "T02"), ("T05", "T06"), ("T11", "T12")]:
+		for date in pd.date_range("2019-06-01", "2021-12-01", freq="MS"):
+			x = frames[a][frames[a].index <= date]["adj_close"].dropna().iloc[-window:]
+			y = frames[b][frames[b].index <= date]["adj_close"].dropna().iloc[-window:]
+			xc = compact[a][compact[a].index <= date]["adj_close"].dropna().iloc[-window:]
+			yc = compact[b][compact[b].index <= date]["adj_close"].dropna().iloc[-window:]
+			expected = strategy.calculate_spread_zscore(x, y)
+			assert strategy.calculate_spread_zscore(xc, yc) == pytest.approx(expected, rel=SCORE_RTOL, abs=1e-4)
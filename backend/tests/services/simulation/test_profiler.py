@@ -0,0 +1,57 @@
+import threading
+import time
+
+from services.profiler import ProfileCapture, is_admin_token, load_profile
+
+
+def _busy(seconds):
+	end = time.perf_counter() + seconds
+	total = 0
+	while time.perf_counter() < end:
+		total += sum(range(200))
+	return total
+
+
+def test_admin_token_required_and_disabled_without_env(monkeypatch):
+	monkeypatch.delenv("SIMULATION_ADMIN_TOKEN", raising=False)
+	assert is_admin_token("anything") is False
+	monkeypatch.setenv("SIMULATION_ADMIN_TOKEN", "s3cret")
+	assert is_admin_token("s3cret") is True
+	assert is_admin_token("wrong") is False
+	assert is_admin_token(None) is False
+
+
+def test_profile_capture_stores_collapsed_stacks_and_allocations(tmp_path):
+	capture = ProfileCapture(label="unit", directory=str(tmp_path))
+	with capture:
+		_busy(0.1)
+		blobs = [bytearray(1024) for _ in range(200)]
+
+	assert capture.profile_id
+	meta, stacks = load_profile(capture.profile_id, directory=str(tmp_path))
+	assert meta["label"] == "unit"
+	assert meta["sample_count"] > 0
+	assert meta["top_allocations"]
+	assert "_busy" in stacks
+	# Every line is "<frames> <count>"
+	assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks.splitlines())
+	assert len(blobs) == 200
+
+
+def test_load_profile_rejects_path_like_ids(tmp_path):
+	assert load_profile("../../etc/passwd", directory=str(tmp_path)) is None
+	assert load_profile("0" * 32, directory=str(tmp_path)) is None
+
+
+def test_profile_capture_samples_worker_threads(tmp_path):
+	capture = ProfileCapture(label="workers", directory=str(tmp_path))
+	with capture:
+		worker = threading.Thread(target=_busy, args=(0.1,), name="sim-worker")
+		worker.start()
+		worker.join()
+
+	_, stacks = load_profile(capture.profile_id, directory=str(tmp_path))
+	worker_stacks = [line for line in stacks.splitlines() if line.startswith("thread:sim-worker;")]
+	assert any("_busy" in line for line in worker_stacks)
+	assert any(line.startswith("thread:MainThread;") for line in stacks.splitlines())
+	assert "simulation-profiler" not in stacks
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.schema import SimulationRequest
+from services import robustness
+from services.robustness import RobustnessRun, block_bootstrap_indices
+from strategies.base_strategy import BaseStrategy, PathScoringStrategy
+from strategies.momentum_strategy import MomentumStrategy
+from strategies.sma_crossover_strategy import SMACrossoverStrategy
+
+
+def _strategy(n_tickers=8, periods=520, top_n=3):
+	rng = np.random.default_rng(0)
+	index = pd.bdate_range("2019-01-01", periods=periods, name="date")
+	price_data = {
+		f"T{k}": pd.DataFrame({"adj_close": 50 * np.exp(np.cumsum(rng.normal(0.0003 * k, 0.015, periods)))}, index=index)
+		for k in range(n_tickers)
+	}
+	price_data["SPY"] = pd.DataFrame({"adj_close": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))}, index=index)
+	params = SimulationRequest(
+		start_date=str(index[300].date()), end_date=str(index[-1].date()),
+		lookback_months=6, skip_recent_months=1, top_n=top_n, starting_value=1000
+	)
+	strategy = MomentumStrategy(params)
+	strategy.price_data = price_data
+	return strategy, params
+
+
+def _reference_nav(run, prices):
+	"""Single-path loop version of RobustnessRun._nav built on calculate_momentum_score."""
+	params = run.params
+	lookback, skip = params.lookback_months * 21, params.skip_recent_months * 21
+	value, out = float(params.starting_value), []
+	stops = run.rebalance_rows[1:] + [len(run.dates)]
+	for row, stop in zip(run.rebalance_rows, stops):
+		end = max(row - skip, 1)
+		window = prices[max(0, end - lookback):end + 1]
+		scores = [(run.strategy.calculate_momentum_score(pd.Series(window[:, j].astype(float))), j) for j in range(window.shape[1])]
+		top = [j for s, j in sorted((x for x in scores if x[0] is not None), reverse=True)[:params.top_n]]
+		for r in range(row, stop):
+			out.append(value * np.mean(prices[r, top] / prices[row, top]))
+		value = out[-1]
+	return np.array(out)
+
+
+def test_block_bootstrap_indices_are_contiguous_blocks():
+	rows = block_bootstrap_indices(np.random.default_rng(1), 4, 50, 100, 10)
+	assert rows.shape == (4, 50)
+	assert rows.min() >= 0 and rows.max() < 100
+	assert np.all(np.diff(rows.reshape(4, 5, 10), axis=2) == 1)
+
+
+def test_path_scores_match_calculate_momentum_score():
+	strategy, _ = _strategy()
+	window = np.random.default_rng(2).lognormal(0, 0.1, size=(3, 60, 4)).cumprod(axis=1)
+	scores = strategy.path_scores(window)
+	for p in range(3):
+		for j in range(4):
+			assert np.isclose(scores[p, j], strategy.calculate_momentum_score(pd.Series(window[p, :, j])))
+
+
+def test_path_scoring_is_an_abstract_mixin():
+	assert issubclass(MomentumStrategy, PathScoringStrategy)
+	assert not issubclass(SMACrossoverStrategy, PathScoringStrategy)
+
+	class Unfinished(BaseStrategy, PathScoringStrategy):
+		pass
+
+	with pytest.raises(TypeError):
+		Unfinished(SimulationRequest())
+
+
+def test_vectorized_paths_match_a_per_path_loop():
+	strategy, params = _strategy()
+	run = RobustnessRun(strategy, params, n_paths=3, seed=7)
+	rows = block_bootstrap_indices(run.rng, 3, len(run.returns), len(run.returns), 21)
+	prices = run._path_prices(rows)
+	navs = run._nav(prices)
+	assert navs.shape == (3, len(run.sim_dates))
+	for p in range(3):
+		assert np.allclose(navs[p], _reference_nav(run, prices[p]), rtol=1e-4)
+	assert np.allclose(run.observed(), _reference_nav(run, run._path_prices(np.arange(len(run.returns))[None, :])[0]), rtol=1e-4)
+
+
+def test_chunks_respect_the_memory_budget_and_summary_has_bands(monkeypatch):
+	strategy, params = _strategy()
+	monkeypatch.setattr(robustness, "ROBUSTNESS_CHUNK_MB", 1)
+	run = RobustnessRun(strategy, params, n_paths=50, seed=3)
+	sizes = run.chunk_sizes()
+	assert sum(sizes) == 50 and len(sizes) > 1
+	assert max(sizes) * len(run.dates) * len(run.tickers) * robustness.BYTES_PER_CELL <= 1024 * 1024
+
+	navs = np.concatenate([run.run_chunk(n) for n in sizes])
+	summary = run.summary(navs)
+	bands = summary["nav_bands"]
+	assert len(bands["p50"]) == len(summary["dates"]) == len(summary["observed_nav"])
+	assert all(lo <= hi for lo, hi in zip(bands["p5"], bands["p95"]))
+	assert summary["distribution"]["max_drawdown_pct"]["p50"] <= 0
+	assert run.benchmark.iloc[0] == params.starting_value
@@ -0,0 +1,187 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.schema import SimulationRequest
+from services.simulation_engine import SimulationEngine
+from strategies import available_strategies
+from strategies.base_strategy import BaseStrategy, every_n_days
+from strategies.leveraged_etf_strategy import rsi_series
+from utils.indicator_cache import IndicatorCache
+from utils.price_utils import PriceUtils
+from utils.trading_calendar import TradingCalendar
+
+
+def _frame(seed, start="2019-01-01", periods=400):
+	rng = np.random.default_rng(seed)
+	index = pd.bdate_range(start, periods=periods, name="date")
+	prices = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, periods)))
+	return pd.DataFrame({"adj_close": prices}, index=index)
+
+
+def test_builtin_strategies_are_registered():
+	assert {"momentum", "sma_crossover", "cointegration", "leveraged_etf"} <= set(available_strategies())
+
+
+def test_indicator_cache_matches_recomputing_on_truncated_history():
+	df = _frame(1)
+	df.iloc[50:53, 0] = np.nan
+	specs = {
+		"sma50": lambda p: p.ffill().dropna().rolling(window=50).mean(),
+		"rsi": lambda p: rsi_series(p.dropna()),
+	}
+	cache = IndicatorCache({"AAA": df}, specs)
+	for date in [df.index[60], df.index[200], df.index[-1] + pd.Timedelta(days=2)]:
+		truncated = df[df.index <= date]["adj_close"]
+		for name, spec in specs.items():
+			expected = spec(truncated)
+			assert cache.value(name, "AAA", date) == expected.iloc[-1]
+			assert cache.value(name, "AAA", date, offset=1) == expected.iloc[-2]
+			assert cache.count(name, "AAA", date) == len(expected)
+
+
+def test_indicator_cache_recomputes_when_a_frame_is_replaced():
+	price_data = {"AAA": _frame(1)}
+	cache = IndicatorCache(price_data, {"last": lambda p: p})
+	date = price_data["AAA"].index[-1]
+	before = cache.value("last", "AAA", date)
+	price_data["AAA"] = _frame(2)
+	assert cache.value("last", "AAA", date) == price_data["AAA"]["adj_close"].iloc[-1] != before
+
+
+def test_trading_calendar_lookups():
+	calendar = TradingCalendar(pd.bdate_range("2020-01-01", "2020-01-31"))
+	assert calendar.is_session("2020-01-03")
+	assert not calendar.is_session("2020-01-04")  # Saturday
+	assert calendar.session_asof("2020-01-05") == pd.Timestamp("2020-01-03")
+	assert calendar.row_asof("2019-12-31") == -1
+
+
+class BuyAndHoldWeekly(BaseStrategy):
+	rebalance_due = every_n_days(7)
+
+	def __init__(self, params):
+		super().__init__(params)
+		self.rebalances = []
+		self.bars = 0
+
+	def universe(self, date_str):
+		return {"AAA"}
+
+	def history_months(self):
+		return 1
+
+	def on_rebalance(self, date, date_str):
+		self.rebalances.append(date_str)
+		if not self.portfolio.holdings:
+			self.portfolio.open_long_position("AAA", self.portfolio.cash, date_str)
+
+	def on_bar(self, date, date_str):
+		self.bars += 1
+
+
+def test_engine_drives_strategy_hooks_and_closes_out():
+	params = SimulationRequest(start_date="2019-03-01", end_date="2019-03-31", starting_value=1000)
+	strategy = BuyAndHoldWeekly(params)
+	engine = SimulationEngine(strategy, params)
+	frames = {"AAA": _frame(3), "SPY": _frame(4)}
+
+	async def preload(*args, **kwargs):
+		return frames
+
+	engine.data_fetcher.preload_price_data_async = preload
+	sent = []
+
+	async def send(event_type, payload):
+		sent.append((event_type, payload))
+
+	async def send_daily(date, value, benchmark, extra):
+		pass
+
+	async def main():
+		await engine.initialize()
+		return await engine.run(send, send_daily)
+
+	result = asyncio.run(main())
+	assert strategy.rebalances == ["2019-03-01", "2019-03-08", "2019-03-15", "2019-03-22", "2019-03-29"]
+	assert strategy.bars == 31
+	assert len(result["daily_values"]) == 31
+	assert sent[0] == ("status", "Starting Simulation...")
+	assert ("status", "Rebalancing on 2019-03-08") in sent
+	# Everything is sold on the last day
+	assert strategy.portfolio.holdings == {} and len(result["final_orders"]) == 1
+	assert result["final_value"] == strategy.portfolio.cash
+
+
+def test_dynamic_universe_loads_joiners_without_blocking_the_loop(monkeypatch):
+	class Joiner(BuyAndHoldWeekly):
+		dynamic_universe = True
+
+		def universe(self, date_str):
+			return {"AAA", "BBB"} if date_str >= "2019-03-08" else {"AAA"}
+
+	params = SimulationRequest(start_date="2019-03-01", end_date="2019-03-15", starting_value=1000)
+	strategy = Joiner(params)
+	engine = SimulationEngine(strategy, params)
+	loads = []
+
+	async def preload(*args, **kwargs):
+		return {"AAA": _frame(3), "SPY": _frame(4)}
+
+	async def load_frames(tickers, start, end, compact=False):
+		loads.append(sorted(tickers))
+		await asyncio.sleep(0)
+		return {t: _frame(5) for t in tickers}
+
+	engine.data_fetcher.preload_price_data_async = preload
+	monkeypatch.setattr(PriceUtils._data_fetcher, "load_frames_async", load_frames)
+
+	async def noop(*args):
+		pass
+
+	async def main():
+		await engine.initialize()
+		ticks = 0
+
+		async def heartbeat():
+			nonlocal ticks
+			while True:
+				ticks += 1
+				await asyncio.sleep(0)
+
+		task = asyncio.create_task(heartbeat())
+		try:
+			await engine.run(noop, noop)
+		finally:
+			task.cancel()
+		return ticks
+
+	ticks = asyncio.run(main())
+	assert loads == [["BBB"]]
+	assert "BBB" in strategy.price_data and strategy.current_tickers == {"AAA", "BBB"}
+	# The loop kept running other tasks while the rebalance downloaded
+	assert ticks > 0
+
+
+def test_prepare_runs_off_the_event_loop_thread():
+	class Preparing(BuyAndHoldWeekly):
+		def prepare(self, date_str):
+			self.prepared_on = threading.get_ident()
+
+	params = SimulationRequest(start_date="2019-03-01", end_date="2019-03-08", starting_value=1000)
+	strategy = Preparing(params)
+	engine = SimulationEngine(strategy, params)
+
+	async def preload(*args, **kwargs):
+		return {"AAA": _frame(3), "SPY": _frame(4)}
+
+	engine.data_fetcher.preload_price_data_async = preload
+
+	async def main():
+		await engine.initialize()
+		return threading.get_ident()
+
+	loop_thread = asyncio.run(main())
+	assert strategy.prepared_on != loop_thread
@@ -0,0 +1,199 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import services.simulation_jobs as simulation_jobs
+from models.schema import SimulationRequest
+from services.simulation_jobs import create_job, get_job, stream_job
+
+
+class FakeWebSocket:
+	def __init__(self):
+		self.frames = []
+		self.closed = False
+		self.gone = asyncio.Event()
+
+	async def send_text(self, text):
+		if self.gone.is_set():
+			raise RuntimeError("socket closed")
+		self.frames.append(json.loads(text))
+
+	async def receive_text(self):
+		await self.gone.wait()
+		raise RuntimeError("disconnected")
+
+	async def close(self):
+		self.closed = True
+
+	def drop(self):
+		self.gone.set()
+
+	def dates(self):
+		dates = []
+		for frame in self.frames:
+			if frame["type"] == "resume":
+				dates.extend(p["date"] for p in frame["payload"]["daily_values"])
+			elif frame["type"] == "daily":
+				dates.append(frame["payload"]["date"])
+		return dates
+
+
+def _fake_run(days, step):
+	async def run(channel):
+		await channel.send_text(json.dumps({"type": "status", "payload": "Starting Simulation..."}))
+		for i in range(days):
+			await (step.wait() if i == days // 2 else asyncio.sleep(0))
+			await channel.send_text(json.dumps({"type": "daily", "payload": {"date": f"d{i:03d}", "portfolio_value": i, "benchmark_value": i}}))
+		await channel.send_text(json.dumps({"type": "done", "payload": {"final_portfolio_value": days}}))
+	return run
+
+
+def test_reconnecting_client_gets_series_so_far_and_live_tail():
+	async def main():
+		job = create_job(SimulationRequest())
+		halfway = asyncio.Event()
+		job.start(_fake_run(40, halfway))
+
+		first = FakeWebSocket()
+		first_stream = asyncio.create_task(stream_job(job, first))
+		await asyncio.sleep(0.01)
+		first.drop()
+		await first_stream
+		assert job.status == "running"
+
+		second = FakeWebSocket()
+		second_stream = asyncio.create_task(stream_job(get_job(job.job_id), second, resume=True))
+		await asyncio.sleep(0)
+		halfway.set()
+		await second_stream
+		return second
+
+	second = asyncio.run(main())
+	assert second.frames[0]["type"] == "resume"
+	assert second.dates() == [f"d{i:03d}" for i in range(40)]
+	assert second.frames[-1]["type"] == "done"
+	assert second.closed
+
+
+def test_resume_after_finish_replays_result():
+	async def main():
+		job = create_job(SimulationRequest())
+		done = asyncio.Event()
+		done.set()
+		await job.start(_fake_run(5, done))
+		late = FakeWebSocket()
+		await stream_job(job, late, resume=True)
+		return late
+
+	late = asyncio.run(main())
+	assert [f["type"] for f in late.frames] == ["resume", "done"]
+	assert late.dates() == [f"d{i:03d}" for i in range(5)]
+
+
+def test_job_without_clients_is_cancelled_after_idle_timeout(monkeypatch):
+	monkeypatch.setattr(simulation_jobs, "JOB_IDLE_TIMEOUT_SEC", -1)
+
+	async def main():
+		job = create_job(SimulationRequest())
+		never = asyncio.Event()
+		never.set()
+		job.detach(None)  # the starting client went away before any frame
+		await job.start(_fake_run(50, never))
+		return job
+
+	job = asyncio.run(main())
+	assert job.status == "cancelled"
+	assert len(job.daily_values) < 50
+
+
+class SlowWebSocket(FakeWebSocket):
+	async def send_text(self, text):
+		await asyncio.sleep(0.002)
+		await super().send_text(text)
+
+
+def _run_with_status(days):
+	async def run(channel):
+		for i in range(days):
+			if i % 50 == 0:
+				await channel.send_text(json.dumps({"type": "status", "payload": f"Rebalancing on d{i:03d}"}))
+			await channel.send_text(json.dumps({"type": "daily", "payload": {"date": f"d{i:03d}", "portfolio_value": i, "benchmark_value": i}}))
+		await channel.send_text(json.dumps({"type": "done", "payload": {"final_portfolio_value": days}}))
+	return run
+
+
+def test_slow_client_gets_coalesced_daily_frames_but_every_event(monkeypatch):
+	monkeypatch.setattr(simulation_jobs, "SEND_QUEUE_SIZE", 16)
+
+	async def main():
+		job = create_job(SimulationRequest())
+		slow = SlowWebSocket()
+		stream = asyncio.create_task(stream_job(job, slow))
+		await asyncio.sleep(0)
+		await job.start(_run_with_status(500))
+		# The compute side finished without waiting on the client
+		assert len(slow.frames) < 100
+		await stream
+		return slow
+
+	slow = asyncio.run(main())
+	dates = slow.dates()
+	assert len(dates) < 500
+	assert dates == sorted(dates) and dates[-1] == "d499"
+	statuses = [f["payload"] for f in slow.frames if f["type"] == "status"]
+	assert statuses == [f"Rebalancing on d{i:03d}" for i in range(0, 500, 50)]
+	assert slow.frames[-1]["type"] == "done"
+	assert slow.closed
+
+
+def test_fast_client_gets_every_daily_frame():
+	async def main():
+		job = create_job(SimulationRequest())
+		fast = FakeWebSocket()
+		stream = asyncio.create_task(stream_job(job, fast))
+		await asyncio.sleep(0)
+		await job.start(_run_with_status(500))
+		await stream
+		return fast
+
+	assert asyncio.run(main()).dates() == [f"d{i:03d}" for i in range(500)]
+
+
+def test_job_respects_the_memory_plan_and_reuses_frames(monkeypatch):
+	def loads(text):
+		raise AssertionError("published frame was parsed back")
+
+	monkeypatch.setattr(simulation_jobs, "json", SimpleNamespace(dumps=json.dumps, loads=loads))
+
+	async def run(channel):
+		for i in range(10):
+			if i == 4:
+				channel.job.stop_retaining_daily_values()
+			await channel.send_frame({"type": "daily", "payload": {"date": f"d{i:03d}", "portfolio_value": i, "benchmark_value": i}})
+		await channel.send_frame({"type": "done", "payload": {}})
+
+	async def main():
+		job = create_job(SimulationRequest())
+		fast = FakeWebSocket()
+		stream = asyncio.create_task(stream_job(job, fast))
+		await asyncio.sleep(0)
+		await job.start(run)
+		await stream
+		return job, fast
+
+	job, fast = asyncio.run(main())
+	# Clients still get every point; the job stops buffering once the plan says so
+	assert fast.dates() == [f"d{i:03d}" for i in range(10)]
+	assert job.daily_values == [] and not job.retain_daily_values
+	assert json.loads(job.resume_frame())["payload"]["daily_values_retained"] is False
+
+
+def test_checkpoint_summarizes_the_ledger_without_copying_it():
+	job = create_job(SimulationRequest())
+	history = {f"2020-01-{d:02d}": [{"ticker": "AAPL"}] for d in range(1, 21)}
+	portfolio = SimpleNamespace(cash=1000.004, holdings={"AAPL": 3}, open_trades={}, trades=[1, 2], trade_history_by_date=history)
+	job.save_checkpoint("2020-01-31", 21, portfolio)
+	assert job.checkpoint == {
+		"date": "2020-01-31", "days_completed": 21, "cash": 1000.0, "holdings": {"AAPL": 3},
+		"open_trades": {}, "trade_count": 2, "trade_days": 20,
+	}
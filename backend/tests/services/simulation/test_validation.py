@@ -0,0 +1,57 @@
+import pytest
+
+from models.schema import SimulationRequest
+from services.validation import validate_simulation_params
+
+
+@pytest.mark.parametrize("fields, message", [
+	({"robustness_paths": 0}, "Robustness paths"),
+	({"robustness_paths": 10 ** 9}, "Robustness paths"),
+	({"robustness_paths": 100, "bootstrap_block_days": 0}, "Bootstrap block days"),
+	({"robustness_paths": 100, "bootstrap_block_days": 10 ** 6}, "Bootstrap block days"),
+])
+def test_robustness_settings_are_bounded(fields, message):
+	ok, error = validate_simulation_params(SimulationRequest(**fields))
+	assert not ok and error.startswith(message)
+
+
+def test_defaults_and_a_robustness_request_are_valid():
+	assert validate_simulation_params(SimulationRequest()) == (True, "")
+	assert validate_simulation_params(SimulationRequest(robustness_paths=500, bootstrap_block_days=63)) == (True, "")
+
+
+@pytest.mark.parametrize("fields, message", [
+	({"walk_forward_folds": -1}, "Walk-forward folds"),
+	({"walk_forward_folds": 0}, "Walk-forward folds"),
+	({"walk_forward_folds": 5, "walk_forward_train_months": 0}, "Walk-forward train months"),
+	({"walk_forward_folds": 5, "walk_forward_grid": {"lookback_months": [3, 24]}}, "Walk-forward lookback_months"),
+	({"walk_forward_folds": 5, "walk_forward_grid": {"top_n": [0, 5]}}, "Walk-forward top_n"),
+	({"walk_forward_folds": 5, "walk_forward_grid": {"hold_months": [1]}}, "Unsupported walk-forward parameters"),
+])
+def test_walk_forward_settings_are_bounded(fields, message):
+	ok, error = validate_simulation_params(SimulationRequest(**fields))
+	assert not ok and error.startswith(message)
+
+
+def test_a_walk_forward_request_is_valid():
+	params = SimulationRequest(walk_forward_folds=5, walk_forward_grid={"lookback_months": [3, 6, 12], "skip_recent_months": [0, 1]})
+	assert validate_simulation_params(params) == (True, "")
+
+
+@pytest.mark.parametrize("fields, message", [
+	({"bar_interval": "../../etc"}, "Bar interval"),
+	({"bar_interval": "2m"}, "Bar interval"),
+	({"bar_interval": "5m", "nav_sample_minutes": 0}, "NAV sample minutes"),
+	({"bar_interval": "5m", "nav_sample_minutes": -5}, "NAV sample minutes"),
+	({"benchmark": "../SPY"}, "Benchmark"),
+	({"benchmark": ".."}, "Benchmark"),
+	({"extra_benchmarks": ["QQQ", "IWM", "DIA", "EFA"]}, "At most 3 extra benchmarks"),
+	({"extra_benchmarks": ["QQQ", "../X"]}, "Extra benchmarks"),
+])
+def test_intraday_settings_and_path_components_are_checked(fields, message):
+	ok, error = validate_simulation_params(SimulationRequest(**fields))
+	assert not ok and error.startswith(message)
+
+
+def test_extra_benchmarks_within_the_cap_are_valid():
+	assert validate_simulation_params(SimulationRequest(extra_benchmarks=["QQQ", "BRK.B", "equal_weight"])) == (True, "")
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.schema import SimulationRequest
+from services import walk_forward
+from services.walk_forward import WalkForward, expand_grid, sharpe
+from strategies.momentum_strategy import MomentumStrategy
+
+
+def _study(folds=4, grid=None):
+	rng = np.random.default_rng(0)
+	index = pd.bdate_range("2018-01-01", periods=900, name="date")
+	price_data = {
+		f"T{k}": pd.DataFrame({"adj_close": 50 * np.exp(np.cumsum(rng.normal(0.0002 * k, 0.015, len(index))))}, index=index)
+		for k in range(10)
+	}
+	price_data["SPY"] = pd.DataFrame({"adj_close": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))}, index=index)
+	params = SimulationRequest(start_date=str(index[300].date()), end_date=str(index[-1].date()), top_n=3, starting_value=1000)
+	strategy = MomentumStrategy(params)
+	strategy.price_data = price_data
+	grid = grid or {"lookback_months": [3, 6, 9], "skip_recent_months": [0, 1]}
+	return WalkForward(strategy, params, grid, folds=folds, train_months=6), params
+
+
+def test_expand_grid_defaults_and_limits(monkeypatch):
+	params = SimulationRequest(top_n=7)
+	combos = expand_grid({"lookback_months": [6, 3]}, params)
+	assert combos == [
+		{"lookback_months": 3, "skip_recent_months": 1, "top_n": 7},
+		{"lookback_months": 6, "skip_recent_months": 1, "top_n": 7},
+	]
+	with pytest.raises(ValueError):
+		expand_grid({"hold_months": [1]}, params)
+	assert WalkForward.preload_params(params, {"lookback_months": [3, 12], "skip_recent_months": [0, 2]}).lookback_months == 12
+	monkeypatch.setattr(walk_forward, "MAX_COMBINATIONS", 3)
+	with pytest.raises(ValueError):
+		expand_grid({"lookback_months": [1, 2], "top_n": [1, 2]}, params)
+
+
+def test_each_combination_is_evaluated_once_across_folds(monkeypatch):
+	study, _ = _study()
+	calls = []
+	original = walk_forward.rule_nav
+	monkeypatch.setattr(walk_forward, "rule_nav", lambda *args: calls.append(args) or original(*args))
+	study.precompute()
+	results = [study.run_fold(k) for k in range(len(study.folds))]
+	assert len(calls) == len(study.combos) == 6
+	# The winner has the best in-sample Sharpe of the grid on its train slice
+	for (train_start, test_start, _), result in zip(study.folds, results):
+		best = max(sharpe(study._combo_returns(c)[train_start:test_start]) for c in study.combos)
+		assert result["in_sample_sharpe"] == round(best, 3)
+	assert study.score_cache_hits >= len(study.folds)
+
+
+def test_folds_tile_the_window_and_stitch_from_starting_value():
+	study, params = _study()
+	sim_rows = len(study.dates) - study.start_row
+	assert study.folds[0][0] == 0 and study.folds[-1][2] == sim_rows
+	assert all(a[2] == b[1] for a, b in zip(study.folds, study.folds[1:]))
+
+	results = [study.run_fold(k) for k in range(len(study.folds))]
+	dates, nav = study.stitch(results)
+	assert len(dates) == len(nav) == sim_rows - study.folds[0][1]
+	assert nav[0] == params.starting_value
+	growth = np.prod([1 + r["out_of_sample_return_pct"] / 100 for r in results])
+	first_day = 1 + results[0]["returns"][0]
+	assert np.isclose(nav[-1], params.starting_value * growth / first_day, rtol=1e-3)
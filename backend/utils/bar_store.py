@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from dateutil.rrule import rrule, MONTHLY
+
+from services.price_cache import is_valid_ticker
+
+INTRADAY_STORE_DIR = os.getenv("INTRADAY_BAR_STORE_DIR", "data/intraday_bars")
+BAR_COLUMNS = ["timestamp", "close"]
+# Intervals the store accepts, with the longest range Yahoo serves per request and how far back it goes (days)
+BAR_INTERVALS = {"1m": (7, 30), "5m": (30, 60), "15m": (30, 60), "30m": (30, 60), "1h": (30, 730)}
+
+
+def fetch_bars(ticker, interval, start, end):
+    """Download one ticker's bars in [start, end) from Yahoo as a [timestamp, close] frame (exchange time)."""
+    hist = yf.Ticker(ticker).history(start=start, end=end, interval=interval, auto_adjust=True, actions=False)
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    df = hist[["Close"]].reset_index()
+    df.columns = BAR_COLUMNS
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if df["timestamp"].dt.tz is not None:
+        df["timestamp"] = df["timestamp"].dt.tz_localize(None)
+    return df
+
+
+class BarChunk:
+    """One month of bars for several tickers, sorted by (timestamp, ticker).
+
+    Columnar: `timestamps` (datetime64[ns]), `codes` (index into `tickers`) and `closes`
+    are parallel arrays, so a chunk costs ~20 bytes per bar and no per-ticker frames.
+    """
+
+    def __init__(self, tickers, timestamps, codes, closes):
+        self.tickers = tickers
+        self.timestamps = timestamps
+        self.codes = codes
+        self.closes = closes
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def groups(self):
+        """(start, stop) row ranges of bars sharing a timestamp."""
+        if not len(self):
+            return []
+        breaks = np.flatnonzero(self.timestamps[1:] != self.timestamps[:-1]) + 1
+        bounds = np.concatenate([[0], breaks, [len(self)]])
+        return list(zip(bounds[:-1], bounds[1:]))
+
+
+class BarStore:
+    """Local columnar store of intraday bars: {root}/{interval}/{ticker}/{YYYY-MM}.parquet.
+
+    Same month-per-file layout as the daily PriceCache. `stream()` reads one month at a
+    time with only the timestamp and close columns, so a backtest over years of 5-minute
+    bars holds one month of bars in memory regardless of the total length.
+    """
+
+    def __init__(self, interval="5m", root=None):
+        if interval not in BAR_INTERVALS:
+            raise ValueError(f"Unsupported bar interval: {interval!r}")
+        self.interval = interval
+        self.root = os.path.join(root or INTRADAY_STORE_DIR, interval)
+
+    def _ticker_dir(self, ticker):
+        if not is_valid_ticker(ticker):
+            raise ValueError(f"Invalid ticker: {ticker!r}")
+        return os.path.join(self.root, ticker)
+
+    def _chunk_path(self, ticker, year, month):
+        return os.path.join(self._ticker_dir(ticker), f"{year:04d}-{month:02d}.parquet")
+
+    def read_chunk(self, ticker, year, month):
+        """One ticker-month as a [timestamp, close] frame, or None if the store has no file for it."""
+        path = self._chunk_path(ticker, year, month)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path, columns=BAR_COLUMNS)
+
+    def write_bars(self, ticker, df):
+        """Save a frame with timestamp and close columns, merged into the ticker's monthly files.
+
+        Bars already stored for the same timestamps are replaced, so overlapping downloads
+        can be written again safely.
+        """
+        df = df[BAR_COLUMNS].copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+        for period, chunk in df.groupby(df["timestamp"].dt.to_period("M")):
+            existing = self.read_chunk(ticker, period.year, period.month)
+            if existing is not None and not existing.empty:
+                chunk = pd.concat([existing, chunk], ignore_index=True).drop_duplicates("timestamp", keep="last")
+            chunk.sort_values("timestamp").to_parquet(self._chunk_path(ticker, period.year, period.month), index=False)
+
+    def ingest(self, tickers, start, end, fetch=None):
+        """Download bars for `tickers` in [start, end] window by window and write each window as it arrives.
+
+        Windows are the longest range Yahoo serves per request for the interval, so only one
+        window of one ticker is in memory at a time; a start older than Yahoo keeps for the
+        interval is moved up. Returns { ticker: bars written }.
+        """
+        invalid = [t for t in tickers if not is_valid_ticker(t)]
+        if invalid:
+            raise ValueError(f"Invalid tickers: {invalid}")
+        fetch = fetch or fetch_bars
+        window_days, history_days = BAR_INTERVALS[self.interval]
+        earliest = pd.Timestamp.now().normalize() - pd.Timedelta(days=history_days - 1)
+        start = pd.Timestamp(start).normalize()
+        if start < earliest:
+            print(f"[WARN] Yahoo keeps {history_days} days of {self.interval} bars; starting at {earliest.date()}")
+            start = earliest
+        window = pd.Timedelta(days=window_days)
+        end_exclusive = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        written = {}
+        for ticker in tickers:
+            written[ticker] = 0
+            window_start = start
+            while window_start < end_exclusive:
+                window_end = min(window_start + window, end_exclusive)
+                df = fetch(ticker, self.interval, window_start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d"))
+                if not df.empty:
+                    self.write_bars(ticker, df)
+                    written[ticker] += len(df)
+                window_start = window_end
+        return written
+
+    def stream(self, tickers, start, end):
+        """Yield a BarChunk per month with the bars of `tickers` in [start, end] (end date inclusive)."""
+        tickers = sorted(set(tickers))
+        start = pd.Timestamp(start)
+        end_exclusive = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        for dt in rrule(MONTHLY, dtstart=start.normalize().replace(day=1), until=pd.Timestamp(end)):
+            timestamps, codes, closes = [], [], []
+            for code, ticker in enumerate(tickers):
+                df = self.read_chunk(ticker, dt.year, dt.month)
+                if df is None or df.empty:
+                    continue
+                ts = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]")
+                keep = (ts >= start.to_datetime64()) & (ts < end_exclusive.to_datetime64())
+                close = df["close"].to_numpy(dtype=np.float64)
+                keep &= ~np.isnan(close)
+                timestamps.append(ts[keep])
+                codes.append(np.full(int(keep.sum()), code, dtype=np.int32))
+                closes.append(close[keep])
+            if not timestamps:
+                continue
+            timestamps = np.concatenate(timestamps)
+            codes = np.concatenate(codes)
+            closes = np.concatenate(closes)
+            order = np.lexsort((codes, timestamps))
+            yield BarChunk(tickers, timestamps[order], codes[order], closes[order])
@@ -1,13 +1,27 @@
+import os
+import asyncio
 import pandas as pd
 import yfinance as yf
 from dateutil.relativedelta import relativedelta
 import ast
+from services.metrics import timed, incr
+from utils.price_panel import PricePanel
+from utils.negative_cache import get_negative_cache
+
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("PRICE_DOWNLOAD_CHUNK_SIZE", "25"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("PRICE_DOWNLOAD_CONCURRENCY", "8"))
+DOWNLOAD_RETRIES = 2
+RETRY_BACKOFF_SEC = 1.0
 
 class DataFetcher:
     def __init__(self):
         pass
 
     def get_sp500_tickers_as_of(self, target_date_str, csv_path="data/sp500_snapshot_history.csv"):
+        with timed("membership_lookup"):
+            return self._get_sp500_tickers_as_of(target_date_str, csv_path)
+
+    def _get_sp500_tickers_as_of(self, target_date_str, csv_path):
         df = pd.read_csv(csv_path)
         df["date"] = pd.to_datetime(df["date"])
         target_date = pd.to_datetime(target_date_str)
@@ -25,153 +39,168 @@ class DataFetcher:
         tickers = [t.strip().replace('.', '-') for t in tickers if t.strip()]
         return tickers
 
-    def download_price_data_batch(self, tickers, start_str, end_str):
-        print(f"\n📥 Downloading {len(tickers)} tickers from {start_str} to {end_str}...")
-        try:
-            data = yf.download(
-                tickers=tickers,
-                start=start_str,
-                end=end_str,
-                auto_adjust=False,
-                progress=False,
-                group_by='ticker',
-                threads=True
-            )
-        except Exception as e:
-            print(f"[ERROR] Batch download failed: {e}")
-            return {}
-
-        result = {}
-        failed = []
-
-        if isinstance(data.columns, pd.MultiIndex):
-            for ticker in tickers:
-                if (ticker, 'Adj Close') in data:
-                    df = data[ticker][['Adj Close']].copy().reset_index()
-                    df.columns = ['date', 'adj_close']
-                    df["date"] = pd.to_datetime(df["date"])
-                    result[ticker] = df
-                else:
-                    print(f"[WARN] No data returned for {ticker}")
-                    failed.append(ticker)
-        else:
-            if 'Adj Close' in data:
-                df = data[['Adj Close']].copy().reset_index()
-                df.columns = ['date', 'adj_close']
-                df["date"] = pd.to_datetime(df["date"])
-                result[tickers[0]] = df
-            else:
-                print(f"[WARN] No data returned for {tickers[0]}")
-                failed.append(tickers[0])
+    @staticmethod
+    def _chunks(tickers, size=None):
+        size = size or DOWNLOAD_CHUNK_SIZE
+        return [tickers[i:i + size] for i in range(0, len(tickers), size)]
 
-        truly_failed = []
+    def _fetch_ticker(self, ticker, start_str, end_str):
+        """Download one ticker's Adj Close as a ['date', 'adj_close'] frame, or a reason string if Yahoo has nothing.
 
+        Uses Ticker.history rather than yf.download: yf.download keeps its results in
+        module-level state that concurrent calls overwrite, so it cannot run in parallel.
+        """
+        hist = yf.Ticker(ticker).history(start=start_str, end=end_str, auto_adjust=False, actions=False)
+        if hist is None or hist.empty:
+            return "no_data"
+        if 'Adj Close' not in hist:
+            return "no_adj_close"
+        df = hist[['Adj Close']].copy().reset_index()
+        df.columns = ['date', 'adj_close']
+        df["date"] = pd.to_datetime(df["date"])
+        if df["date"].dt.tz is not None:
+            df["date"] = df["date"].dt.tz_localize(None)
+        return df
+
+    def _fetch_chunk(self, tickers, start_str, end_str):
+        """Download a chunk of tickers sequentially. Returns (result, failed) with failed = { ticker: reason }."""
+        result, failed = {}, {}
+        for ticker in tickers:
+            try:
+                df = self._fetch_ticker(ticker, start_str, end_str)
+            except Exception as e:
+                print(f"[ERROR] Download failed for {ticker}: {e}")
+                failed[ticker] = f"error: {type(e).__name__}"
+                continue
+            if isinstance(df, str):
+                failed[ticker] = df
+            else:
+                result[ticker] = df
+        return result, failed
+
+    def _skip_known_missing(self, tickers, start_str, end_str):
+        """Drop tickers the negative cache already knows have no data for this range."""
+        to_download, skipped = get_negative_cache().partition(tickers, start_str, end_str)
+        if skipped:
+            print(f"⏭️ Skipping {len(skipped)} tickers with no data cached for {start_str}..{end_str}: {sorted(skipped)}")
+            incr("negative_cache_hits", len(skipped))
+        return to_download
+
+    def _finish_download(self, result, failed, start_str, end_str):
+        incr("tickers_downloaded", len(result))
         if failed:
-            print(f"\n🔁 Retrying {len(failed)} failed tickers individually...")
-            for ticker in failed:
-                try:
-                    df = yf.download(
-                        tickers=ticker,
-                        start=start_str,
-                        end=end_str,
-                        auto_adjust=False,
-                        progress=False
-                    )
-                    if 'Adj Close' in df and not df.empty:
-                        df = df[['Adj Close']].copy().reset_index()
-                        df.columns = ['date', 'adj_close']
-                        df["date"] = pd.to_datetime(df["date"])
-                        result[ticker] = df
-                        print(f"✅ Recovered {ticker}")
-                    else:
-                        print(f"🚫 {ticker}: still missing data after retry")
-                        truly_failed.append(ticker)
-                except Exception as e:
-                    print(f"[ERROR] Retry failed for {ticker}: {e}")
-                    truly_failed.append(ticker)
-
-        if truly_failed:
-            print(f"\n❌ Final failed downloads ({len(truly_failed)}): {truly_failed}")
-
+            print(f"\n❌ Final failed downloads ({len(failed)}): {sorted(failed)}")
+            # Only cache definite "Yahoo has nothing" answers; exceptions are usually transient
+            get_negative_cache().record({t: r for t, r in failed.items() if not r.startswith("error")}, start_str, end_str)
+            incr("tickers_failed", len(failed))
         return result
 
-    def load_bulk_scoring_data(self, start_dt, end_dt, benchmark="SPY", tickers=None):
+    async def download_price_data_batch_async(self, tickers, start_str, end_str, progress=None):
+        """Download off the event loop: chunks run in worker threads with bounded concurrency.
+
+        `progress`, if given, is awaited as progress(loaded, total) after every chunk so the
+        caller can stream "loaded 340/503 tickers" updates. Failed tickers are retried one
+        per task, in parallel, with exponential backoff between rounds.
+        """
+        with timed("data_fetch"):
+            total = len(tickers)
+            tickers = self._skip_known_missing(list(tickers), start_str, end_str)
+            print(f"\n📥 Downloading {len(tickers)} tickers from {start_str} to {end_str} ({DOWNLOAD_CONCURRENCY} concurrent chunks)...")
+            semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+            result, failed = {}, {}
+
+            async def fetch(chunk):
+                async with semaphore:
+                    return await asyncio.to_thread(self._fetch_chunk, chunk, start_str, end_str)
+
+            pending = [asyncio.ensure_future(fetch(chunk)) for chunk in self._chunks(tickers)]
+            try:
+                for next_done in asyncio.as_completed(pending):
+                    chunk_result, chunk_failed = await next_done
+                    result.update(chunk_result)
+                    failed.update(chunk_failed)
+                    if progress is not None:
+                        await progress(len(result), total)
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                raise
+
+            for attempt in range(DOWNLOAD_RETRIES):
+                if not failed:
+                    break
+                print(f"\n🔁 Retrying {len(failed)} failed tickers (attempt {attempt + 1}/{DOWNLOAD_RETRIES})...")
+                await asyncio.sleep(RETRY_BACKOFF_SEC * (2 ** attempt))
+                retried = await asyncio.gather(*(fetch([t]) for t in failed))
+                failed = {}
+                for chunk_result, chunk_failed in retried:
+                    result.update(chunk_result)
+                    failed.update(chunk_failed)
+                if progress is not None:
+                    await progress(len(result), total)
+
+            return self._finish_download(result, failed, start_str, end_str)
+
+    def _scoring_tickers(self, tickers, benchmark):
         if tickers is None:
             raise ValueError("Must provide a list of tickers for loading historical price data.")
-
-        start_str = pd.to_datetime(start_dt).strftime("%Y-%m-%d")
-        end_str = pd.to_datetime(end_dt).strftime("%Y-%m-%d")
-
         tickers = list(set(t.replace('.', '-') for t in tickers))
         if benchmark not in tickers:
             tickers.append(benchmark)
         if "AAPL" not in tickers:
             tickers.append("AAPL")  # safety fallback
-
         print(f"✅ Preparing to download {len(tickers)} tickers (including benchmark: {benchmark})")
+        return tickers
 
-        return self.download_price_data_batch(tickers, start_str, end_str)
-
-    def preload_price_data(self, start_date_str, end_date_str, lookback_months, skip_recent_months, benchmark, tickers):
-        """
-        Loads price data for all tickers (and benchmark) in the range:
-        from (start_date - lookback_months - skip_recent_months) to end_date
-        """
-        start_dt = pd.to_datetime(start_date_str)
-        end_dt = pd.to_datetime(end_date_str)
-        lookback_start = start_dt - relativedelta(months=lookback_months + skip_recent_months)
-
-        raw_data = self.load_bulk_scoring_data(lookback_start, end_dt, benchmark=benchmark, tickers=tickers)
+    async def load_bulk_scoring_data_async(self, start_dt, end_dt, benchmark="SPY", tickers=None, progress=None):
+        tickers = self._scoring_tickers(tickers, benchmark)
+        start_str = pd.to_datetime(start_dt).strftime("%Y-%m-%d")
+        end_str = pd.to_datetime(end_dt).strftime("%Y-%m-%d")
+        return await self.download_price_data_batch_async(tickers, start_str, end_str, progress=progress)
 
-        # Convert each DataFrame into indexed form
+    @staticmethod
+    def _index_frames(raw_data, compact=False):
+        """Convert each ['date', 'adj_close'] frame into date-indexed form."""
         price_data = {}
         for ticker, df in raw_data.items():
             df = df.copy()
             df.set_index("date", inplace=True)
             df.sort_index(inplace=True)
             price_data[ticker] = df
-
-        print(f"✅ Finished downloading price data for {len(price_data)} tickers.\n")
+        if compact:
+            price_data = DataFetcher.to_compact(price_data)
         return price_data
 
-    def preload_price_data_cointegration(self, start_date_str, end_date_str, lookback_months, benchmark, tickers):
+    @staticmethod
+    def to_compact(price_data):
+        """Re-pack { ticker: DataFrame } as float32 frames sharing one date index (see PricePanel)."""
+        return PricePanel.from_frames(price_data).to_frames()
+
+    async def load_frames_async(self, tickers, start_date_str, end_date_str, compact=False):
+        """Date-indexed frames for exactly `tickers` over [start, end], without the scoring extras."""
+        raw_data = await self.download_price_data_batch_async(list(tickers), start_date_str, end_date_str)
+        return self._index_frames(raw_data, compact)
+
+    async def preload_price_data_async(self, start_date_str, end_date_str, lookback_months, skip_recent_months, benchmark, tickers, compact=False, progress=None):
         """
-        Loads price data for cointegration strategies without skip_recent_months parameter.
-        Data range: from (start_date - lookback_months) to end_date
+        Loads price data for all tickers (and benchmark) in the range:
+        from (start_date - lookback_months - skip_recent_months) to end_date
+        With compact=True prices are float32 over a single shared date index.
+        See download_price_data_batch_async for `progress`.
         """
         start_dt = pd.to_datetime(start_date_str)
         end_dt = pd.to_datetime(end_date_str)
-        lookback_start = start_dt - relativedelta(months=lookback_months)
-
-        raw_data = self.load_bulk_scoring_data(lookback_start, end_dt, benchmark=benchmark, tickers=tickers)
+        lookback_start = start_dt - relativedelta(months=lookback_months + skip_recent_months)
 
-        # Convert each DataFrame into indexed form
-        price_data = {}
-        for ticker, df in raw_data.items():
-            df = df.copy()
-            df.set_index("date", inplace=True)
-            df.sort_index(inplace=True)
-            price_data[ticker] = df
+        raw_data = await self.load_bulk_scoring_data_async(lookback_start, end_dt, benchmark=benchmark, tickers=tickers, progress=progress)
+        price_data = self._index_frames(raw_data, compact)
 
-        print(f"✅ Finished downloading price data for {len(price_data)} tickers (cointegration).\n")
+        print(f"✅ Finished downloading price data for {len(price_data)} tickers.\n")
         return price_data
 
-
 # Create a global instance for backward compatibility
 data_fetcher = DataFetcher()
 
 # Backward compatibility functions
 def get_sp500_tickers_as_of(target_date_str, csv_path="data/sp500_snapshot_history.csv"):
     return data_fetcher.get_sp500_tickers_as_of(target_date_str, csv_path)
-
-def download_price_data_batch(tickers, start_str, end_str):
-    return data_fetcher.download_price_data_batch(tickers, start_str, end_str)
-
-def load_bulk_scoring_data(start_dt, end_dt, benchmark="SPY", tickers=None):
-    return data_fetcher.load_bulk_scoring_data(start_dt, end_dt, benchmark, tickers)
-
-def preload_price_data(start_date_str, end_date_str, lookback_months, skip_recent_months, benchmark, tickers):
-    return data_fetcher.preload_price_data(start_date_str, end_date_str, lookback_months, skip_recent_months, benchmark, tickers)
-
-def preload_price_data_cointegration(start_date_str, end_date_str, lookback_months, benchmark, tickers):
-    return data_fetcher.preload_price_data_cointegration(start_date_str, end_date_str, lookback_months, benchmark, tickers)
@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of `threshold` points chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each of the threshold - 2 equal buckets in
+    between, the point forming the largest triangle with the previously kept point and
+    the next bucket's average, so peaks, troughs and the overall shape survive. Returns
+    every index when the series already has `threshold` points or fewer.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 1)])
+
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+
+class IndicatorCache:
+    """Full-history indicator series, computed once per ticker and read back by date.
+
+    Strategies declare indicators as functions of a ticker's adj_close Series. Each
+    function must be causal (its value at a row depends only on that row and earlier
+    ones), which holds for rolling windows, ewm, diff and pct_change. Then computing
+    it once over the whole history and reading the row for a date gives exactly what
+    recomputing it on the history truncated at that date would, without the per-day
+    filter and recompute.
+
+    Entries are keyed by the frame object, so a ticker whose frame is replaced by a
+    universe update is recomputed on next use.
+    """
+
+    def __init__(self, price_data, specs):
+        self.price_data = price_data
+        self.specs = dict(specs)
+        self._series = {}  # { (name, ticker): (frame, Series, index values) }
+
+    def update_price_data(self, price_data):
+        self.price_data = price_data
+
+    def series(self, name, ticker):
+        df = self.price_data.get(ticker)
+        if df is None:
+            return None
+        key = (name, ticker)
+        cached = self._series.get(key)
+        if cached is None or cached[0] is not df:
+            result = self.specs[name](df["adj_close"])
+            cached = (df, result, result.index.values)
+            self._series[key] = cached
+        return cached[1]
+
+    def _row(self, name, ticker, date):
+        series = self.series(name, ticker)
+        if series is None:
+            return None, -1
+        values = self._series[(name, ticker)][2]
+        row = int(np.searchsorted(values, np.datetime64(pd.Timestamp(date)), side="right")) - 1
+        return series, row
+
+    def count(self, name, ticker, date):
+        """Number of rows of the indicator on or before `date`."""
+        _, row = self._row(name, ticker, date)
+        return row + 1
+
+    def value(self, name, ticker, date, offset=0):
+        """Indicator value on the last row on or before `date`, `offset` rows earlier; None if out of range."""
+        series, row = self._row(name, ticker, date)
+        row -= offset
+        if series is None or row < 0:
+            return None
+        return series.iloc[row]
+
+    def window(self, name, ticker, date, length):
+        """The last `length` rows on or before `date`, like series[series.index <= date].tail(length)."""
+        series, row = self._row(name, ticker, date)
+        if series is None or row < 0:
+            return None
+        return series.iloc[max(0, row - length + 1):row + 1]
@@ -0,0 +1,173 @@
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:
+    ZoneInfo = None
+
+MARKET_TZ = ZoneInfo("America/New_York") if ZoneInfo else timezone.utc
+PRE_MARKET_OPEN = time(4, 0)
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+POST_MARKET_CLOSE = time(20, 0)
+EARLY_POST_MARKET_CLOSE = time(17, 0)
+# Quotes move in pre/post-market too; when tracked, those windows use the normal staleness window
+TRACK_EXTENDED_HOURS = os.getenv("PRICE_TRACK_EXTENDED_HOURS", "false").lower() == "true"
+# One-off closures the holiday rules cannot derive (national days of mourning)
+SPECIAL_CLOSURES = {date(2018, 12, 5), date(2025, 1, 9)}
+
+PRE, REGULAR, POST, CLOSED = "pre", "regular", "post", "closed"
+
+
+def _nth_weekday(year, month, weekday, n):
+    """The n-th `weekday` (0=Mon) of the month; n=-1 for the last."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=64)
+def nyse_holidays(year):
+    """Full-day NYSE closures in `year`."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),       # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),       # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),      # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),       # Labor Day
+        _nth_weekday(year, 11, 3, 4),      # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day on a Saturday is not observed on the prior Friday (NYSE rule 7.2)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))
+    holidays.update(d for d in SPECIAL_CLOSURES if d.year == year)
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=64)
+def nyse_early_closes(year):
+    """Days the regular session ends at 13:00: Jul 3, the day after Thanksgiving and Christmas Eve."""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 4:  # Mon-Thu; on a Friday the holiday itself is observed that day
+            days.add(day)
+    return frozenset(d for d in days if d not in nyse_holidays(year))
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+
+def session_times(day):
+    """(pre-market open, regular open, regular close, post-market close) as New York datetimes, or None."""
+    if not is_trading_day(day):
+        return None
+    early = day in nyse_early_closes(day.year)
+    at = lambda t: datetime.combine(day, t, MARKET_TZ)
+    return (
+        at(PRE_MARKET_OPEN), at(REGULAR_OPEN),
+        at(EARLY_CLOSE if early else REGULAR_CLOSE),
+        at(EARLY_POST_MARKET_CLOSE if early else POST_MARKET_CLOSE),
+    )
+
+
+def _local(now):
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now.astimezone(MARKET_TZ)
+
+
+def market_session(now=None):
+    """PRE, REGULAR, POST or CLOSED at `now` (default the current time)."""
+    local = _local(now)
+    times = session_times(local.date())
+    if times is None:
+        return CLOSED
+    pre_open, open_, close, post_close = times
+    if open_ <= local < close:
+        return REGULAR
+    if pre_open <= local < open_:
+        return PRE
+    if close <= local < post_close:
+        return POST
+    return CLOSED
+
+
+def next_session_start(now=None, extended=None):
+    """The next time prices can move after `now`: the regular open, or the pre-market open when extended hours are tracked."""
+    extended = TRACK_EXTENDED_HOURS if extended is None else extended
+    local = _local(now)
+    day = local.date()
+    for _ in range(15):
+        times = session_times(day)
+        if times is not None:
+            start = times[0] if extended else times[1]
+            if start > local:
+                return start.astimezone(timezone.utc)
+        day += timedelta(days=1)
+    return (local + timedelta(days=1)).astimezone(timezone.utc)
+
+
+def price_valid_until(as_of, stale_seconds, extended=None):
+    """When a price observed at `as_of` goes stale.
+
+    Inside a live session (the regular session, plus pre/post-market when extended
+    hours are tracked) a price is good for `stale_seconds`. A price observed while the
+    market is shut cannot change before the next session starts, so it stays valid
+    until then: a close fetched on Friday evening is served all weekend.
+    """
+    extended = TRACK_EXTENDED_HOURS if extended is None else extended
+    as_of = _local(as_of).astimezone(timezone.utc)
+    session = market_session(as_of)
+    if session == REGULAR or (extended and session in (PRE, POST)):
+        return as_of + timedelta(seconds=stale_seconds)
+    return max(as_of + timedelta(seconds=stale_seconds), next_session_start(as_of, extended))
+
+
+def is_price_fresh(as_of, stale_seconds, now=None):
+    """True if a price observed at `as_of` (datetime or ISO string) is still valid at `now`."""
+    if isinstance(as_of, str):
+        try:
+            as_of = datetime.fromisoformat(as_of.replace('Z', '+00:00'))
+        except ValueError:
+            return False
+    if not isinstance(as_of, datetime):
+        return False
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now < price_valid_until(as_of, stale_seconds)
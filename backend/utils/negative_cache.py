@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+NEGATIVE_CACHE_PATH = os.getenv("PRICE_NEGATIVE_CACHE_PATH", "data/price_negative_cache.json")
+NO_DATA_TTL_DAYS = int(os.getenv("PRICE_NEGATIVE_CACHE_TTL_DAYS", "30"))
+MAX_ENTRIES_PER_TICKER = 8
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class NegativeCache:
+    """Persisted record of (ticker, date range) pairs Yahoo returned no prices for.
+
+    Delisted S&P members come back empty on every request, and each one costs a full
+    download plus retries. An entry covers any request whose range falls inside the
+    cached range, so a miss over 2008-2013 also answers 2009-2010.
+
+    Only definite empty answers belong here, not transient errors. Entries expire after
+    `ttl_days` so a symbol that is re-listed or backfilled is picked up again.
+    The file is a plain JSON map of { ticker: [ {start, end, reason, cached_at}, ... ] }.
+    """
+
+    def __init__(self, path=None, ttl_days=None):
+        self.path = path or NEGATIVE_CACHE_PATH
+        self.ttl_days = NO_DATA_TTL_DAYS if ttl_days is None else ttl_days
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except Exception as e:
+            print(f"[ERROR] Ignoring unreadable negative cache {self.path}: {e}")
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _is_live(self, entry, now):
+        return datetime.fromisoformat(entry["cached_at"]) + timedelta(days=self.ttl_days) > now
+
+    def lookup(self, ticker, start_str, end_str):
+        """The live entry covering [start_str, end_str] for `ticker`, or None."""
+        with self._lock:
+            self._load()
+            now = _now()
+            for entry in self._entries.get(ticker, []):
+                if entry["start"] <= start_str and end_str <= entry["end"] and self._is_live(entry, now):
+                    return entry
+            return None
+
+    def partition(self, tickers, start_str, end_str):
+        """Split `tickers` into (to_download, skipped) where skipped maps ticker -> reason."""
+        to_download, skipped = [], {}
+        for ticker in tickers:
+            entry = self.lookup(ticker, start_str, end_str)
+            if entry is None:
+                to_download.append(ticker)
+            else:
+                skipped[ticker] = entry["reason"]
+        return to_download, skipped
+
+    def record(self, failures, start_str, end_str):
+        """Persist { ticker: reason } as unavailable over [start_str, end_str]."""
+        if not failures:
+            return
+        with self._lock:
+            self._load()
+            now = _now()
+            for ticker, reason in failures.items():
+                entries = [
+                    e for e in self._entries.get(ticker, [])
+                    if self._is_live(e, now) and not (start_str <= e["start"] and e["end"] <= end_str)
+                ]
+                entries.append({"start": start_str, "end": end_str, "reason": reason, "cached_at": now.isoformat()})
+                self._entries[ticker] = entries[-MAX_ENTRIES_PER_TICKER:]
+            try:
+                self._save()
+            except Exception as e:
+                print(f"[ERROR] Failed to persist negative cache: {e}")
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            now = _now()
+            live = [e for entries in self._entries.values() for e in entries if self._is_live(e, now)]
+            return {"tickers": len(self._entries), "live_entries": len(live)}
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+_cache = None
+
+
+def get_negative_cache() -> NegativeCache:
+    """Get the global negative cache instance"""
+    global _cache
+    if _cache is None:
+        _cache = NegativeCache()
+    return _cache
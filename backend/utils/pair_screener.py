@@ -0,0 +1,202 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.metrics import incr, timed
+from utils.price_panel import PricePanel
+
+MAX_CANDIDATES = int(os.getenv("PAIR_SCREEN_MAX_CANDIDATES", "400"))
+MIN_CORRELATION = float(os.getenv("PAIR_SCREEN_MIN_CORRELATION", "0.8"))
+SCREEN_WORKERS = int(os.getenv("PAIR_SCREEN_WORKERS", "4"))
+TEST_CHUNK_SIZE = 64
+MAX_MISSING_FRACTION = 0.05
+MIN_OBSERVATIONS = 60
+CACHE_SIZE = 32
+
+# MacKinnon (2010) 5% critical value for the Engle-Granger test with two variables and a constant
+EG_CRITICAL_5PCT = -3.34
+
+
+def log_price_matrix(price_data, start, end):
+    """(tickers, T x N float64 matrix of log adj_close) over [start, end].
+
+    Tickers missing more than MAX_MISSING_FRACTION of the window's sessions are dropped;
+    remaining gaps are forward- then back-filled so every column is complete.
+    """
+    panel = PricePanel.from_frames(price_data, dtype=np.float64)
+    if not len(panel):
+        return [], np.empty((0, 0))
+    rows = slice(panel.row_asof(pd.Timestamp(start) - pd.Timedelta(days=1)) + 1, panel.row_asof(end) + 1)
+    prices = pd.DataFrame(panel.prices[rows], columns=panel.tickers)
+    keep = (prices.isna().mean() <= MAX_MISSING_FRACTION) & (prices.min() > 0)
+    prices = prices.loc[:, keep].ffill().bfill()
+    return list(prices.columns), np.log(prices.to_numpy())
+
+
+def correlation_candidates(logp, groups=None, max_candidates=MAX_CANDIDATES, min_correlation=MIN_CORRELATION):
+    """Index pairs (i, j), i < j, of the most correlated columns, best first.
+
+    The whole correlation matrix is one np.corrcoef call. With `groups` (one label per
+    column) only columns sharing a label are paired; a None label pairs with nothing.
+    """
+    n = logp.shape[1]
+    if n < 2:
+        return np.empty((0, 2), dtype=int)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.corrcoef(logp, rowvar=False)
+    allowed = np.triu(np.ones((n, n), dtype=bool), k=1)
+    if groups is not None:
+        labels = np.array([g if g is not None else f"\0{k}" for k, g in enumerate(groups)], dtype=object)
+        allowed &= labels[:, None] == labels[None, :]
+    allowed &= np.nan_to_num(corr, nan=-1.0) >= min_correlation
+    i, j = np.nonzero(allowed)
+    order = np.argsort(-corr[i, j], kind="stable")[:max_candidates]
+    return np.column_stack([i[order], j[order]])
+
+
+def engle_granger(x, y):
+    """Vectorized Engle-Granger tests of y[:, k] on x[:, k] for every column k.
+
+    Step 1 regresses y = alpha + beta * x by OLS. Step 2 runs an ADF(1) regression on the
+    residuals, d_e[t] = gamma * e[t-1] + phi * d_e[t-1], and returns the t-statistic of
+    gamma; more negative means more strongly mean-reverting. Compare against
+    EG_CRITICAL_5PCT. Returns (t_stat, beta, half_life_days), each of length k.
+    """
+    xm = x - x.mean(axis=0)
+    ym = y - y.mean(axis=0)
+    beta = (xm * ym).sum(axis=0) / (xm * xm).sum(axis=0)
+    resid = ym - beta * xm
+
+    d = np.diff(resid, axis=0)
+    dep = d[1:]
+    lag_level = resid[1:-1]
+    lag_diff = d[:-1]
+    s11 = (lag_level * lag_level).sum(axis=0)
+    s12 = (lag_level * lag_diff).sum(axis=0)
+    s22 = (lag_diff * lag_diff).sum(axis=0)
+    b1 = (lag_level * dep).sum(axis=0)
+    b2 = (lag_diff * dep).sum(axis=0)
+    det = s11 * s22 - s12 * s12
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gamma = (s22 * b1 - s12 * b2) / det
+        phi = (s11 * b2 - s12 * b1) / det
+        err = dep - gamma * lag_level - phi * lag_diff
+        sigma2 = (err * err).sum(axis=0) / (dep.shape[0] - 2)
+        t_stat = gamma / np.sqrt(sigma2 * s22 / det)
+        half_life = np.where(gamma < 0, -np.log(2) / np.log1p(gamma), np.inf)
+    return t_stat, beta, half_life
+
+
+class PairScreener:
+    """Ranks cointegrated pairs in a universe over a price window.
+
+    Screening all ~125k pairs of the S&P 500 with per-pair statsmodels calls takes
+    minutes. Here the log-price correlation matrix for the whole universe is a single
+    BLAS call, only the `max_candidates` most correlated pairs (optionally within a
+    sector) get an Engle-Granger test, and those tests run as vectorized chunks on a
+    thread pool (numpy releases the GIL). Ranked results are cached per
+    (universe, window, grouping), so repeated runs over the same window are free.
+    """
+
+    def __init__(self, max_candidates=MAX_CANDIDATES, min_correlation=MIN_CORRELATION,
+                 workers=SCREEN_WORKERS, cache_size=CACHE_SIZE):
+        self.max_candidates = max_candidates
+        self.min_correlation = min_correlation
+        self.workers = workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, tickers, start, end, sectors):
+        digest = hashlib.sha1()
+        for t in sorted(tickers):
+            digest.update(f"{t}={sectors.get(t) if sectors else ''};".encode())
+        return (digest.hexdigest(), str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date()),
+                bool(sectors), self.max_candidates, self.min_correlation)
+
+    def _test_chunk(self, logp, chunk):
+        return engle_granger(logp[:, chunk[:, 0]], logp[:, chunk[:, 1]])
+
+    def _screen(self, price_data, start, end, sectors):
+        tickers, logp = log_price_matrix(price_data, start, end)
+        if len(tickers) < 2 or logp.shape[0] < MIN_OBSERVATIONS:
+            return []
+        groups = [sectors.get(t) for t in tickers] if sectors else None
+        with timed("pair_correlation"):
+            candidates = correlation_candidates(logp, groups, self.max_candidates, self.min_correlation)
+        if not len(candidates):
+            return []
+
+        chunks = [candidates[i:i + TEST_CHUNK_SIZE] for i in range(0, len(candidates), TEST_CHUNK_SIZE)]
+        with timed("pair_cointegration"):
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(chunks)))) as pool:
+                results = list(pool.map(lambda c: self._test_chunk(logp, c), chunks))
+        t_stat, beta, half_life = (np.concatenate(parts) for parts in zip(*results))
+        incr("pairs_tested", len(candidates))
+
+        ranked = []
+        for k in np.argsort(t_stat, kind="stable"):
+            if not np.isfinite(t_stat[k]) or t_stat[k] > EG_CRITICAL_5PCT:
+                break
+            i, j = candidates[k]
+            ranked.append({
+                "pair": (tickers[i], tickers[j]),
+                "t_stat": float(t_stat[k]),
+                "hedge_ratio": float(beta[k]),
+                "half_life": float(half_life[k]),
+                "sector": groups[i] if groups else None,
+            })
+        return ranked
+
+    def screen(self, price_data, start, end, sectors=None):
+        """Cointegrated pairs over [start, end], most significant first.
+
+        Each entry is { pair: (x, y), t_stat, hedge_ratio, half_life, sector }, where the
+        spread is log(y) - hedge_ratio * log(x). `sectors` maps ticker -> sector to only
+        pair names within a sector. Benchmarks or other non-candidates should be left
+        out of `price_data` by the caller.
+        """
+        key = self._key(price_data.keys(), start, end, sectors)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                incr("pair_screen_cache_hits")
+                return list(self._cache[key])
+        ranked = self._screen(price_data, start, end, sectors)
+        with self._lock:
+            self._cache[key] = ranked
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(ranked)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def load_sector_map(tickers):
+    """{ ticker: sector name } from the companies and sectors tables; {} if unavailable."""
+    try:
+        from supabase_services.client import SupabaseClient
+        client = SupabaseClient().client
+        sector_map = {}
+        tickers = list(tickers)
+        for i in range(0, len(tickers), 200):
+            resp = client.table('companies').select('ticker, sector_id').in_('ticker', tickers[i:i + 200]).execute()
+            sector_map.update({r['ticker']: r.get('sector_id') for r in (resp.data or []) if r.get('sector_id')})
+        if not sector_map:
+            return {}
+        resp = client.table('sectors').select('id, name').in_('id', list(set(sector_map.values()))).execute()
+        names = {r['id']: r.get('name') for r in (resp.data or [])}
+        return {t: names.get(sid, sid) for t, sid in sector_map.items()}
+    except Exception as e:
+        print(f"[WARN] Sector lookup unavailable, screening pairs across sectors: {e}")
+        return {}
+
+
+pair_screener = PairScreener()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def to_day_number(date):
+    """Days since 1970-01-01 for a date-like value, as used by PricePanel.days."""
+    return int((np.datetime64(pd.Timestamp(date).normalize().date(), "D") - EPOCH).astype(np.int64))
+
+
+class PricePanel:
+    """Compact, column-aligned adjusted-close prices for a whole universe.
+
+    All tickers share one int32 day-number index (days since 1970-01-01) and one
+    float32 matrix stored column-major, so each ticker's series is contiguous.
+    Missing bars are NaN and exposed through `mask`.
+
+    Precision: float32 keeps about 7 significant digits (relative error <= 6e-8),
+    i.e. under a hundredth of a cent for prices below $100k. Scores derived from
+    returns agree with float64 to about 1e-5 relative, which leaves rankings and
+    crossover signals unchanged; see tests/services/simulation/test_price_panel.py.
+    """
+
+    def __init__(self, days, tickers, prices):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.tickers = list(tickers)
+        self.prices = np.asfortranarray(prices, dtype=np.float32)
+        self.columns = {t: j for j, t in enumerate(self.tickers)}
+        self._index = None
+
+    @classmethod
+    def from_frames(cls, price_data, dtype=np.float32):
+        """Build a panel from { ticker: DataFrame indexed by date with an adj_close column }."""
+        frames = {t: df for t, df in price_data.items() if df is not None and not df.empty}
+        if not frames:
+            return cls(np.empty(0, dtype=np.int32), [], np.empty((0, 0), dtype=dtype))
+        index = frames[next(iter(frames))].index
+        for df in frames.values():
+            if not df.index.equals(index):
+                index = index.union(df.index)
+        index = pd.DatetimeIndex(index).normalize().unique().sort_values()
+
+        tickers = sorted(frames)
+        prices = np.full((len(index), len(tickers)), np.nan, dtype=dtype, order="F")
+        for j, t in enumerate(tickers):
+            series = frames[t]["adj_close"]
+            series = series[~series.index.duplicated(keep="last")]
+            prices[:, j] = series.reindex(index).to_numpy(dtype=dtype)
+        days = ((index.values.astype("datetime64[D]") - EPOCH).astype(np.int64)).astype(np.int32)
+        return cls(days, tickers, prices)
+
+    @property
+    def mask(self):
+        """Boolean matrix, True where a bar is missing."""
+        return np.isnan(self.prices)
+
+    @property
+    def index(self):
+        """The shared DatetimeIndex, built once and reused by every frame from to_frames()."""
+        if self._index is None:
+            self._index = pd.DatetimeIndex((EPOCH + self.days.astype("timedelta64[D]")).astype("datetime64[ns]"), name="date")
+        return self._index
+
+    @property
+    def nbytes(self):
+        return int(self.days.nbytes + self.prices.nbytes)
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def row_asof(self, date):
+        """Row of the last bar on or before `date`, or -1 if the date precedes the panel."""
+        return int(np.searchsorted(self.days, to_day_number(date), side="right")) - 1
+
+    def asof(self, ticker, date):
+        """Last non-missing price on or before `date` (same semantics as Series.asof), or NaN."""
+        j = self.columns.get(ticker)
+        if j is None:
+            return np.nan
+        row = self.row_asof(date)
+        col = self.prices[:, j]
+        while row >= 0 and np.isnan(col[row]):
+            row -= 1
+        return float(col[row]) if row >= 0 else np.nan
+
+    def series(self, ticker):
+        """Float32 Series for one ticker, a view over the panel's storage."""
+        return pd.Series(self.prices[:, self.columns[ticker]], index=self.index, name="adj_close", copy=False)
+
+    def to_frames(self):
+        """{ ticker: DataFrame } in the layout strategies expect, without duplicating the index.
+
+        Each frame's adj_close column is a view into the panel and every frame shares one
+        DatetimeIndex object, instead of one float64 column and one index copy per ticker.
+        """
+        index = self.index
+        return {
+            t: pd.DataFrame({"adj_close": self.prices[:, j]}, index=index, copy=False)
+            for j, t in enumerate(self.tickers)
+        }
@@ -13,7 +13,7 @@ class PriceUtils:
         price = df["adj_close"].asof(target)
         if pd.isna(price):
             raise ValueError(f"No available price for {ticker} as of {date_str}")
-        return price
+        return float(price)
 
     @staticmethod
     def get_benchmark_shares(price_data, benchmark, starting_value, start_date_str):
@@ -22,14 +22,14 @@ class PriceUtils:
             raise ValueError(f"No benchmark data for {benchmark}")
         start_ts = pd.to_datetime(start_date_str)
         price = df["adj_close"].asof(start_ts)
-        return starting_value / price
+        return starting_value / float(price)
 
     @staticmethod
-    def update_universe(current_tickers, loaded_dates, price_data, portfolio, date_str, end_date_str, lookback_months, skip_recent_months):
+    async def update_universe(current_tickers, loaded_dates, price_data, portfolio, date_str, end_date_str, lookback_months, skip_recent_months, new_tickers, compact=False):
         if date_str in loaded_dates:
             return current_tickers, loaded_dates, price_data
 
-        new = set(PriceUtils._data_fetcher.get_sp500_tickers_as_of(date_str))
+        new = set(new_tickers)
         removed = current_tickers - new
         added = new - current_tickers
 
@@ -47,14 +47,9 @@ class PriceUtils:
             lookback_start = pd.to_datetime(date_str) - pd.DateOffset(
                 months=lookback_months + skip_recent_months
             )
-            new_data = PriceUtils._data_fetcher.download_price_data_batch(
-                list(added), lookback_start.strftime("%Y-%m-%d"), end_date_str
-            )
-            for t, df in new_data.items():
-                df = df.copy()
-                df.set_index("date", inplace=True)
-                df.sort_index(inplace=True)
-                price_data[t] = df
+            price_data.update(await PriceUtils._data_fetcher.load_frames_async(
+                added, lookback_start.strftime("%Y-%m-%d"), end_date_str, compact=compact
+            ))
 
         current_tickers = new
         loaded_dates.add(date_str)
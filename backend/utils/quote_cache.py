@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from utils.market_calendar import price_valid_until
+
+QUOTE_CACHE_TTL_SECONDS = int(os.getenv("PRICE_STALE_SECONDS", "300"))
+QUOTE_CACHE_MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _timestamp(as_of):
+    """Epoch seconds for a datetime or Supabase ISO string; None if unparseable."""
+    try:
+        if isinstance(as_of, str):
+            as_of = datetime.fromisoformat(as_of.replace('Z', '+00:00'))
+        if isinstance(as_of, datetime):
+            if as_of.tzinfo is None:
+                as_of = as_of.replace(tzinfo=timezone.utc)
+            return as_of.timestamp()
+    except Exception:
+        pass
+    return None
+
+
+class QuoteCache:
+    """Process-local latest-price cache in front of the companies table.
+
+    Entries expire when the quote's own as-of time goes stale by the market calendar
+    (`ttl` seconds during a session, the next session's start otherwise), the same rule
+    the routes use to call a companies row fresh, so a cached quote is served exactly as
+    long as the database copy would have been. The cache is written through whenever a price
+    is refreshed or an order executes, and evicts least-recently-used symbols beyond
+    `max_entries`. Listeners added with add_listener(fn) get fn(quote) after every
+    accepted put, on the writing thread.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = QUOTE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = QUOTE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # { symbol: (expires_at, quote) }
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol):
+        """{ ticker, price, currency, as_of, source } while fresh, else None."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[symbol]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(symbol)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, symbol, price, currency='USD', as_of=None, source='yfinance'):
+        """Cache a quote observed at `as_of` (default now); quotes that are already stale are ignored."""
+        if price is None:
+            return
+        observed = _timestamp(as_of) if as_of is not None else time.time()
+        if observed is None:
+            return
+        expires_at = price_valid_until(datetime.fromtimestamp(observed, timezone.utc), self.ttl).timestamp()
+        if expires_at <= time.time():
+            return
+        quote = {
+            'ticker': symbol,
+            'price': float(price),
+            'currency': currency or 'USD',
+            'as_of': datetime.fromtimestamp(observed, timezone.utc).isoformat(),
+            'source': source,
+        }
+        with self._lock:
+            self._entries[symbol] = (expires_at, quote)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        for listener in self._listeners:
+            try:
+                listener(quote)
+            except Exception as e:
+                print(f"[WARN] Quote listener failed for {symbol}: {e}")
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def expires_at(self, symbol):
+        """Epoch seconds the cached quote for `symbol` expires at, or None; does not count as a read."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            return entry[0] if entry else None
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_cache = None
+
+
+def get_quote_cache() -> QuoteCache:
+    """Get the global quote cache instance"""
+    global _cache
+    if _cache is None:
+        _cache = QuoteCache()
+    return _cache
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+
+class RollingWindow:
+    """Fixed-size ring buffer of the last `size` values, for O(window) bar-by-bar state."""
+
+    def __init__(self, size):
+        self.size = size
+        self._values = np.full(size, np.nan)
+        self._next = 0
+        self.count = 0
+
+    def push(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.size
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def values(self):
+        """Buffered values, oldest first."""
+        if self.count < self.size:
+            return self._values[:self.count].copy()
+        return np.roll(self._values, -self._next)
+
+    def last(self, offset=0):
+        """The value `offset` pushes ago, or None if it has left the window."""
+        if offset >= len(self):
+            return None
+        return float(self._values[(self._next - 1 - offset) % self.size])
+
+    def mean(self):
+        return float(self.values().mean()) if len(self) else None
+
+    def std(self):
+        """Sample standard deviation (ddof=1), like Series.rolling().std()."""
+        return float(self.values().std(ddof=1)) if len(self) > 1 else None
+
+
+class EMA:
+    """Incremental equivalent of Series.ewm(span=span).mean() (adjust=True)."""
+
+    def __init__(self, span):
+        self.decay = 1 - 2 / (span + 1)
+        self._num = 0.0
+        self._den = 0.0
+        self.value = None
+
+    def update(self, x):
+        self._num = x + self.decay * self._num
+        self._den = 1 + self.decay * self._den
+        self.value = self._num / self._den
+        return self.value
+
+
+class RollingRSI:
+    """Incremental equivalent of rsi_series: simple moving averages of gains and losses."""
+
+    def __init__(self, window):
+        self.gains = RollingWindow(window)
+        self.losses = RollingWindow(window)
+        self._prev = None
+        self.value = None
+
+    def update(self, price):
+        if self._prev is not None:
+            delta = price - self._prev
+            self.gains.push(max(delta, 0.0))
+            self.losses.push(max(-delta, 0.0))
+            if self.gains.full:
+                gain, loss = self.gains.mean(), self.losses.mean()
+                self.value = 100 - 100 / (1 + gain / loss) if loss else (100.0 if gain else math.nan)
+        self._prev = price
+        return self.value
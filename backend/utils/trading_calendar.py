@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+
+class TradingCalendar:
+    """Sessions of a reference series (the benchmark), for O(log n) date -> row lookups.
+
+    The engine walks every calendar day, so that weekends and holidays still get a
+    valuation point. Strategies use the calendar to tell sessions from non-sessions and
+    to find "the last session on or before this day" without filtering frames.
+    """
+
+    def __init__(self, index):
+        index = pd.DatetimeIndex(index).normalize().unique().sort_values()
+        self.index = index
+        self._values = index.values
+
+    @classmethod
+    def from_frame(cls, df):
+        if df is None or df.empty:
+            return cls(pd.DatetimeIndex([]))
+        return cls(df.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def row_asof(self, date):
+        """Row of the last session on or before `date`, or -1 if `date` precedes the calendar."""
+        return int(np.searchsorted(self._values, np.datetime64(pd.Timestamp(date).normalize()), side="right")) - 1
+
+    def is_session(self, date):
+        row = self.row_asof(date)
+        return row >= 0 and self._values[row] == np.datetime64(pd.Timestamp(date).normalize())
+
+    def session_asof(self, date):
+        row = self.row_asof(date)
+        return self.index[row] if row >= 0 else None
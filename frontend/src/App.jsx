@@ -468,70 +468,104 @@ function App() {
 
     const baseUrl = import.meta.env.VITE_API_BASE_URL || 'localhost:8000';
     const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-    const socket = new WebSocket(`${protocol}://${baseUrl.replace(/^https?:\/\//, '')}/simulate/ws`);
-
-    socket.onopen = () => {
-      socket.send(JSON.stringify(form));
-    };
-
-    socket.onmessage = (event) => {
-      const msg = JSON.parse(event.data);
-
-      switch (msg.type) {
-        case 'status':
-          if (msg.payload.toLowerCase().includes('starting simulation')) {
-            setLoadingPhase('');
-          }
-          break;
-
-        case 'daily':
-          setCurrentSimDate(msg.payload.date);
-          setResult((prev) => {
-            if (!prev) return null;
-            return {
-              ...prev,
-              daily_values: [...(prev.daily_values || []), {
-                date: msg.payload.date,
-                portfolio_value: msg.payload.portfolio_value
-              }],
-              daily_benchmark_values: [...(prev.daily_benchmark_values || []), {
-                date: msg.payload.date,
-                benchmark_value: msg.payload.benchmark_value
-              }]
-            };
-          });
-          break;
-
-        case 'done':
-          setResult((prev) => ({
-            ...(prev || {}),
-            ...msg.payload
-          }));
-          setLoading(false);
-          setToast({ message: 'Simulation completed!', type: 'success' });
-          break;
-
-        case 'error':
-          setToast({ message: msg.payload || 'Something went wrong.', type: 'error' });
-          setLoading(false);
-          setResult(null);
-          break;
-
-        default:
-          // Unknown message type - ignore
-          break;
-      }
-    };
-
-    socket.onerror = (err) => {
-      console.error('[WebSocket Error]', err);
-      setToast({ message: 'Something went wrong.', type: 'error' });
-      setLoading(false);
+    // The backend keeps running a simulation if the socket drops; reconnect with its job id to resume
+    let jobId = null;
+    let finished = false;
+    let reconnectAttempts = 0;
+
+    const connect = (initialMessage) => {
+      const socket = new WebSocket(`${protocol}://${baseUrl.replace(/^https?:\/\//, '')}/simulate/ws`);
+
+      socket.onopen = () => {
+        socket.send(JSON.stringify(initialMessage));
+      };
+
+      socket.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+
+        switch (msg.type) {
+          case 'job':
+            jobId = msg.payload.job_id;
+            break;
+
+          case 'resume':
+            reconnectAttempts = 0;
+            setResult((prev) => {
+              if (!prev) return null;
+              // A job that stopped buffering its series resumes empty; keep the points already drawn
+              if (!msg.payload.daily_values_retained) return prev;
+              return {
+                ...prev,
+                daily_values: msg.payload.daily_values,
+                daily_benchmark_values: msg.payload.daily_benchmark_values
+              };
+            });
+            break;
+
+          case 'status':
+            if (msg.payload.toLowerCase().includes('starting simulation')) {
+              setLoadingPhase('');
+            }
+            break;
+
+          case 'daily':
+            setCurrentSimDate(msg.payload.date);
+            setResult((prev) => {
+              if (!prev) return null;
+              return {
+                ...prev,
+                daily_values: [...(prev.daily_values || []), {
+                  date: msg.payload.date,
+                  portfolio_value: msg.payload.portfolio_value
+                }],
+                daily_benchmark_values: [...(prev.daily_benchmark_values || []), {
+                  date: msg.payload.date,
+                  benchmark_value: msg.payload.benchmark_value
+                }]
+              };
+            });
+            break;
+
+          case 'done':
+            finished = true;
+            setResult((prev) => ({
+              ...(prev || {}),
+              ...msg.payload
+            }));
+            setLoading(false);
+            setToast({ message: 'Simulation completed!', type: 'success' });
+            break;
+
+          case 'error':
+            finished = true;
+            setToast({ message: msg.payload || 'Something went wrong.', type: 'error' });
+            setLoading(false);
+            setResult(null);
+            break;
+
+          default:
+            // Unknown message type - ignore
+            break;
+        }
+      };
+
+      socket.onerror = (err) => {
+        console.error('[WebSocket Error]', err);
+      };
+
+      socket.onclose = () => {
+        if (finished) return;
+        if (jobId && reconnectAttempts < 5) {
+          reconnectAttempts += 1;
+          setTimeout(() => connect({ resume_job_id: jobId }), 1000 * reconnectAttempts);
+          return;
+        }
+        setToast({ message: 'Something went wrong.', type: 'error' });
+        setLoading(false);
+      };
     };
 
-    socket.onclose = () => {
-      // WebSocket disconnected
-    };
+    connect(form);
   };
 
   useEffect(() => {
@@ -5,6 +5,19 @@
 // Setup type definitions for built-in Supabase Runtime APIs
 import "jsr:@supabase/functions-js/edge-runtime.d.ts"
 
+interface SnapshotJobResponse {
+  success?: boolean;
+  job_id: string;
+  status: "running" | "done" | "error" | "cancelled";
+  stage?: string;
+  status_url?: string;
+  result?: UpdatePortfolioSnapshotsResponse | null;
+  error?: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_POLL_TIMEOUT_MS = 140000;
+
 interface UpdatePortfolioSnapshotsResponse {
   success: boolean;
   updated_prices_count?: number;
@@ -82,7 +95,7 @@ Deno.serve(async (req) => {
     });
 
     const requestDuration = Date.now() - requestStartTime;
-    console.log(`⏱️  Backend request completed in ${requestDuration}ms`);
+    console.log(`⏱️  Backend request accepted in ${requestDuration}ms`);
     console.log(`📊 Response status: ${response.status} ${response.statusText}`);
 
     if (!response.ok) {
@@ -104,7 +117,40 @@ Deno.serve(async (req) => {
       );
     }
 
-    const result: UpdatePortfolioSnapshotsResponse = await response.json();
+    // The backend runs the pipeline in the background and returns a job handle; poll it until it finishes
+    let job: SnapshotJobResponse = await response.json();
+    console.log(`🧾 Snapshot job ${job.job_id} ${job.status}`);
+    const statusUrl = `${backendUrl}/market/update-portfolio-snapshots/${job.job_id}`;
+    while (job.status === "running" && Date.now() - requestStartTime < JOB_POLL_TIMEOUT_MS) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const statusResponse = await fetch(statusUrl, { headers });
+      if (!statusResponse.ok) {
+        console.error(`⚠️  Job status check failed: ${statusResponse.status}`);
+        continue;
+      }
+      job = await statusResponse.json();
+      console.log(`   ⏳ Job stage: ${job.stage}`);
+    }
+
+    if (job.status !== "done" || !job.result) {
+      const error = job.status === "running" ? "Snapshot job still running" : `Snapshot job ${job.status}: ${job.error}`;
+      console.error(`❌ ${error}`);
+      return new Response(
+        JSON.stringify({
+          success: false,
+          error,
+          job_id: job.job_id,
+          request_duration_ms: Date.now() - requestStartTime,
+          timestamp: timestamp
+        }),
+        {
+          status: job.status === "running" ? 202 : 500,
+          headers: { "Content-Type": "application/json" }
+        }
+      );
+    }
+
+    const result: UpdatePortfolioSnapshotsResponse = { success: true, ...job.result };
     
     console.log("📋 Backend response summary:");
     console.log(`   ✅ Success: ${result.success}`);